@@ -31,7 +31,6 @@ def resource_path(relative_path):
 
 class ConfigEditor:
 
-    MAX_USERS = 3  # 类级常量，限制最大用户数
     DEFAULT_COOKIES_TEMPLATE = {
         "appId": "",
         "areaId": "",
@@ -1392,10 +1391,6 @@ class ConfigEditor:
 
     def add_user(self):
         """添加用户对话框"""
-        if len(self.users_data) >= self.__class__.MAX_USERS:
-            messagebox.showerror("错误", f"最多只能添加{self.__class__.MAX_USERS}个用户")
-            return
-        
         dialog = tk.Toplevel(self.root)
         dialog.title("添加用户")
         dialog.geometry("800x780")
@@ -1825,10 +1820,6 @@ class ConfigEditor:
 
         def save_new_user(push_services):
             """保存新用户配置"""
-            if len(self.users_data) >= self.__class__.MAX_USERS:
-                messagebox.showerror("错误", f"最多只能添加{self.__class__.MAX_USERS}个用户")
-                return
-
             username = username_var.get().strip()
             if not username:
                 messagebox.showerror("错误", "用户名不能为空")
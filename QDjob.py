@@ -1,35 +1,109 @@
 # coding: utf-8
 import os
 import json
+import asyncio
 import requests
 import time
 import random
 import re
-from typing import Dict, List, Optional, Any, Callable
-from enctrypt_qidian import getQDSign, getSDKSign, getborgus, getuserid_from_QDInfo, getQDInfo_byQDInfo, getibex_byibex
-from push import PushService, FeiShu, ServerChan, QiweiPush
-from logger import LoggerManager
+import threading
+from contextlib import nullcontext
+from functools import lru_cache
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Any, Callable, Container, Generator, Iterable, Iterator, Set, Tuple
+from urllib.parse import urlsplit
+import enctrypt_qidian
+from push import PushService, DEFAULT_PUSH_TIMEOUT, build_push_service
+from accounts import AccountRegistry
+from captcha_pool import CaptchaPool, CaptchaQuotaExhausted, default_captcha_pool
+from cookie_store import CookieStore, EPHEMERAL_COOKIES, write_cookies_file
+from crypto import AccountCryptoContext
+from heartbeat import HeartbeatScheduler
+from http_pool import SharedHTTPPool
+from pacing import Pacer, PacingPolicy
+from retry import RetryPolicy, RETRY_EXCEPTIONS, request_sent
+from risk import AccountRisk, RiskLedger
+from state import DailyStateStore
+from task_graph import TaskGraph, TaskRun, TaskSpec
+from notify import NotificationDispatcher, DigestCollector, deliver
+from outbox import PushOutbox
+from profiler import RequestProfiler
+from replay import create_replay_pool, parse_replay_config
+from logger import LoggerManager, set_log_user
 from logger import DEFAULT_LOG_RETENTION
 
 
 # 配置常量
 CONFIG_FILE = 'config.json'
 COOKIES_DIR = 'cookies'
+# 任务结果中保留的原始响应长度（字符），完整响应可在 DEBUG 日志中查看
+RESULT_PAYLOAD_LIMIT = 500
+# 登录预检的最少线程数，每个账号只请求一次用户信息接口
+PREFLIGHT_WORKERS = 8
+# 登录预检时每个线程最多排队的账号数，同一时间只加载正在检查和排队的账号
+PREFLIGHT_QUEUE_PER_WORKER = 2
+# 异步模式下单个用户同时执行的任务数
+DEFAULT_TASK_CONCURRENCY = 2
+# 接口域名，可通过 QidianClient(hosts=...) 替换为本地桩服务
+DEFAULT_HOSTS = {
+    'qd': 'https://druidv6.if.qidian.com',
+    'sdk': 'https://h5.if.qidian.com',
+    'game': 'https://lygame.qidian.com',
+}
+# 预编译的正则表达式，所有客户端共用
+UA_VERSION_PATTERN = re.compile(r'QDReaderAndroid/(\d+\.\d+\.\d+)/(\d+)/')
+FIRST_GAME_TITLE_PATTERN = re.compile(r"首次玩.*10分钟")
+GAME_PARTNERID_PATTERN = re.compile(r'partnerid=(\d+)')
+GAME_URL_PATTERN = re.compile(r'/game/(\d+).*?partnerid=(\d+)')
 DEFAULT_USER_AGENT = "Mozilla/5.0 (Linux; Android 13; PDEM10 Build/TP1A.220905.001; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/109.0.5414.86 MQQBrowser/6.2 TBS/047601 Mobile Safari/537.36 QDJSSDK/1.0  QDNightStyle_1  QDReaderAndroid/7.9.384/1466/1000032/OPPO/QDShowNativeLoading"
 logger = LoggerManager().setup_basic_logger()
 
+@lru_cache(maxsize=64)
+def parse_user_agent(user_agent: str) -> Optional[Tuple[str, str]]:
+    """
+    从UA中解析 (版本号, 版本编号)，相同UA只解析一次
+    :return: 无法匹配UA格式时返回None
+    """
+    match = UA_VERSION_PATTERN.search(user_agent)
+    if not match:
+        return None
+    return match.group(1), match.group(2)
+
 class QidianError(Exception):
     """自定义异常类"""
     def __init__(self, message: str, raw_data: Optional[Dict] = None):
         super().__init__(message)
         self.raw_data = raw_data
 
+class Step:
+    """
+    任务流程中需要等待I/O的一步：调用客户端的 action(*args, **kwargs)
+    任务流程写成生成器，yield 步骤并接收执行结果（执行出错时异常在 yield 处抛出）。
+    QidianClient 在当前线程中执行步骤，AsyncQidianClient 的同名方法为协程，在事件循环中执行，
+    请求构造和响应解析由两种客户端共用
+    """
+    __slots__ = ('action', 'args', 'kwargs')
+
+    def __init__(self, action: str, *args: Any, **kwargs: Any):
+        self.action = action
+        self.args = args
+        self.kwargs = kwargs
+
+    def __repr__(self) -> str:
+        return f"Step({self.action!r})"
+
+# 任务流程：yield Step，返回任务结果
+Flow = Generator[Step, Any, Any]
+
 class UserConfig:
     """用户配置"""
+    __slots__ = ('username', 'cookies', 'tasks', 'user_agent', 'ibex', 'push_services', 'tokenid', 'usertype',
+                 'cookies_file')
+
     def __init__(self, username: str, cookies: Dict[str, str], 
                  tasks: Dict[str, bool], user_agent: str, ibex: str,
                  push_services: List[PushService], tokenid: Optional[str] = None, 
-                 usertype: Optional[str] = None):
+                 usertype: Optional[str] = None, cookies_file: Optional[str] = None):
         self.username = username
         self.cookies = cookies
         self.tasks = tasks
@@ -38,13 +112,73 @@ class UserConfig:
         self.push_services = push_services
         self.tokenid = tokenid
         self.usertype = usertype
+        self.cookies_file = cookies_file
+
+def truncate_payload(payload: Any, limit: int = RESULT_PAYLOAD_LIMIT) -> Any:
+    """
+    压缩任务结果中的原始数据：字典只保留标量字段，字符串截断到 limit 个字符，
+    其他类型转为截断后的 JSON 字符串
+    """
+    if payload is None or isinstance(payload, (bool, int, float)):
+        return payload
+    if isinstance(payload, str):
+        return payload if len(payload) <= limit else payload[:limit] + '...'
+    if isinstance(payload, dict) and all(
+            value is None or isinstance(value, (str, bool, int, float)) for value in payload.values()):
+        return {key: truncate_payload(value, limit) for key, value in payload.items()}
+    return truncate_payload(json.dumps(payload, ensure_ascii=False, default=str), limit)
+
+def is_empty(value: Any) -> bool:
+    """是否为空字段：只有None和空字符串算空，0和False是有效值"""
+    return value is None or (isinstance(value, str) and not value)
+
+class TaskResult:
+    """
+    单个任务的最终结果
+    只保留推送和统计需要的字段，原始响应截断后保存，账号再多内存也只与结果摘要成正比
+    """
+    __slots__ = ('status', 'reason', 'captcha_data', 'raw_response', 'skipped', 'timestamp')
+
+    def __init__(self, status: str, reason: str = '', captcha_data: Any = None, raw_response: Any = None,
+                 skipped: bool = False, timestamp: Optional[str] = None):
+        self.status = status
+        self.reason = reason
+        self.captcha_data = truncate_payload(captcha_data)
+        self.raw_response = truncate_payload(raw_response)
+        self.skipped = skipped
+        self.timestamp = timestamp or time.strftime('%Y-%m-%d %H:%M:%S')
+
+    @classmethod
+    def from_task(cls, result: Any) -> "TaskResult":
+        """由任务函数返回的字典生成结果，其余字段（如等待函数）不保留"""
+        if not isinstance(result, dict):
+            return cls('failed', reason='任务返回格式错误')
+        return cls(
+            status=result.get('status') or 'failed',
+            reason=str(next((value for value in (result.get('reason'), result.get('error'))
+                             if not is_empty(value)), '')),
+            captcha_data=result.get('captcha_data'),
+            raw_response=result.get('raw_response'),
+        )
+
+    @property
+    def success(self) -> bool:
+        return self.status == 'success'
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转为字典，省略None和空字符串字段"""
+        data = {name: getattr(self, name) for name in self.__slots__}
+        return {key: value for key, value in data.items() if not is_empty(value)}
+
+    def __repr__(self) -> str:
+        return f"TaskResult({self.to_dict()})"
 
 class ConfigManager:
     """配置管理类"""
     def __init__(self):
         self.config = self._load_config()
         self._validate_config()  # 新增：执行全局配置校验
-        self.users = self._init_users()
+        self.registry = AccountRegistry(self.config.get('users', []), self.config.get('accounts_dir'))
         # logger.info("配置加载完成")
     
     def _load_config(self) -> Dict[str, Any]:
@@ -56,10 +190,12 @@ class ConfigManager:
             logger.error(f"加载配置文件失败: {e}")
             raise
     
-    def _init_users(self) -> List[UserConfig]:
-        """初始化用户配置"""
-        users = []
-        for user_data in self.config['users']:
+    def iter_users(self, usernames: Optional[Container[str]] = None) -> Iterator[UserConfig]:
+        """
+        按顺序逐个加载用户配置，cookies文件和推送服务在用到该用户时才读取
+        :param usernames: 只加载这些用户（如登录预检通过的用户），不传则加载全部用户
+        """
+        for user_data in self.registry.select(usernames):
             if not self._validate_user_config(user_data):
                 logger.error(f"用户 [{user_data.get('username', '未知')}] 配置错误，跳过该用户。")
                 continue
@@ -76,24 +212,12 @@ class ConfigManager:
             except FileNotFoundError:
                 logger.error(f"未找到 cookies 文件: {cookies_path}，跳过用户 [{user_data['username']}]")
                 continue
+            except (OSError, ValueError) as e:
+                logger.error(f"读取 cookies 文件 {cookies_path} 失败: {e}，跳过用户 [{user_data['username']}]")
+                continue
 
             # 初始化推送服务
-            push_services = []
-            for push_config in user_data.get('push_services', []):
-                push_type = push_config.get('type')
-                config_without_type = {k: v for k, v in push_config.items() if k != 'type'}
-
-                if push_type == 'feishu':
-                    push_service = FeiShu(**config_without_type)
-                elif push_type == 'serverchan':
-                    push_service = ServerChan(**config_without_type)
-                elif push_type == 'qiwei':
-                    push_service = QiweiPush(**config_without_type)
-                else:
-                    logger.warning(f"[推送配置] 用户[{user_data['username']}] 未知的推送类型: {push_type}")
-                    continue
-
-                push_services.append(push_service)
+            push_services = self._build_push_services(user_data)
             
             # 创建用户配置对象
             user_agent = user_data.get('user_agent', '') or self.config.get('default_user_agent')
@@ -112,17 +236,38 @@ class ConfigManager:
                 push_services=push_services,
                 tokenid=user_data.get('tokenid'),
                 usertype=user_data.get('usertype'),
+                cookies_file=cookies_path,
             )
-            users.append(user)
-            
-        return users
+            yield user
     
-    def save_cookies(self, username: str, cookies: Dict[str, str]) -> None:
+    @staticmethod
+    def _build_push_services(user_data: Dict[str, Any]) -> List[PushService]:
+        """根据用户配置创建推送服务，跳过无效的推送配置"""
+        push_services = []
+        for push_config in user_data.get('push_services', []):
+            try:
+                push_service = build_push_service(push_config)
+            except ValueError as e:
+                logger.warning(f"[推送配置] 用户[{user_data['username']}] {e}")
+                continue
+
+            push_services.append(push_service)
+        return push_services
+
+    def iter_push_services(self, username: Optional[str] = None) -> Iterator[PushService]:
+        """
+        读取当前配置中用户的推送服务，供推送发件箱找回上次运行遗留推送的推送目标
+        :param username: 不传时依次读取所有用户的推送服务（如汇总推送）
+        """
+        for user_data in self.registry.select(None if username is None else (username,)):
+            if self._validate_user_config(user_data):
+                yield from self._build_push_services(user_data)
+
+    def save_cookies(self, username: str, cookies: Dict[str, str], cookies_path: Optional[str] = None) -> None:
         """保存用户cookies"""
-        cookies_path = f"{COOKIES_DIR}/{username}.json"
+        cookies_path = cookies_path or f"{COOKIES_DIR}/{username}.json"
         try:
-            with open(cookies_path, 'w', encoding='utf-8') as f:
-                json.dump(cookies, f, indent=2)
+            write_cookies_file(cookies_path, cookies)
             logger.debug(f"保存cookies成功: {cookies_path}")
         except Exception as e:
             logger.error(f"保存cookies失败: {e}")
@@ -160,6 +305,114 @@ class ConfigManager:
         else:
             self.config['retry_attempts'] = 3
 
+        # 校验并发用户数
+        if 'max_concurrent_users' in self.config:
+            try:
+                max_concurrent = int(self.config['max_concurrent_users'])
+                if max_concurrent <= 0:
+                    raise ValueError("并发用户数必须为正整数")
+                self.config['max_concurrent_users'] = max_concurrent
+            except (ValueError, TypeError):
+                logger.warning("并发用户数配置错误，使用默认值 1（顺序执行）")
+                self.config['max_concurrent_users'] = 1
+        else:
+            self.config['max_concurrent_users'] = 1
+
+        # 校验耗时统计报告格式
+        if self.config.get('profile_report') not in (None, '', 'json', 'csv'):
+            logger.warning("耗时统计报告格式配置错误，可选值: json/csv，已关闭耗时统计")
+            self.config['profile_report'] = ''
+
+        # 校验请求节奏配置
+        if 'pacing' in self.config:
+            try:
+                PacingPolicy.from_config(self.config['pacing'])
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.warning(f"请求节奏配置错误: {e}，使用默认节奏")
+                del self.config['pacing']
+
+        # 校验连接池配置
+        if 'http_pool' in self.config:
+            try:
+                SharedHTTPPool.from_config(self.config['http_pool'])
+            except (ValueError, TypeError) as e:
+                logger.warning(f"连接池配置错误: {e}，使用默认连接池")
+                del self.config['http_pool']
+
+        # 校验推送发件箱配置
+        if 'push_outbox' in self.config and not isinstance(self.config['push_outbox'], bool):
+            try:
+                PushOutbox.from_config(self.config['push_outbox'])
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.warning(f"推送发件箱配置错误: {e}，使用默认设置")
+                self.config['push_outbox'] = True
+
+        # 校验验证码识别配置
+        if 'captcha' in self.config:
+            try:
+                CaptchaPool.from_config(self.config['captcha'])
+            except (ValueError, TypeError) as e:
+                logger.warning(f"验证码识别配置错误: {e}，使用默认设置")
+                del self.config['captcha']
+
+        # 校验风控记录配置
+        if 'risk' in self.config and not isinstance(self.config['risk'], bool):
+            try:
+                RiskLedger.from_config(self.config['risk'])
+            except (ValueError, TypeError) as e:
+                logger.warning(f"风控记录配置错误: {e}，使用默认设置")
+                self.config['risk'] = True
+
+        # 校验录制/回放配置
+        if 'replay' in self.config:
+            try:
+                if parse_replay_config(self.config['replay'])['mode'] == 'replay':
+                    # 回放的是录制时的cookies和响应，不能写回用户的cookies文件和风控记录
+                    self.config['save_cookies'] = False
+                    self.config['risk'] = False
+                if self.config.get('async_mode'):
+                    logger.warning("录制/回放只支持同步客户端，已关闭异步模式")
+                    self.config['async_mode'] = False
+            except ValueError as e:
+                logger.warning(f"录制/回放配置错误: {e}，已关闭录制/回放")
+                del self.config['replay']
+
+        # 校验请求重试配置
+        if 'request_retry' in self.config:
+            try:
+                RetryPolicy.from_config(self.config['request_retry'])
+            except (ValueError, TypeError) as e:
+                logger.warning(f"请求重试配置错误: {e}，使用默认重试策略")
+                del self.config['request_retry']
+
+        # 校验单用户任务并发数
+        if 'task_concurrency' in self.config:
+            try:
+                task_concurrency = int(self.config['task_concurrency'])
+                if task_concurrency <= 0:
+                    raise ValueError("任务并发数必须为正整数")
+                self.config['task_concurrency'] = task_concurrency
+            except (ValueError, TypeError):
+                logger.warning(f"任务并发数配置错误，使用默认值 {DEFAULT_TASK_CONCURRENCY}")
+                self.config['task_concurrency'] = DEFAULT_TASK_CONCURRENCY
+
+        # 校验登录预检配置
+        if not isinstance(self.config.get('preflight_login', True), bool):
+            logger.warning("preflight_login 必须为 true/false，使用默认值 true")
+            self.config['preflight_login'] = True
+
+        # 校验cookies保存配置
+        if not isinstance(self.config.get('save_cookies', True), bool):
+            logger.warning("save_cookies 必须为 true/false，使用默认值 true")
+            self.config['save_cookies'] = True
+
+        # 校验账号目录
+        if 'accounts_dir' in self.config:
+            accounts_dir = self.config['accounts_dir']
+            if not isinstance(accounts_dir, str) or not os.path.isdir(accounts_dir):
+                logger.warning(f"账号目录 {accounts_dir} 不存在，只使用 users 中的账号")
+                del self.config['accounts_dir']
+
         # 校验User-Agent 
         if "default_user_agent" in self.config:
             if not isinstance(self.config['default_user_agent'], str):
@@ -168,10 +421,10 @@ class ConfigManager:
         else:
             self.config['default_user_agent'] = DEFAULT_USER_AGENT
         
-        # 校验用户配置
-        if 'users' in self.config:
-            for user_data in self.config['users']:
-                self._validate_user_config(user_data)
+        # 用户配置在 iter_users 加载各用户时校验，这里只检查列表类型
+        if not isinstance(self.config.get('users', []), list):
+            logger.error("users 配置必须为列表类型")
+            self.config['users'] = []
     
     def _validate_user_config(self, user_data: dict) -> bool:
         """验证单个用户配置"""
@@ -217,6 +470,11 @@ class ConfigManager:
                 logger.warning(f"[配置错误] 用户[{user_data['username']}] 未知的推送类型: {push_type}")
                 return False
 
+            timeout = push_config.get('timeout', DEFAULT_PUSH_TIMEOUT)
+            if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0:
+                logger.warning(f"[配置错误] 用户[{user_data['username']}] 推送 timeout 必须为正数")
+                return False
+
             if push_type == 'feishu':
                 if not push_config.get('webhook_url'):
                     logger.warning(f"[配置错误] 用户[{user_data['username']}] 飞书推送缺少必要字段: webhook_url")
@@ -254,13 +512,96 @@ class ConfigManager:
 
 class QidianClient:
     """起点客户端"""
-    def __init__(self, config: UserConfig):
+    def __init__(self, config: UserConfig, signer: Any = None, hosts: Optional[Dict[str, str]] = None,
+                 heartbeat_scheduler: Optional[HeartbeatScheduler] = None, pacer: Optional[Pacer] = None,
+                 profiler: Optional[RequestProfiler] = None, http_pool: Optional[SharedHTTPPool] = None,
+                 retry_policy: Optional[RetryPolicy] = None, cookie_store: Optional[CookieStore] = None,
+                 captcha_pool: Optional[CaptchaPool] = None, risk: Optional[AccountRisk] = None):
+        """
+        :param signer: 签名实现，需提供与 enctrypt_qidian 相同的函数接口，默认使用 enctrypt_qidian
+        :param hosts: 覆盖接口域名，键为 qd/sdk/game
+        :param heartbeat_scheduler: 游戏心跳调度器，设置后游戏任务不再阻塞等待心跳
+        :param pacer: 请求节奏控制器，默认使用 DEFAULT_PACING
+        :param profiler: 请求耗时统计，不传则不统计
+        :param http_pool: 共享连接池，不传则使用独立的会话
+        :param retry_policy: 请求超时与重试策略，默认使用 DEFAULT_REQUEST_RETRY
+        :param cookie_store: cookies 持久化，设置后服务器下发的 cookies 会写回用户的 cookies 文件
+        :param captcha_pool: 验证码识别线程池，不传则使用 default_captcha_pool()
+        :param risk: 账号的风控记录，设置后记录各接口触发风控的情况；节奏随之调整需要同时传给 Pacer
+        """
         self.config = config
         self.tokenid = config.tokenid
-        self.session = requests.Session()
+        self.signer = signer or enctrypt_qidian
+        self.hosts = {**DEFAULT_HOSTS, **(hosts or {})}
+        self.heartbeat_scheduler = heartbeat_scheduler
+        self.pacer = pacer or Pacer()
+        self.profiler = profiler
+        self.http_pool = http_pool
+        self.retry_policy = retry_policy or RetryPolicy.from_config()
+        self.cookie_store = cookie_store
+        self.captcha_pool = captcha_pool or default_captcha_pool()
+        self.risk = risk
+        # 本客户端请求携带的 cookies，QDInfo 每次签名都会替换为派生值，不写回 config.cookies，
+        # 同一账号的其他客户端（如登录预检）仍从 config.cookies 读取原始 QDInfo
+        self.cookies = dict(config.cookies)
+        if cookie_store is not None and config.cookies_file:
+            # 记录从文件读取的原始内容，同一账号只记录第一次
+            cookie_store.register(config.username, config.cookies_file, config.cookies)
+        self._adv_snapshot = None  # mainPage 响应缓存，执行激励任务后失效
+        self.session = self._create_session()
         self._init_headers()
         # self.init_versions()
+
+    def _create_session(self) -> Any:
+        """创建HTTP会话，有共享连接池时复用其中的长连接"""
+        if self.http_pool is not None:
+            return self.http_pool.session(self.config.username)
+        return requests.Session()
+
+    def _url(self, host: str, path: str) -> str:
+        """拼接接口地址"""
+        return self.hosts[host] + path
+
+    def _profile(self, url: str, phase: str) -> Any:
+        """统计某个阶段的耗时，phase 为 sleep/sign/network"""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.measure(self.config.username, url, phase)
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """发送HTTP请求并统计网络耗时，网络错误时按重试策略只重试本次请求"""
+        rule = self.retry_policy.rule(method, url)
+        kwargs.setdefault('timeout', rule.timeout)
+        attempt = 1
+        while True:
+            try:
+                with self._profile(url, 'network'):
+                    response = self.session.request(method, url, **kwargs)
+            except RETRY_EXCEPTIONS as e:
+                if not self.retry_policy.should_retry(rule, attempt, sent=request_sent(e)):
+                    raise
+                reason = type(e).__name__
+            else:
+                if not self.retry_policy.should_retry(rule, attempt, status=response.status_code):
+                    return response
+                reason = f"HTTP {response.status_code}"
+
+            delay = self.retry_policy.backoff(attempt)
+            attempt += 1
+            logger.warning(f"请求{urlsplit(url).path}失败({reason})，{delay:.1f}秒后第{attempt}次请求")
+            with self._profile(url, 'sleep'):
+                time.sleep(delay)
     
+    def _merge_cookies(self, cookies: Dict[str, str]) -> None:
+        """合并起点接口通过 Set-Cookie 下发的 cookies，后续请求使用新值，并交给 cookie_store 保存"""
+        updates = {name: value for name, value in cookies.items() if name not in EPHEMERAL_COOKIES and value}
+        if not updates:
+            return
+        self.cookies.update(updates)
+        self.config.cookies.update(updates)
+        if self.cookie_store is not None:
+            self.cookie_store.update(self.config.username, updates)
+
     def _init_headers(self) -> None:
         """初始化请求头"""
         self.headers_sdk = {
@@ -295,10 +636,9 @@ class QidianClient:
     
     def init(self) -> bool:
         """初始化信息"""
-        match = re.search(r'QDReaderAndroid/(\d+\.\d+\.\d+)/(\d+)/', self.config.user_agent)
-        if match:
-            self.version = match.group(1)
-            self.versioncode = match.group(2)
+        parsed = parse_user_agent(self.config.user_agent)
+        if parsed:
+            self.version, self.versioncode = parsed
             
             if not self.version: 
                 logger.error('无法获取版本号，请检查UA')
@@ -321,7 +661,9 @@ class QidianClient:
         self.qid = self.config.cookies.get('qid', '')
         logger.debug(f'qid：{self.qid}')
         self.QDInfo = self.config.cookies.get('QDInfo', '')
-        self.userid = getuserid_from_QDInfo(self.QDInfo)
+        self.crypto = AccountCryptoContext(self.signer, self.version, self.versioncode,
+                                           self.qid, self.QDInfo, self.ibex)
+        self.userid = self.crypto.userid
         logger.debug(f'userid：{self.userid}')
         return True
     
@@ -330,165 +672,245 @@ class QidianClient:
         """处理响应并检测验证码"""
         try:
             result = response.json()
-            logger.debug(f"响应数据: {result}")
-            
-            # 检测验证码
-            risk_conf = result.get('Data', {}).get('RiskConf', {})
-            ban_id = risk_conf.get('BanId', 0)  # 默认为0
-
-            # 强制转换为整数并判断
-            try:
-                ban_id = int(ban_id)
-            except (ValueError, TypeError):
-                ban_id = 0
-
-            # 非0即触发验证码
-            if ban_id != 0:
-                result['is_captcha'] = True
-                result['captcha_data'] = risk_conf.copy()
-                
-            return result
         except json.JSONDecodeError:
             logger.error(f"{error_msg}: {response.text}")
             raise QidianError(f"{error_msg}: {response.text}")
-        
-    def _make_qd_request(self, url: str, params: dict = None, data: dict = None, method: str = 'POST') -> Dict[str, Any]:
-        """创建qd类型请求"""
-        # 添加随机延迟
-        time.sleep(random.uniform(1, 3))  # 随机延迟 1~3 秒
+        return self._check_captcha(result)
 
-        ts = str(int(time.time() * 1000))
-        params = params or {}
-        data = data or {}
+    def _record_risk(self, url: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """记录本次请求是否触发风控"""
+        if self.risk is not None:
+            ban_id = result['captcha_data'].get('BanId', 0) if result.get('is_captcha') else 0
+            self.risk.record(url, ban_id)
+        return result
+
+    def _record_solve(self, url: str, outcome: str) -> None:
+        """记录验证码处理结果"""
+        if self.risk is not None:
+            self.risk.record_solve(url, outcome)
+
+    def _check_captcha(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """检测响应数据中的验证码标记"""
+        logger.debug(f"响应数据: {result}")
         
-        data_encrypt = data.copy() if data else params.copy()
+        # 检测验证码
+        risk_conf = result.get('Data', {}).get('RiskConf', {})
+        ban_id = risk_conf.get('BanId', 0)  # 默认为0
+
+        # 强制转换为整数并判断
+        try:
+            ban_id = int(ban_id)
+        except (ValueError, TypeError):
+            ban_id = 0
 
-        QDSign = getQDSign(ts, data_encrypt, self.version, self.qid, userid=self.userid)
-        QDInfo = getQDInfo_byQDInfo(ts, self.QDInfo)
-        borgus = getborgus(ts, data_encrypt, self.versioncode, self.qid)
+        # 非0即触发验证码
+        if ban_id != 0:
+            result['is_captcha'] = True
+            result['captcha_data'] = risk_conf.copy()
+            
+        return result
+
+    def _build_qd_headers(self, ts: str, data_encrypt: dict) -> Dict[str, str]:
+        """生成qd类型请求的签名请求头，并更新本客户端请求携带的QDInfo"""
+        sign = self.crypto.qd_sign(ts, data_encrypt)
         
         # 更新headers
         headers = self.headers_qd.copy()
         headers.update({
             'tstamp': ts,
-            'QDInfo': QDInfo,
-            'QDSign': QDSign,
-            'borgus': borgus
+            'QDInfo': sign['QDInfo'],
+            'QDSign': sign['QDSign'],
+            'borgus': sign['borgus']
         })
 
         # 更新 cookies
-        self.config.cookies['QDInfo'] = QDInfo
-
-        # 根据 method 显式选择请求方式
-        if method.upper() == 'POST':
-            response = self.session.post(url, params=params, data=data, headers=headers, cookies=self.config.cookies)
-        else:
-            response = self.session.get(url, params=params, headers=headers, cookies=self.config.cookies)
-
-        return self._handle_response(response, "qd类型请求失败")
+        self.cookies['QDInfo'] = sign['QDInfo']
+        return headers
 
-    def _make_sdk_request(self, url: str, params: dict = None, data: dict = None, method: str = 'POST') -> Dict[str, Any]:
-        """创建sdk类型请求"""
-        # 添加随机延迟
-        time.sleep(random.uniform(1, 3))  # 随机延迟 1~3 秒
-
-        ts = str(int(time.time() * 1000))
-        params = params or {}
-        data = data or {}
-        
-        data_encrypt = data.copy() if data else params.copy()
-        
-        SDKSign = getSDKSign(ts, data_encrypt, self.version, self.qid, userid=self.userid)
-        QDInfo = getQDInfo_byQDInfo(ts, self.QDInfo)
-        borgus = getborgus(ts, data_encrypt, self.versioncode, self.qid)
-        ibex = getibex_byibex(ts, self.ibex)
+    def _build_sdk_headers(self, ts: str, data_encrypt: dict) -> Dict[str, str]:
+        """生成sdk类型请求的签名请求头，并更新本客户端请求携带的QDInfo"""
+        sign = self.crypto.sdk_sign(ts, data_encrypt)
         
         # 更新headers
         headers = self.headers_sdk.copy()
         headers.update({
             'tstamp': ts,
-            'SDKSign': SDKSign,
-            'ibex': ibex,
-            'borgus': borgus
+            'SDKSign': sign['SDKSign'],
+            'ibex': sign['ibex'],
+            'borgus': sign['borgus']
         })
 
         # 更新 cookies
-        self.config.cookies['QDInfo'] = QDInfo
+        self.cookies['QDInfo'] = sign['QDInfo']
+        return headers
         
-         # 根据 method 显式选择请求方式
-        if method.upper() == 'POST':
-            if params=={} or params==None:
-                response = self.session.post(url, data=data, headers=headers, cookies=self.config.cookies)
-            else:
-                response = self.session.post(url, params=params, data=data, headers=headers, cookies=self.config.cookies)
-        else:
-            if params=={} or params==None:
-                response = self.session.get(url, headers=headers, cookies=self.config.cookies, data=data)
-            else:
-                response = self.session.get(url, params=params, headers=headers, cookies=self.config.cookies, data=data)
-            
-        return self._handle_response(response, "sdk类型请求失败")
-    
-    def _solve_captcha(self, captcha_data: dict) -> Optional[dict]:
+    def _signed_request(self, kind: str, url: str, params: Optional[dict], data: Optional[dict],
+                        method: str) -> Dict[str, Any]:
         """
-        解决验证码的核心方法
-        :param captcha_data: 从API返回的RiskConf数据
-        :return: 包含randstr和ticket的字典，或None表示失败
+        生成签名，返回请求的 params/data/headers/cookies，同步和异步客户端共用
+        :param kind: qd 或 sdk
+        """
+        ts = str(int(time.time() * 1000))
+        params = params or {}
+        data = data or {}
+
+        data_encrypt = data.copy() if data else params.copy()
+        build_headers = self._build_qd_headers if kind == 'qd' else self._build_sdk_headers
+        with self._profile(url, 'sign'):
+            headers = build_headers(ts, data_encrypt)
+        # GET 请求不带请求体
+        return {'params': params, 'data': data if method == 'POST' else None,
+                'headers': headers, 'cookies': self.cookies}
+
+    def _make_qd_request(self, url: str, params: dict = None, data: dict = None, method: str = 'POST',
+                         error_msg: str = "qd类型请求失败") -> Dict[str, Any]:
+        """创建qd类型请求"""
+        return self._make_signed_request('qd', url, params, data, method, error_msg)
+
+    def _make_sdk_request(self, url: str, params: dict = None, data: dict = None, method: str = 'POST',
+                          error_msg: str = "sdk类型请求失败") -> Dict[str, Any]:
+        """创建sdk类型请求"""
+        return self._make_signed_request('sdk', url, params, data, method, error_msg)
+
+    def _make_signed_request(self, kind: str, url: str, params: Optional[dict], data: Optional[dict],
+                             method: str, error_msg: str) -> Dict[str, Any]:
+        """发送签名请求，解析响应并记录风控情况"""
+        # 按节奏策略等待，距上次请求足够久时不等待
+        with self._profile(url, 'sleep'):
+            self.pacer.wait(url)
+
+        method = method.upper()
+        response = self._send(method, url, **self._signed_request(kind, url, params, data, method))
+        self._merge_cookies(response.cookies.get_dict())
+        return self._record_risk(url, self._handle_response(response, error_msg))
+
+    def _request(self, method: str, url: str, **kwargs) -> Tuple[int, str, Dict[str, str]]:
+        """发送不需要签名的请求（游戏中心），返回(状态码, 响应文本, 响应cookies)"""
+        response = self._send(method, url, **kwargs)
+        return response.status_code, response.text, response.cookies.get_dict()
+
+    def _wait_future(self, future: Future) -> Any:
+        """等待线程池中的结果（如验证码识别）"""
+        return future.result()
+
+    def _run_heartbeats(self, game: Dict[str, Any]) -> Any:
+        """
+        发送游戏心跳直到游戏时长满足或心跳失败
+        设置了心跳调度器时交由调度器发送并返回 Future，任务流程转入后台等待
         """
+        beat = lambda: self._drive(self._game_heartbeat_flow(game))
+        if self.heartbeat_scheduler is not None:
+            future = self.heartbeat_scheduler.submit(beat, game['full_time'], username=self.config.username)
+            logger.info("游戏心跳已交由调度器执行")
+            return future
+
+        run_time = 0
+        while run_time < game['full_time']:
+            next_time = beat()
+            if next_time is None:
+                return False
+            run_time += next_time
+            time.sleep(next_time)
+        return True
+
+    def _drive(self, flow: Flow) -> Any:
+        """在当前线程中执行任务流程，返回流程的返回值"""
+        return self._resume(flow)
+
+    def _resume(self, flow: Flow, value: Any = None, error: Optional[Exception] = None) -> Any:
+        """把上一步的结果（或异常）送回任务流程，继续执行后续步骤"""
+        while True:
+            try:
+                step = flow.throw(error) if error is not None else flow.send(value)
+            except StopIteration as stop:
+                return stop.value
+            value, error = None, None
+            try:
+                value = getattr(self, step.action)(*step.args, **step.kwargs)
+            except Exception as e:
+                error = e
+                continue
+            if isinstance(value, Future):
+                # 步骤转入后台执行（如调度器中的游戏心跳），任务先返回，调用 wait() 时等待其结束再继续
+                return {'status': 'pending', 'wait': lambda future=value: self._wait_flow(flow, future)}
+
+    def _wait_flow(self, flow: Flow, future: Future) -> Any:
+        """等待后台步骤结束后继续执行任务流程"""
+        try:
+            value = future.result()
+        except Exception as e:
+            return self._resume(flow, error=e)
+        return self._resume(flow, value)
+
+    def _captcha_type(self, captcha_data: dict) -> Optional[str]:
+        """检查验证码是否可以自动处理，返回 CaptchaAId，不支持时返回None"""
         ban_id = captcha_data.get('BanId', 0)
-        
+
         # 检查BanId是否为2
         try:
             ban_id = int(ban_id)
         except (TypeError, ValueError):
             ban_id = 0
-        
+
         if ban_id != 2:
             logger.error(f"非预料的BanId: {ban_id}，可能是设备风控或其他原因")
-            return False
-        
+            return None
+
         # 检查CaptchaAId是否支持
         captcha_a_id = captcha_data.get('CaptchaAId', '')
         if captcha_a_id != "198420051":
             logger.error(f"未实现的验证码类型: {captcha_a_id}，当前仅支持198420051")
+            return None
+        return captcha_a_id
+
+    def _submit_captcha(self, captcha_a_id: str, captcha_data: dict) -> Future:
+        """提交到验证码识别线程池"""
+        logger.info("开始进行验证码处理")
+        return self.captcha_pool.submit(self.tokenid, captcha_a_id, self.config.user_agent,
+                                        session_key=str(captcha_data.get('SessionKey', '')),
+                                        username=self.config.username, usertype=self.config.usertype)
+
+    @staticmethod
+    def _captcha_solution(captcha_result: Any) -> Optional[dict]:
+        """检查识别结果，成功时返回包含randstr和ticket的字典"""
+        logger.debug(f"验证码识别结果: {captcha_result}")
+        # 验证结果格式
+        if not isinstance(captcha_result, dict) or 'code' not in captcha_result:
+            logger.error("验证码识别返回格式错误")
+            return None
+
+        if captcha_result.get('code') == 0:
+            logger.info(f"验证码识别成功: randstr={captcha_result['randstr']}, ticket={captcha_result['ticket'][:10]}...")
+            return captcha_result
+
+        elif captcha_result.get('code') in (12, 50, 666):
+            logger.error(f"验证码识别失败: {captcha_result['message']}")
+            return None
+
+        else:
+            logger.error(f"未知返回：{captcha_result}")
+            return None
+
+    def _solve_captcha_flow(self, captcha_data: dict) -> Flow:
+        """
+        解决验证码的核心方法，识别在验证码线程池中执行
+        :param captcha_data: 从API返回的RiskConf数据
+        :return: 包含randstr和ticket的字典，或None表示失败，False表示无法处理的验证码类型
+        """
+        captcha_a_id = self._captcha_type(captcha_data)
+        if captcha_a_id is None:
             return False
-        
         try:
-            logger.info("开始进行验证码处理")
-            from Captcha import main
-            # 使用无头模式，避免干扰用户
-            captcha_result = main(tokenid=self.tokenid, captcha_a_id=captcha_a_id, user_agent=self.config.user_agent)
-            logger.debug(f"验证码识别结果: {captcha_result}")
-            # 验证结果格式
-            if not isinstance(captcha_result, dict) or 'code' not in captcha_result:
-                logger.error("验证码识别返回格式错误")
-                return None
-                
-            if captcha_result.get('code') == 0:
-                logger.info(f"验证码识别成功: randstr={captcha_result['randstr']}, ticket={captcha_result['ticket'][:10]}...")
-                return captcha_result
-            
-            elif captcha_result.get('code') == 12:
-                logger.error(f"验证码识别失败: {captcha_result['message']}")
-                return None
-            
-            elif captcha_result.get('code') == 50:
-                logger.error(f"验证码识别失败: {captcha_result['message']}")
-                return None
-            
-            elif captcha_result.get('code') == 666:
-                logger.error(f"验证码识别失败: {captcha_result['message']}")
-                return None
-            
-            else:
-                logger.error(f"未知返回：{captcha_result}")
-                return None
-            
+            captcha_result = yield Step('_wait_future', self._submit_captcha(captcha_a_id, captcha_data))
+            return self._captcha_solution(captcha_result)
+        except CaptchaQuotaExhausted as e:
+            logger.error(f"验证码处理失败: {e}")
+            return None
         except Exception as e:
             logger.exception(f"验证码处理异常: {e}")
             return None
 
-    def _make_request_with_captcha(self, url: str, data: dict, method: str = 'POST', max_captcha_attempts: int = 3) -> dict:
+    def _captcha_request_flow(self, url: str, data: dict, method: str = 'POST', max_captcha_attempts: int = 3) -> Flow:
         """
         带验证码自动处理的请求方法
         :param url: 请求URL
@@ -498,20 +920,16 @@ class QidianClient:
         :return: 处理后的结果
         """
         captcha_attempt = 0
+        captcha_data = {}
+        captcha_solution = {}
         original_data = data.copy()  # 保留原始数据用于重试
-        
+
         while captcha_attempt <= max_captcha_attempts:
             # 构造请求数据（每次重试需要重置）
             request_data = original_data.copy()
-            
+
             # 如果是验证码重试，添加验证码参数
             if captcha_attempt > 0:
-                # request_data.update({
-                #     'sessionKey': str(captcha_data.get('SessionKey', '')),
-                #     'banId': str(captcha_data.get('BanId', '0')),
-                #     'captchaTicket': captcha_solution.get('ticket', ''),
-                #     'captchaRandStr': captcha_solution.get('randstr', '')
-                # })
                 request_data = {
                     'taskId': original_data.get('taskId', ''),
                     'sessionKey': str(captcha_data.get('SessionKey', '')),
@@ -522,42 +940,56 @@ class QidianClient:
                     'validate': '',
                     'seccode': '',
                 }
-            
+
             # 选择正确的请求方法
-            result = self._make_sdk_request(url, data=request_data, method=method)
-            
+            result = yield Step('_make_sdk_request', url, data=request_data, method=method)
+
             # 检查是否需要处理验证码
             if result.get('is_captcha'):
+                if captcha_attempt > 0:
+                    self._record_solve(url, 'rejected')
                 if not self.tokenid:
                     logger.info("未设置tokenid，跳过验证码处理")
+                    self._record_solve(url, 'skipped')
                     return {
-                        'status': 'captcha_failed', 
+                        'status': 'captcha_failed',
                         'reason': '跳过验证码处理',
                         'captcha_data': '未设置tokenid，跳过验证码处理'
                     }
+                if self.captcha_pool.exhausted(self.tokenid):
+                    logger.info("tokenid剩余次数已用完，跳过验证码处理")
+                    self._record_solve(url, 'skipped')
+                    return {
+                        'status': 'captcha_failed',
+                        'reason': 'tokenid剩余次数已用完',
+                        'captcha_data': result['captcha_data']
+                    }
 
                 captcha_attempt += 1
                 captcha_data = result['captcha_data']
-                
+
                 # 尝试解决验证码
-                captcha_solution = self._solve_captcha(captcha_data)
+                captcha_solution = yield from self._solve_captcha_flow(captcha_data)
                 if captcha_solution == False:
+                    self._record_solve(url, 'unsupported')
                     return {
-                        'status': 'captcha', 
+                        'status': 'captcha',
                         'reason': '无法处理的验证码类型',
                         'captcha_data': captcha_data
                     }
 
                 if captcha_solution == None:
+                    self._record_solve(url, 'failed')
                     return {
-                        'status': 'captcha_failed', 
-                        'reason': '验证码处理失败',
+                        'status': 'captcha_failed',
+                        # 识别前查询到次数已用完时同样以此为原因
+                        'reason': 'tokenid剩余次数已用完' if self.captcha_pool.exhausted(self.tokenid) else '验证码处理失败',
                         'captcha_data': captcha_data
                     }
-                
+
                 logger.info(f"第{captcha_attempt}次尝试解决验证码...")
                 continue  # 重试请求
-            
+
             # 检查最终结果是否仍有验证码（表示验证码验证失败）
             if result.get('Data', {}).get('RiskConf', {}).get('BanId'):
                 return {
@@ -565,10 +997,12 @@ class QidianClient:
                     'reason': '验证码验证失败',
                     'captcha_data': result['Data']['RiskConf']
                 }
-            
+
             # 返回成功结果
+            if captcha_attempt > 0:
+                self._record_solve(url, 'success')
             return result
-        
+
         # 验证码尝试次数用尽
         return {
             'status': 'captcha_failed',
@@ -577,44 +1011,28 @@ class QidianClient:
         }
 
     def check_login(self) -> Optional[str]:
-        """检查登录状态"""
-        ts = str(int(time.time() * 1000))
-        url = "https://druidv6.if.qidian.com/argus/api/v1/user/getprofile"
-        
-        # 生成签名
-        params = {}
-        params_encrypt = {}
-        QDSign = getQDSign(ts, params_encrypt, self.version, self.qid, userid=self.userid)
-        QDInfo = getQDInfo_byQDInfo(ts, self.QDInfo)
-        borgus = getborgus(ts, params_encrypt, self.versioncode, self.qid)
-        
-        # 设置请求头
-        headers = self.headers_qd.copy()
-        headers.update({
-            'tstamp': ts,
-            'QDInfo': QDInfo,
-            'QDSign': QDSign,
-            'borgus': borgus
-        })
+        """检查登录状态，返回昵称，未登录时返回None"""
+        return self._drive(self._check_login_flow())
 
-        # 更新 cookies
-        self.config.cookies['QDInfo'] = QDInfo
-        
+    def _check_login_flow(self) -> Flow:
+        url = self._url('qd', "/argus/api/v1/user/getprofile")
         try:
-            response = self.session.get(url, params=params, cookies=self.config.cookies, headers=headers)
-            result = self._handle_response(response, "登录检测失败")
-            
-            if result.get('Data', {}).get('Nickname'):
-                return result['Data']['Nickname']
-            return None
+            result = yield Step('_make_qd_request', url, method='GET', error_msg="登录检测失败")
         except Exception as e:
             logger.error(f"登录检测异常: {e}")
             return None
 
+        if result.get('Data', {}).get('Nickname'):
+            return result['Data']['Nickname']
+        return None
+
     def qdsign(self) -> dict:
         """执行签到任务"""
+        return self._drive(self._qdsign_flow())
+
+    def _qdsign_flow(self) -> Flow:
         try:
-            url = "https://druidv6.if.qidian.com/argus/api/v2/checkin/checkin"
+            url = self._url('qd', "/argus/api/v2/checkin/checkin")
             data = {
                 'sessionKey': '',
                 'banId': '0',
@@ -624,42 +1042,61 @@ class QidianClient:
                 'validate': '',
                 'seccode': '',
             }
-            
-            result = self._make_qd_request(url, data=data, method='POST')
+
+            result = yield Step('_make_qd_request', url, data=data, method='POST')
 
             if result.get('Result') == -91002:
                 logger.info("签到成功")
                 return {'status': 'success'}
-            
+
             if result.get('Result') == 0 and result.get('Data', {}).get('HasCheckIn', '') == 1:
                 logger.info("签到成功")
                 return {'status': 'success'}
-                
+
             if result.get('is_captcha'):
                 return {'status': 'captcha', 'captcha_data': result['captcha_data']}
-                
+
             logger.error(f"签到失败: {result}")
             return {'status': 'failed'}
-            
+
         except Exception as e:
             logger.error(f"签到任务异常: {e}")
             return {'status': 'error', 'error': str(e)}
 
-    def get_adv_job(self) -> Dict[str, Any]:
-        """获取激励任务列表"""
+    def get_adv_job(self, refresh: bool = False) -> Dict[str, Any]:
+        """
+        获取激励任务列表
+        激励碎片、额外章节卡和游戏中心任务共用同一份 mainPage 响应，执行 do_adv_job 后缓存失效
+        :param refresh: 忽略缓存重新获取
+        """
+        return self._drive(self._get_adv_job_flow(refresh))
+
+    def _get_adv_job_flow(self, refresh: bool = False) -> Flow:
+        if not refresh and self._adv_snapshot is not None:
+            logger.debug("使用缓存的激励任务列表")
+            return self._adv_snapshot
+
         # url = "https://h5.if.qidian.com/argus/api/v1/video/adv/mainPage"
-        url = "https://h5.if.qidian.com/argus/api/v2/video/adv/mainPage"
-        result = self._make_sdk_request(url,method='GET')
+        url = self._url('sdk', "/argus/api/v2/video/adv/mainPage")
+        result = yield Step('_make_sdk_request', url, method='GET')
 
         # if not result.get('Data') or not result['Data'].get('VideoBenefitModule'):
         if not result.get('Data') or not result['Data'].get('DailyBenefitModule'):
             raise QidianError("获取激励任务列表失败")
-            
+
+        self._adv_snapshot = result
         return result
 
+    def invalidate_adv_job(self) -> None:
+        """使激励任务列表缓存失效"""
+        self._adv_snapshot = None
+
     def do_adv_job(self, task_id: str) -> dict:
         """完成单个激励任务"""
-        url = "https://h5.if.qidian.com/argus/api/v1/video/adv/finishWatch"
+        return self._drive(self._do_adv_job_flow(task_id))
+
+    def _do_adv_job_flow(self, task_id: str) -> Flow:
+        url = self._url('sdk', "/argus/api/v1/video/adv/finishWatch")
         data = {
             'taskId': task_id,
             'BanId': '0',
@@ -674,13 +1111,15 @@ class QidianClient:
             'PhoneNumber': '',
             'SessionKey': '',
         }
-        
-        result = self._make_request_with_captcha(url, data, method='POST')
+
+        # 无论结果如何，任务状态都可能已变化
+        self.invalidate_adv_job()
+        result = yield from self._captcha_request_flow(url, data, method='POST')
 
         # 处理特殊结果
         if isinstance(result, dict) and result.get('status') == 'captcha_failed':
             return result
-        
+
         # 处理特殊结果
         if isinstance(result, dict) and result.get('status') == 'captcha':
             return result
@@ -695,25 +1134,28 @@ class QidianClient:
 
     def advjob(self) -> dict:
         """执行激励碎片任务"""
+        return self._drive(self._advjob_flow())
+
+    def _advjob_flow(self) -> Flow:
         try:
             # 获取任务列表
-            result = self.get_adv_job()
+            result = yield from self._get_adv_job_flow()
             # task_list = result['Data']['VideoBenefitModule']['TaskList']
             task_list = result['Data']['DailyBenefitModule']['TaskList']
-            
+
             # 如果所有任务已完成
             if task_list[-1]['IsFinished'] == 1:
                 logger.info("激励碎片任务已经完成")
                 return {'status': 'success'}
-                
+
             # 执行未完成的任务
             for i, task in enumerate(task_list):
                 if task['IsFinished'] == 0:
                     logger.info(f"正在执行第{i+1}个任务")
-                    result = self.do_adv_job(task['TaskId'])
+                    result = yield from self._do_adv_job_flow(task['TaskId'])
 
                     if result.get('status') == 'success':
-                        time.sleep(random.randint(1, 2))
+                        continue
                     elif result.get('status') == 'captcha':
                         logger.warning("无法处理的验证码类型")
                         return result
@@ -723,87 +1165,92 @@ class QidianClient:
                     else:
                         logger.error("执行激励任务失败")
                         return {'status': 'failed'}
-            
+
             # 验证任务是否全部完成
-            check_result = self.get_adv_job()
+            check_result = yield from self._get_adv_job_flow()
             check_task_list = check_result['Data']['DailyBenefitModule']['TaskList']
             all_finished = all(task["IsFinished"] for task in check_task_list)
-            
+
             if all_finished:
                 logger.info("激励碎片任务完成")
                 return {'status': 'success'}
-                
+
             logger.error("激励碎片任务未完成")
             return {'status': 'failed', 'code': 10086}
-            
+
         except Exception as e:
             logger.error(f"激励任务异常: {e}")
             return {'status': 'error', 'error': str(e)}
 
     def exadvjob(self) -> dict:
         """执行额外章节卡任务"""
+        return self._drive(self._exadvjob_flow())
+
+    def _exadvjob_flow(self) -> Flow:
         try:
             # 获取任务列表
-            result = self.get_adv_job()
+            result = yield from self._get_adv_job_flow()
             # task_list = result['Data']['CountdownBenefitModule']['TaskList']
             task_list = result['Data']['VideoRewardTab']['TaskList']
-            
+
             for task in task_list:
                 if task['Title'] == "完成3个广告任务得奖励":
                     if task['IsReceived'] == 1:
                         logger.info("额外章节卡任务已完成")
                         return {'status': 'success'}
-                        
+
                     for i in range(3):
-                        task_result = self.do_adv_job(task['TaskId'])
-                        
+                        task_result = yield from self._do_adv_job_flow(task['TaskId'])
+
                         if task_result.get('status') == 'success':
-                            time.sleep(random.randint(1, 2))
-                        elif result.get('status') == 'captcha':
+                            continue
+                        elif task_result.get('status') == 'captcha':
                             logger.warning("无法处理的验证码类型")
-                            return result
-                        elif result.get('status') == 'captcha_failed':
-                            logger.error(f"验证码处理失败: {result.get('reason')}")
-                            return result  # 返回详细失败原因
+                            return task_result
+                        elif task_result.get('status') == 'captcha_failed':
+                            logger.error(f"验证码处理失败: {task_result.get('reason')}")
+                            return task_result  # 返回详细失败原因
                         else:
                             logger.error("执行额外章节卡任务失败")
                             continue
-                
+
             # 检查任务状态
-            check_result = self.get_adv_job()
+            check_result = yield from self._get_adv_job_flow()
             check_task_list = check_result['Data']['VideoRewardTab']['TaskList']
-            
+
             for task in check_task_list:
                 if task['Title'] == "完成3个广告任务得奖励":
                     if task['IsReceived'] == 1:
                         logger.info("额外章节卡任务完成")
                         return {'status': 'success'}
-                        
+
                     logger.error("额外章节卡任务未完成")
                     return {'status': 'failed', 'code': 10086}
-                    
+
             logger.error("未找到额外章节卡任务")
             return {'status': 'error'}
-            
+
         except Exception as e:
             logger.error(f"额外章节卡任务异常: {e}")
             return {'status': 'error', 'error': str(e)}
-        
-    def do_game(self) -> dict:
-        """执行游戏中心任务"""
-        def generate_trackid():
-            """
-            生成符合JavaScript代码逻辑的trackId
-            格式：8-4-4-4-12的十六进制字符串，如: xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx
-            """
-            template = "xxxxxxxx-xxxxxxxx-xxxxxxxx-xxxxxxxx"
-            hex_chars = "0123456789abcdef"  # 小写十六进制字符集
-            return ''.join(
-                random.choice(hex_chars) if c == 'x' else c 
-                for c in template
-            )
-        
-        headers = {
+
+
+    @staticmethod
+    def _generate_trackid() -> str:
+        """
+        生成符合JavaScript代码逻辑的trackId
+        格式：8-4-4-4-12的十六进制字符串，如: xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx
+        """
+        template = "xxxxxxxx-xxxxxxxx-xxxxxxxx-xxxxxxxx"
+        hex_chars = "0123456789abcdef"  # 小写十六进制字符集
+        return ''.join(
+            random.choice(hex_chars) if c == 'x' else c 
+            for c in template
+        )
+
+    def _game_headers(self) -> Dict[str, str]:
+        """游戏中心请求头"""
+        return {
             'User-Agent': self.config.user_agent,
             'Accept': 'application/json, text/plain, */*',
             'Origin': 'https://qdgame.qidian.com',
@@ -815,185 +1262,219 @@ class QidianClient:
             'Accept-Language': 'zh-CN,zh;q=0.9,en-US;q=0.8,en;q=0.7',
         }
 
-        try: 
-            # 获取任务列表
-            result = self.get_adv_job()
-            task_list = result['Data']['MoreRewardTab']['TaskList']
-            game_url = ''
-            type_gamejob = 0
-            for task in task_list:
-                if task['Title'] == "当日玩游戏10分钟":
-                    type_gamejob = 1
-                    is_finished = task['IsFinished']
-                    is_received = task['IsReceived']
-                    game_url = task['ActionUrl']
-                    taskid = task['TaskId']
-                    remaining_time = int(task['Total'])-int(task['Process'])
-                    if is_received == 1:
-                        logger.info("游戏中心任务已完成")
-                        return {'status': 'success'}
-                    elif (is_finished == 1 and is_received == 0) or (remaining_time <= 0):
-                        logger.info("游戏中心任务已完成，奖励未领取")
-                        logger.info("开始领取游戏中心任务奖励")
-                        result = self.do_adv_job(taskid)
-                        if result.get('status') == 'success':
-                            logger.info("游戏任务领取成功")
-                            return {'status': 'success'}
-                        elif result.get('status') == 'captcha':
-                            logger.warning("无法处理的验证码类型")
-                            return result
-                        elif result.get('status') == 'captcha_failed':
-                            logger.error(f"验证码处理失败: {result.get('reason')}")
-                            return result  # 返回详细失败原因
-                        else:
-                            logger.error("游戏中心任务领取失败")
-                            return {'status': 'error', 'error': '未知异常'}
-                    else:
-                        logger.info("游戏中心任务未完成，开始执行游戏中心任务")
-                if re.fullmatch(r"首次玩.*10分钟", task['Title']):
-                    type_gamejob = 2
-                    is_finished = task['IsFinished']
-                    is_received = task['IsReceived']
-                    game_url = task['ActionUrl']
-                    taskid = task['TaskId']
-                    remaining_time = int(task['Total'])-int(task['Process'])
-                    if is_received == 1:
-                        logger.info("游戏中心任务已完成")
-                        return {'status': 'success'}
-                    elif (is_finished == 1 and is_received == 0) or (remaining_time <= 0):
-                        logger.info("游戏中心任务已完成，奖励未领取")
-                        logger.info("开始领取游戏中心任务奖励")
-                        result = self.do_adv_job(taskid)
-                        if result.get('status') == 'success':
-                            logger.info("游戏任务领取成功")
-                            return {'status': 'success'}
-                        elif result.get('status') == 'captcha':
-                            logger.warning("无法处理的验证码类型")
-                            return result
-                        elif result.get('status') == 'captcha_failed':
-                            logger.error(f"验证码处理失败: {result.get('reason')}")
-                            return result  # 返回详细失败原因
-                        else:
-                            logger.error("游戏中心任务领取失败")
-                            return {'status': 'error', 'error': '未知异常'}
-                    else:
-                        logger.info("游戏中心任务未完成，开始执行游戏中心任务")
-            if not game_url or not taskid: 
-                logger.error("游戏中心任务未找到")
-                return {'status': 'failed', 'code': 10086}
-            if type_gamejob == 1:
-                match = re.search(r'partnerid=(\d+)', game_url)
-                if not match:
-                    logger.error("游戏中心任务URL错误")
-                    return {'status': 'failed', 'code': 10086}
-                game_id = 201796
-                partnerid = match.group(1)
-            elif type_gamejob == 2:
-                match = re.search(r'/game/(\d+).*?partnerid=(\d+)', game_url)
-                if not match:
-                    logger.error("游戏中心任务URL错误")
-                    return {'status': 'failed', 'code': 10086}
-                game_id = match.group(1)
-                partnerid = match.group(2)
-                
-            else:
-                logger.error(f"游戏中心任务类型异常: {type_gamejob}")
-                return {'status': 'error', 'error': '游戏中心任务类型异常'}
-            game_url = f"https://qdgame.qidian.com/game/{game_id}?partnerid={partnerid}"
-            logger.info(f"游戏中心任务URL: {game_url}")
-            url_track = 'https://lygame.qidian.com/home/statistic/track'
-            params_get_PHPSESSID = {
-                'action': 'gameball_impression',
-                'positionType': '0',
-                'gameId': '0',
-                'url': game_url,
-                'origin': 'https://qdgame.qidian.com',
-                # '_t': '0.05669065654385208',
-                'platformId': '1',
+    @staticmethod
+    def _game_title_type(title: str) -> int:
+        """根据任务标题判断游戏任务类型，0表示非游戏任务"""
+        if title == "当日玩游戏10分钟":
+            return 1
+        if FIRST_GAME_TITLE_PATTERN.fullmatch(title):
+            return 2
+        return 0
+
+    def _find_game_task(self, task_list: List[dict]) -> Optional[Dict[str, Any]]:
+        """从MoreRewardTab任务列表中查找游戏中心任务"""
+        game_task = None
+        for task in task_list:
+            game_type = self._game_title_type(task['Title'])
+            if not game_type:
+                continue
+            game_task = {
+                'type': game_type,
+                'is_finished': task['IsFinished'],
+                'is_received': task['IsReceived'],
+                'game_url': task['ActionUrl'],
+                'taskid': task['TaskId'],
+                'remaining_time': int(task['Total'])-int(task['Process']),
             }
-            response_PHPSESSID = self.session.get(url_track, params=params_get_PHPSESSID, headers=headers, cookies=self.config.cookies)
-            logger.debug(f"response_PHPSESSID: {response_PHPSESSID.text}")
-            if not response_PHPSESSID.status_code == 200: 
-                logger.error("获取进程ID失败")
-                return {'status': 'failed', 'code': 10086}
-            res = response_PHPSESSID.json()
-            if res.get('code') != 0 or not res.get('msg'):
-                logger.error("获取进程ID失败")
+            if game_task['is_received'] == 1 or self._game_claimable(game_task):
+                return game_task
+            logger.info("游戏中心任务未完成，开始执行游戏中心任务")
+        return game_task
+
+    @staticmethod
+    def _game_claimable(game_task: Dict[str, Any]) -> bool:
+        """游戏时长已满足但奖励未领取"""
+        return ((game_task['is_finished'] == 1 and game_task['is_received'] == 0)
+                or game_task['remaining_time'] <= 0)
+
+    def _parse_game_url(self, game_task: Dict[str, Any]) -> Optional[tuple]:
+        """解析游戏任务URL，返回(game_id, partnerid)"""
+        if game_task['type'] == 1:
+            match = GAME_PARTNERID_PATTERN.search(game_task['game_url'])
+            if not match:
+                logger.error("游戏中心任务URL错误")
+                return None
+            return 201796, match.group(1)
+        match = GAME_URL_PATTERN.search(game_task['game_url'])
+        if not match:
+            logger.error("游戏中心任务URL错误")
+            return None
+        return match.group(1), match.group(2)
+
+    @staticmethod
+    def _game_track_params(game_url: str) -> Dict[str, str]:
+        """获取PHESSID的埋点请求参数"""
+        return {
+            'action': 'gameball_impression',
+            'positionType': '0',
+            'gameId': '0',
+            'url': game_url,
+            'origin': 'https://qdgame.qidian.com',
+            # '_t': '0.05669065654385208',
+            'platformId': '1',
+        }
+
+    @staticmethod
+    def _game_claim_result(result: dict) -> dict:
+        """处理直接领取游戏奖励的结果"""
+        if result.get('status') == 'success':
+            logger.info("游戏任务领取成功")
+            return {'status': 'success'}
+        elif result.get('status') == 'captcha':
+            logger.warning("无法处理的验证码类型")
+            return result
+        elif result.get('status') == 'captcha_failed':
+            logger.error(f"验证码处理失败: {result.get('reason')}")
+            return result  # 返回详细失败原因
+        logger.error("游戏中心任务领取失败")
+        return {'status': 'error', 'error': '未知异常'}
+
+    def _game_received_result(self, task_list: List[dict]) -> Optional[dict]:
+        """检查游戏中心任务奖励是否已领取"""
+        for task in task_list:
+            if self._game_title_type(task['Title']):
+                if task['IsReceived'] == 1:
+                    logger.info("游戏中心任务已完成")
+                    return {'status': 'success'}
+                logger.error("游戏中心任务未完成")
                 return {'status': 'failed', 'code': 10086}
-            PHESSID = response_PHPSESSID.cookies.get('PHESSID')
-            logger.debug(f"PHESSID: {PHESSID}")
-            cookies = self.config.cookies.copy()
-            trackid = generate_trackid()
-            cookies['PHESSID'] = PHESSID
-            cookies['trackid'] = trackid
-            def heartbeat(game_id: int, full_time: int=690):
-                run_time = 0
-                url_heartbeat = "https://lygame.qidian.com/home/log/heartbeat"
-                params_heartbeat = {
+        return None
+
+    def _prepare_game_flow(self) -> Flow:
+        """
+        获取游戏中心任务并完成心跳前的准备
+        :return: 任务已结束时为最终结果，需要心跳时为 {'status': 'ready', 'game': 游戏会话信息}
+        """
+        result = yield from self._get_adv_job_flow()
+        game_task = self._find_game_task(result['Data']['MoreRewardTab']['TaskList'])
+        if not game_task or not game_task['game_url'] or not game_task['taskid']:
+            logger.error("游戏中心任务未找到")
+            return {'status': 'failed', 'code': 10086}
+        if game_task['is_received'] == 1:
+            logger.info("游戏中心任务已完成")
+            return {'status': 'success'}
+        if self._game_claimable(game_task):
+            logger.info("游戏中心任务已完成，奖励未领取")
+            logger.info("开始领取游戏中心任务奖励")
+            return self._game_claim_result((yield from self._do_adv_job_flow(game_task['taskid'])))
+
+        parsed = self._parse_game_url(game_task)
+        if not parsed:
+            return {'status': 'failed', 'code': 10086}
+        game_id, partnerid = parsed
+        headers = self._game_headers()
+        game_url = f"https://qdgame.qidian.com/game/{game_id}?partnerid={partnerid}"
+        logger.info(f"游戏中心任务URL: {game_url}")
+        url_track = self._url('game', '/home/statistic/track')
+        params_get_PHPSESSID = self._game_track_params(game_url)
+        status, text, response_cookies = yield Step('_request', 'GET', url_track, params=params_get_PHPSESSID,
+                                                    headers=headers, cookies=self.cookies)
+        logger.debug(f"response_PHPSESSID: {text}")
+        if not status == 200:
+            logger.error("获取进程ID失败")
+            return {'status': 'failed', 'code': 10086}
+        res = json.loads(text)
+        if res.get('code') != 0 or not res.get('msg'):
+            logger.error("获取进程ID失败")
+            return {'status': 'failed', 'code': 10086}
+        PHESSID = response_cookies.get('PHESSID', '')
+        logger.debug(f"PHESSID: {PHESSID}")
+        cookies = self.cookies.copy()
+        cookies['PHESSID'] = PHESSID
+        cookies['trackid'] = self._generate_trackid()
+        return {
+            'status': 'ready',
+            'game': {
+                'taskid': game_task['taskid'],
+                'params': {
                     'gameId': str(game_id),
                     'platformId': '1',
-                }
-                while run_time < full_time:
-                    response_heartbeat = self.session.get(url_heartbeat, params=params_heartbeat, cookies=cookies, headers=headers)
-                    res = response_heartbeat.json()
-                    if not res.get('code') == 0 or not res.get('data'):
-                        logger.error("心跳失败")
-                        return {'status': 'failed', 'code': 10086}
-                    next_time = int(res.get('data'))
-                    logger.info(f"心跳成功，下一次心跳间隔: {next_time}")
-                    run_time += next_time
-                    time.sleep(next_time)
-            heartbeat(game_id,(remaining_time+1)*60) # 多加一分钟，避免游戏时间不足
-            logger.info("游戏中心任务结束，开始获取奖励")
-            task_result = self.do_adv_job(taskid)
-            if task_result.get('status') == 'success':
-                logger.info("检查完成情况")
-                result = self.get_adv_job()
-                task_list = result['Data']['MoreRewardTab']['TaskList']
-                for task in task_list:
-                    if task['Title'] == "当日玩游戏10分钟":
-                        is_received = task['IsReceived']
-                        if is_received == 1:
-                            logger.info("游戏中心任务已完成")
-                            return {'status': 'success'}
-                        else:
-                            logger.error("游戏中心任务未完成")
-                            return {'status': 'failed', 'code': 10086}
-                    if re.fullmatch(r"首次玩.*10分钟", task['Title']):
-                        is_received = task['IsReceived']
-                        if is_received == 1:
-                            logger.info("游戏中心任务已完成")
-                            return {'status': 'success'}
-                        else:
-                            logger.error("游戏中心任务未完成")
-                            return {'status': 'failed', 'code': 10086}
-            elif task_result.get('status') == 'captcha':
-                logger.warning("遇到验证码")
-                return task_result
-            else:
-                logger.error("执行游戏中心任务失败")
-                return {'status': 'failed', 'code': 10086}
+                },
+                'cookies': cookies,
+                'headers': headers,
+                'full_time': (game_task['remaining_time']+1)*60,  # 多加一分钟，避免游戏时间不足
+            },
+        }
+
+    def _game_heartbeat_flow(self, game: Dict[str, Any]) -> Flow:
+        """发送一次游戏心跳，返回下次心跳间隔（秒），失败返回None"""
+        url_heartbeat = self._url('game', "/home/log/heartbeat")
+        _, text, _ = yield Step('_request', 'GET', url_heartbeat, params=game['params'],
+                                cookies=game['cookies'], headers=game['headers'])
+        res = json.loads(text)
+        if not res.get('code') == 0 or not res.get('data'):
+            logger.error("心跳失败")
+            return None
+        next_time = int(res.get('data'))
+        logger.info(f"心跳成功，下一次心跳间隔: {next_time}")
+        return next_time
+
+    def _finish_game_flow(self, game: Dict[str, Any]) -> Flow:
+        """心跳结束后领取奖励并检查完成情况"""
+        logger.info("游戏中心任务结束，开始获取奖励")
+        task_result = yield from self._do_adv_job_flow(game['taskid'])
+        if task_result.get('status') == 'success':
+            logger.info("检查完成情况")
+            result = yield from self._get_adv_job_flow()
+            return self._game_received_result(result['Data']['MoreRewardTab']['TaskList'])
+        elif task_result.get('status') == 'captcha':
+            logger.warning("遇到验证码")
+            return task_result
+        else:
+            logger.error("执行游戏中心任务失败")
+            return {'status': 'failed', 'code': 10086}
+
+    def do_game(self) -> dict:
+        """
+        执行游戏中心任务
+        设置了心跳调度器时不会阻塞等待心跳，而是返回 {'status': 'pending', 'wait': 可调用对象}，
+        调用 wait() 等待心跳结束并获取最终结果（异步客户端中直接等待调度器，不阻塞事件循环）
+        """
+        return self._drive(self._do_game_flow())
+
+    def _do_game_flow(self) -> Flow:
+        try:
+            prepared = yield from self._prepare_game_flow()
+            if prepared.get('status') != 'ready':
+                return prepared
+            game = prepared['game']
+
+            yield Step('_run_heartbeats', game)
+            return (yield from self._finish_game_flow(game))
         except Exception as e:
             logger.error(f"执行游戏中心任务异常: {e}")
             return {'status': 'error', 'error': str(e)}
 
     def lottery(self) -> dict:
         """执行每日抽奖任务"""
+        return self._drive(self._lottery_flow())
+
+    def _lottery_flow(self) -> Flow:
         try:
-            url = "https://h5.if.qidian.com/argus/api/v2/checkin/detail"
-            result = self._make_sdk_request(url, method='GET')
-            
+            url = self._url('sdk', "/argus/api/v2/checkin/detail")
+            result = yield Step('_make_sdk_request', url, method='GET')
+
             video_chance = result['Data']['LotteryInfo']['HasVideoUrge']
             lottery_chance = result['Data']['LotteryInfo']['LotteryCount']
-            
+
             if lottery_chance == 0 and video_chance == 0:
                 logger.info("抽奖机会已用完")
                 return {'status': 'success'}
-                
+
             logger.info(f"观看视频机会: {video_chance}次, 抽奖机会: {lottery_chance}次")
-            
+
             for i in range(video_chance):
-                url_video = "https://h5.if.qidian.com/argus/api/v2/video/callback"
+                url_video = self._url('sdk', "/argus/api/v2/video/callback")
                 data_video = {
                     'sessionKey': '',
                     'banId': '0',
@@ -1006,8 +1487,8 @@ class QidianClient:
                     'adId': '6050165817126400',
                     'videoSucc': '1',
                 }
-                
-                video_result = self._make_sdk_request(url_video, data=data_video, method='POST')
+
+                video_result = yield Step('_make_sdk_request', url_video, data=data_video, method='POST')
 
                 # 明确处理可能的验证码情况（虽然理论上不应该发生）
                 if video_result.get('is_captcha'):
@@ -1015,15 +1496,14 @@ class QidianClient:
                     logger.warning("抽奖任务中意外遇到验证码，可能是API变更")
                     # 可以选择尝试解决或直接失败
                     return {'status': 'failed', 'reason': '意外验证码'}
-                
+
                 if video_result.get('Result') in (0, "0"):
                     logger.info(f"观看第{i+1}次视频成功")
-                    time.sleep(random.randint(1, 2))
                 else:
                     logger.error("观看抽奖视频失败")
                     return {'status': 'failed'}
-            
-            url_lottery = "https://h5.if.qidian.com/argus/api/v2/checkin/lottery"
+
+            url_lottery = self._url('sdk', "/argus/api/v2/checkin/lottery")
             data_lottery = {
                 'sessionKey': '',
                 'banId': '0',
@@ -1033,151 +1513,242 @@ class QidianClient:
                 'validate': '',
                 'seccode': '',
             }
-            
+
             total_chance = lottery_chance + video_chance
             for i in range(total_chance):
-                lottery_result = self._make_sdk_request(url_lottery, data=data_lottery, method='POST')
-                
+                lottery_result = yield Step('_make_sdk_request', url_lottery, data=data_lottery, method='POST')
+
                 if lottery_result.get('is_captcha'):
                     return {'status': 'captcha', 'captcha_data': lottery_result['captcha_data']}
-                
+
                 if lottery_result.get('Result') == 0:
                     logger.info(f"第{i+1}次抽奖成功")
-                    time.sleep(random.randint(1, 2))
                 else:
                     logger.error("抽奖失败")
                     return {'status': 'failed'}
-            
-            check_result = self._make_sdk_request(url, method='GET')
+
+            check_result = yield Step('_make_sdk_request', url, method='GET')
             check_video = check_result['Data']['LotteryInfo']['HasVideoUrge']
             check_lottery = check_result['Data']['LotteryInfo']['LotteryCount']
-            
+
             if check_video == 0 and check_lottery == 0:
                 logger.info("抽奖任务完成")
                 return {'status': 'success'}
-                
+
             logger.error("抽奖任务未完成")
             return {'status': 'failed', 'code': 10086}
-            
+
         except Exception as e:
             logger.error(f"抽奖任务异常: {e}")
             return {'status': 'error', 'error': str(e)}
-    
+
     # 其他核心功能方法...
 
+# 任务依赖图，依赖的任务必须先添加，添加顺序即同步模式下的执行顺序
+# mainPage: 激励碎片、章节卡和游戏中心任务共用的激励任务列表缓存，完成任务后缓存失效，不能交错执行
+# 新任务可通过 DEFAULT_TASKS.add(TaskSpec(...)) 添加，不需要修改 TaskProcessor
+DEFAULT_TASKS = TaskGraph([
+    TaskSpec('签到任务', 'qdsign'),
+    TaskSpec('激励碎片任务', 'advjob', resources=('mainPage',)),
+    TaskSpec('章节卡任务', 'exadvjob', after=('激励碎片任务',), resources=('mainPage',)),
+    TaskSpec('游戏中心任务', 'do_game', after=('章节卡任务',), resources=('mainPage',)),
+    # 签到后才有当天的抽奖机会
+    TaskSpec('每日抽奖任务', 'lottery', after=('签到任务',)),
+])
+
 class TaskProcessor:
-    """任务处理器"""
-    def __init__(self, client: QidianClient, user: UserConfig, retry_attempts: int = 3):
+    """
+    任务处理器
+    按任务依赖图执行任务：依赖的任务结束且资源空闲时才开始，转入后台等待的任务（如游戏心跳）
+    结束前继续占用资源，依赖它的任务也会等待，其余任务照常执行
+    """
+    graph = DEFAULT_TASKS
+
+    def __init__(self, client: QidianClient, user: UserConfig, retry_attempts: int = 3,
+                 state_store: Optional[DailyStateStore] = None):
+        """
+        :param state_store: 每日任务状态，设置后今天已完成的任务不再执行
+        """
         self.client = client
         self.user = user
-        self.task_results = {}
+        self.task_results: Dict[str, TaskResult] = {}
         self.retry_attempts = retry_attempts  # 从全局配置中获取
+        self.pending_tasks = {}  # 任务名 -> (尝试次数, wait, task_func)
+        self.state_store = state_store
+        self.schedule: Optional[TaskRun] = None
     
-    def run_task(self, task_name: str, task_func: Callable) -> None:
+    def run_task(self, task_name: str, task_func: Callable, start_attempt: int = 1) -> None:
         """运行单个任务"""
         if not self.user.tasks.get(task_name, False):
             logger.info(f"任务[{task_name}]已禁用，跳过执行")
             return
+        if self._skip_completed(task_name):
+            return
             
-        logger.info(f"开始执行任务: {task_name}")
-        for attempt in range(1, self.retry_attempts + 1):
+        if start_attempt == 1:
+            logger.info(f"开始执行任务: {task_name}")
+        for attempt in range(start_attempt, self.retry_attempts + 1):
             logger.info(f"开始第{attempt}次尝试")
             try:
                 result = task_func()
+                if isinstance(result, dict) and result.get('status') == 'pending':
+                    # 任务在后台等待（如游戏心跳），先执行后续任务
+                    logger.info(f"任务[{task_name}]转入后台等待，继续执行其他任务")
+                    self.pending_tasks[task_name] = (attempt, result['wait'], task_func)
+                    return
+                delay = self._handle_result(task_name, result, attempt)
+            except Exception as e:
+                delay = self._handle_exception(task_name, e, attempt)
 
-                if isinstance(result, dict):
-                    status = result.get('status')
-                    if status == 'success':
-                        logger.info(f"任务[{task_name}]执行完成: 成功")
-                        self.task_results[task_name] = result
-                        break
-                    elif status == 'captcha_failed':
-                        # 明确区分验证码失败和其他错误
-                        reason = result.get('reason', '未知原因')
-                        captcha_data = result.get('captcha_data', {})
-                        logger.error(f"任务[{task_name}]因验证码失败: {reason}")
-                        logger.debug(f"验证码数据: {json.dumps(captcha_data, ensure_ascii=False)}")
-                        
-                        # 保存详细错误信息用于推送
-                        self.task_results[task_name] = {
-                            'status': 'captcha_failed',
-                            'reason': reason,
-                            'captcha_data': captcha_data
-                        }
-                        # break
-                    elif status == 'captcha':
-                        logger.warning(f"任务[{task_name}]因验证码中断")
-                        self.task_results[task_name] = result
-                        break
-                    # elif status == 'failed':
-                    #     logger.error(f"任务[{task_name}]执行失败: {result.get('reason', '未知原因')}")
-                    #     self.task_results[task_name] = result
-                    #     break
-                    else:
-                        if attempt < self.retry_attempts:
-                            logger.warning(f"任务[{task_name}]第{attempt}次执行失败，正在重试...")
-                            time.sleep(random.uniform(1, 2))
-                        else:
-                            logger.error(f"任务[{task_name}]执行失败，已达到最大重试次数")
-                            self.task_results[task_name] = result
-                else:
-                    logger.error(f"任务[{task_name}]返回格式错误")
-                    self.task_results[task_name] = {'status': 'failed', 'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')}
-                    break
+            if delay is None:
+                break
+            if delay:
+                time.sleep(delay)
 
-            except Exception as e:
-                if attempt < self.retry_attempts:
-                    logger.warning(f"任务[{task_name}]第{attempt}次执行异常: {e}，正在重试...")
-                    time.sleep(random.uniform(1, 2))
-                else:
-                    logger.error(f"任务[{task_name}]执行异常: {e}")
-                    self.task_results[task_name] = {
-                        'status': 'error',
-                        'error': str(e),
-                        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-                    }
-    
-    def process_all_tasks(self) -> Dict[str, Any]:
-        """处理所有任务"""
-        tasks = [
-            ('签到任务', self.client.qdsign),
-            ('激励碎片任务', self.client.advjob),
-            ('章节卡任务', self.client.exadvjob),
-            ('游戏中心任务', self.client.do_game),
-            ('每日抽奖任务', self.client.lottery)
-            # ('其他任务', self.other_task_func),
-            # 添加其他任务...
-        ]
-        
-        for task_name, task_func in tasks:
-            self.run_task(task_name, task_func)
+    def _skip_completed(self, task_name: str) -> bool:
+        """今天已完成的任务直接记为成功，不再请求服务器"""
+        if self.state_store is None or not self.state_store.is_done(self.user.username, task_name):
+            return False
+        logger.info(f"任务[{task_name}]今日已完成，跳过执行")
+        self.task_results[task_name] = TaskResult('success', skipped=True)
+        return True
+
+    def all_completed(self) -> bool:
+        """启用的任务今天是否都已完成"""
+        if self.state_store is None:
+            return False
+        return all(self.state_store.is_done(self.user.username, task_name)
+                   for task_name, _ in self.get_tasks() if self.user.tasks.get(task_name, False))
+
+    def _handle_result(self, task_name: str, result: Any, attempt: int) -> Optional[float]:
+        """
+        记录单次任务执行结果
+        :return: None表示结束重试，否则为下次重试前的等待秒数
+        """
+        if not isinstance(result, dict):
+            logger.error(f"任务[{task_name}]返回格式错误")
+            self.task_results[task_name] = TaskResult.from_task(result)
+            return None
+
+        status = result.get('status')
+        if status == 'success':
+            logger.info(f"任务[{task_name}]执行完成: 成功")
+            self.task_results[task_name] = TaskResult.from_task(result)
+            if self.state_store is not None:
+                self.state_store.mark_done(self.user.username, task_name)
+            return None
+        elif status == 'captcha_failed':
+            # 明确区分验证码失败和其他错误
+            reason = result.get('reason', '未知原因')
+            captcha_data = result.get('captcha_data', {})
+            logger.error(f"任务[{task_name}]因验证码失败: {reason}")
+            logger.debug(f"验证码数据: {json.dumps(captcha_data, ensure_ascii=False)}")
+            
+            # 保存详细错误信息用于推送
+            self.task_results[task_name] = TaskResult('captcha_failed', reason=reason, captcha_data=captcha_data)
+            return 0
+        elif status == 'captcha':
+            logger.warning(f"任务[{task_name}]因验证码中断")
+            self.task_results[task_name] = TaskResult.from_task(result)
+            return None
+        # elif status == 'failed':
+        #     logger.error(f"任务[{task_name}]执行失败: {result.get('reason', '未知原因')}")
+        #     self.task_results[task_name] = result
+        #     return None
         
+        if attempt < self.retry_attempts:
+            logger.warning(f"任务[{task_name}]第{attempt}次执行失败，正在重试...")
+            return self.client.pacer.retry_delay()
+        logger.error(f"任务[{task_name}]执行失败，已达到最大重试次数")
+        self.task_results[task_name] = TaskResult.from_task(result)
+        return 0
+
+    def _handle_exception(self, task_name: str, e: Exception, attempt: int) -> float:
+        """记录单次任务执行异常，返回下次重试前的等待秒数"""
+        if attempt < self.retry_attempts:
+            logger.warning(f"任务[{task_name}]第{attempt}次执行异常: {e}，正在重试...")
+            return self.client.pacer.retry_delay()
+        logger.error(f"任务[{task_name}]执行异常: {e}")
+        self.task_results[task_name] = TaskResult('error', reason=str(e))
+        return 0
+    
+    def get_tasks(self) -> List[tuple]:
+        """按依赖图的添加顺序返回 (任务名, 客户端方法) 列表"""
+        return [(spec.name, getattr(self.client, spec.method)) for spec in self.graph]
+
+    def _run_ready(self) -> None:
+        """依次执行依赖已结束且资源空闲的任务，直到没有可以开始的任务"""
+        while True:
+            spec = self.schedule.next_ready()
+            if spec is None:
+                return
+            self.run_task(spec.name, getattr(self.client, spec.method))
+            if spec.name not in self.pending_tasks:
+                self.schedule.finish(spec.name)
+
+    def resolve_pending(self) -> None:
+        """等待后台任务结束，失败时按剩余次数重试"""
+        while self.pending_tasks:
+            task_name = next(iter(self.pending_tasks))
+            attempt, wait, task_func = self.pending_tasks.pop(task_name)
+            logger.info(f"等待后台任务[{task_name}]结束")
+            try:
+                delay = self._handle_result(task_name, wait(), attempt)
+            except Exception as e:
+                delay = self._handle_exception(task_name, e, attempt)
+
+            if delay is not None and attempt < self.retry_attempts:
+                if delay:
+                    time.sleep(delay)
+                self.run_task(task_name, task_func, start_attempt=attempt + 1)
+            if task_name not in self.pending_tasks and self.schedule is not None:
+                # 后台任务结束后，等待它或它占用资源的任务可以开始了
+                self.schedule.finish(task_name)
+                self._run_ready()
+
+    def process_all_tasks(self, resolve_pending: bool = True) -> Dict[str, TaskResult]:
+        """
+        处理所有任务
+        :param resolve_pending: 是否等待后台任务结束，为False时需要调用方稍后调用 resolve_pending()
+        """
+        self.schedule = TaskRun(self.graph)
+        self._run_ready()
+
+        if resolve_pending:
+            self.resolve_pending()
         return self.task_results
 
 class MainApp:
     """主程序"""
     def __init__(self):
         self.config_manager = None  # 延迟初始化
+        self.heartbeat_scheduler = None
+        self.pacing_policy = None
+        self.http_pool = None
+        self.retry_policy = None
+        self.state_store = None
+        self.cookie_store = None
+        self.captcha_pool = None
+        self.risk_ledger = None
+        # 登录预检通过的用户名 -> 昵称，执行任务时不再重复检查登录
+        self.verified_users: Dict[str, str] = {}
+        self.notifier = None
+        self.digest = None
+        self.profiler = None
 
     def pre_check(self) -> bool:
-        """运行前的文件存在性检查"""
+        """
+        运行前检查配置文件，检查通过后的配置直接用于本次运行，不再重复读取
+        cookies 文件在加载各用户时检查，缺失的用户单独跳过
+        """
         if not os.path.exists(CONFIG_FILE):
             logger.error(f"配置文件 {CONFIG_FILE} 不存在，请检查路径是否正确")
             return False
 
         try:
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-
-            for user_data in config.get('users', []):
-                username = user_data.get('username', '未知')
-                cookies_file = user_data.get('cookies_file', f"{COOKIES_DIR}/{username}.json")
-                if not os.path.exists(cookies_file):
-                    logger.error(f"用户 [{username}] 的 cookies 文件 {cookies_file} 不存在")
-                    return False
-
-        except Exception as e:
-            logger.error(f"读取配置文件失败: {e}")
+            self.config_manager = ConfigManager()
+        except (OSError, ValueError):
+            # 具体原因已由 ConfigManager 记录
             return False
 
         return True
@@ -1192,8 +1763,6 @@ class MainApp:
             logger.error("预检查失败，程序终止")
             return
         
-        # 初始化 ConfigManager
-        self.config_manager = ConfigManager()
         config = self.config_manager.config
 
         # 初始化日志系统
@@ -1202,47 +1771,308 @@ class MainApp:
         logger = LoggerManager().reconfigure_logger(log_level, log_retention_days)
 
         # 继续执行主流程
-        for user in self.config_manager.users:
-            logger.info(f"开始处理用户: {user.username}")
+        self.pacing_policy = PacingPolicy.from_config(config.get('pacing'))
+        self.retry_policy = RetryPolicy.from_config(config.get('request_retry'))
+        if config.get('skip_completed_tasks', True):
+            self.state_store = DailyStateStore()
+            self.state_store.cleanup()
+        if config.get('save_cookies', True):
+            self.cookie_store = CookieStore()
+        if config.get('profile_report'):
+            self.profiler = RequestProfiler()
+        self.captcha_pool = CaptchaPool.from_config(config.get('captcha'))
+        risk = config.get('risk', True)
+        if risk is not False:
+            self.risk_ledger = RiskLedger.from_config(risk)
+        push_outbox = config.get('push_outbox', True)
+        if push_outbox is False:
+            self.notifier = NotificationDispatcher()
+        else:
+            # 推送先写入发件箱，上次运行遗留的推送同时开始补发
+            self.notifier = PushOutbox.from_config(push_outbox, resolver=self.config_manager.iter_push_services)
+            self.notifier.start()
+        if config.get('push_digest'):
+            self.digest = DigestCollector()
+        try:
+            self._run_users(config)
+        finally:
+            self.captcha_pool.close()
+            if self.risk_ledger is not None:
+                self.risk_ledger.save()
+            # 推送在后台发送，全部用户处理完后再等待结果
+            if self.digest is not None:
+                self.digest.flush(self.notifier)
+            self.notifier.close()
+            if self.cookie_store is not None:
+                self.cookie_store.flush()
+            self._write_profile(config.get('profile_report'))
+
+    def _run_users(self, config: Dict[str, Any]) -> None:
+        """按配置的执行模式处理所有用户"""
+        users = self.config_manager.iter_users()
+        user_count = len(self.config_manager.registry)
+        max_concurrent_users = config.get('max_concurrent_users', 1)
+        preflight = config.get('preflight_login', True) and user_count > 1
+        preflight_workers = min(max(PREFLIGHT_WORKERS, max_concurrent_users), user_count)
+        # 所有账号的游戏心跳由同一个调度器发送，HTTP连接由同一个连接池复用
+        self.heartbeat_scheduler = HeartbeatScheduler()
+        if config.get('async_mode'):
+            try:
+                if preflight:
+                    # 异步模式的连接池在事件循环中创建，预检使用临时的同步连接池
+                    http_pool = SharedHTTPPool.from_config(config.get('http_pool'), min_maxsize=preflight_workers)
+                    try:
+                        users = self._preflight_login(users, preflight_workers, http_pool)
+                    finally:
+                        http_pool.close()
+                self._run_async(users, max_concurrent_users)
+            finally:
+                self.heartbeat_scheduler.shutdown()
+            return
+
+        min_maxsize = max(max_concurrent_users, preflight_workers) if preflight else max_concurrent_users
+        if config.get('replay'):
+            self.http_pool = create_replay_pool(config['replay'], config.get('http_pool'), min_maxsize)
+        else:
+            self.http_pool = SharedHTTPPool.from_config(config.get('http_pool'), min_maxsize=min_maxsize)
+        try:
+            if preflight:
+                users = self._preflight_login(users, preflight_workers, self.http_pool)
+                user_count = len(self.verified_users)
+            if max_concurrent_users > 1 and user_count > 1:
+                logger.info(f"并发模式: 最多同时处理{max_concurrent_users}个用户")
+                self._run_concurrent(users, max_concurrent_users)
+            else:
+                # 顺序模式下，等待游戏心跳的用户延后收尾，先处理下一个用户
+                deferred = []
+                for user in users:
+                    processor = self._process_user(user, defer_pending=True)
+                    if processor is not None:
+                        deferred.append(processor)
+                for processor in deferred:
+                    self._finish_deferred(processor)
+        finally:
+            self.heartbeat_scheduler.shutdown()
+            self.http_pool.close()
+
+    def _preflight_login(self, users: Iterable[UserConfig], workers: int,
+                         http_pool: SharedHTTPPool) -> Iterator[UserConfig]:
+        """
+        执行任务前并发检查所有用户的登录状态，返回需要执行任务的用户
+        账号分批提交检查，检查完的账号不保留在内存中，只记录登录有效的用户名，返回的用户在执行任务时重新加载；
+        登录失效的用户在开始执行任务前统一报告并推送提醒，今日任务已全部完成的用户直接跳过
+        """
+        logger.info(f"开始登录预检: {workers}个线程并发检查所有用户")
+        retry_attempts = self.config_manager.config.get('retry_attempts', 3)
 
+        def check(user: UserConfig) -> str:
+            """返回 'valid'、'invalid' 或 'completed'"""
+            set_log_user(user.username)
             try:
-                # 初始化客户端
-                client = QidianClient(user)
+                client = QidianClient(user, pacer=Pacer(self.pacing_policy), profiler=self.profiler,
+                                      http_pool=http_pool, retry_policy=self.retry_policy,
+                                      cookie_store=self.cookie_store, captcha_pool=self.captcha_pool)
                 if not client.init():
                     logger.error(f"用户: {user.username} 初始化失败")
-                    continue
+                    return 'invalid'
+                if TaskProcessor(client, user, retry_attempts, state_store=self.state_store).all_completed():
+                    logger.info(f"用户[{user.username}]今日任务已全部完成，跳过")
+                    return 'completed'
+                nickname = client.check_login()
+                if not nickname:
+                    logger.warning(f"用户[{user.username}]未登录")
+                    return 'invalid'
+                self.verified_users[user.username] = nickname
+                logger.info(f"用户[{nickname}]登录成功")
+                return 'valid'
+            except Exception as e:
+                logger.error(f"检查用户[{user.username}]登录状态时发生错误: {e}")
+                return 'invalid'
+            finally:
+                if self.cookie_store is not None:
+                    self.cookie_store.flush(user.username)
+                set_log_user(None)
+
+        valid: Set[str] = set()
+        invalid: List[str] = []
+        completed = 0
+        pending: Dict[Future, UserConfig] = {}
+
+        def collect(done: Iterable[Future]) -> None:
+            nonlocal completed
+            for future in done:
+                user = pending.pop(future)
+                status = future.result()
+                if status == 'valid':
+                    valid.add(user.username)
+                elif status == 'invalid':
+                    invalid.append(user.username)
+                    self._notify_login_failed(user)
+                else:
+                    completed += 1
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='QDjob-preflight') as executor:
+            for user in users:
+                if len(pending) >= workers * PREFLIGHT_QUEUE_PER_WORKER:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                pending[executor.submit(check, user)] = user
+            collect(wait(pending).done)
+
+        logger.info(f"登录预检完成: 共{len(valid) + len(invalid) + completed}个用户，"
+                    f"{len(valid)}个待执行，{len(invalid)}个登录失效，{completed}个今日已完成")
+        if invalid:
+            logger.warning(f"以下用户登录失效，本次不执行任务，请更新cookies: {', '.join(invalid)}")
+        return self.config_manager.iter_users(valid)
+
+    def _run_concurrent(self, users: Iterator[UserConfig], max_concurrent_users: int) -> None:
+        """固定数量的线程依次领取用户，同一时间只加载正在处理的用户"""
+        lock = threading.Lock()
+
+        def worker() -> None:
+            while True:
+                with lock:
+                    user = next(users, None)
+                if user is None:
+                    return
+                self._process_user(user)
+
+        with ThreadPoolExecutor(max_workers=max_concurrent_users, thread_name_prefix='QDjob-user') as executor:
+            for future in [executor.submit(worker) for _ in range(max_concurrent_users)]:
+                future.result()
+
+    def _write_profile(self, fmt: Optional[str]) -> None:
+        """输出请求耗时统计报告"""
+        if self.profiler is None:
+            return
+        totals = self.profiler.totals()
+        logger.info(f"耗时统计: 共{totals['requests']}次请求，节奏等待{totals['sleep']}秒，"
+                    f"签名{totals['sign']}秒，网络{totals['network']}秒，总耗时{totals['wall_time']}秒")
+        try:
+            path = self.profiler.write_report(fmt)
+            if path:
+                logger.info(f"耗时统计报告已写入: {path}")
+        except Exception as e:
+            logger.error(f"写入耗时统计报告失败: {e}")
+
+    def _process_user(self, user: UserConfig, defer_pending: bool = False) -> Optional[TaskProcessor]:
+        """
+        处理单个用户的完整任务流程
+        :param defer_pending: 为True时不等待后台任务，返回需要稍后收尾的 TaskProcessor
+        """
+        set_log_user(user.username)
+        logger.info(f"开始处理用户: {user.username}")
 
+        try:
+            # 初始化客户端，被风控过的接口按风控记录放慢节奏
+            risk = self.risk_ledger.account(user.username) if self.risk_ledger is not None else None
+            pacer = Pacer(self.pacing_policy, slowdown=risk.multiplier if risk is not None else None)
+            client = QidianClient(user, heartbeat_scheduler=self.heartbeat_scheduler,
+                                  pacer=pacer, profiler=self.profiler,
+                                  http_pool=self.http_pool, retry_policy=self.retry_policy,
+                                  cookie_store=self.cookie_store, captcha_pool=self.captcha_pool,
+                                  risk=risk)
+            if not client.init():
+                logger.error(f"用户: {user.username} 初始化失败")
+                return
+
+            retry_attempts = self.config_manager.config.get('retry_attempts', 3)
+            processor = TaskProcessor(client, user, retry_attempts, state_store=self.state_store)
+            if processor.all_completed():
+                logger.info(f"用户[{user.username}]今日任务已全部完成，跳过")
+                return
+
+            # 检查登录状态，登录预检已通过的用户不再重复检查
+            nickname = self.verified_users.get(user.username)
+            if nickname is None:
                 logger.info(f"开始检查用户[{user.username}]登录状态")
-                # 检查登录状态
                 nickname = client.check_login()
                 if not nickname:
                     logger.warning(f"用户[{user.username}]未登录")
-                    continue
-                
+                    return
+
                 logger.info(f"用户[{nickname}]登录成功")
+            
+            # 处理任务
+            results = processor.process_all_tasks(resolve_pending=not defer_pending)
+            if processor.pending_tasks:
+                logger.info(f"用户[{user.username}]有任务在后台等待，稍后汇总结果")
+                return processor
+            self._finish_user(user, results)
+            
+        except Exception as e:
+            logger.error(f"处理用户[{user.username}]时发生错误: {e}")
+        finally:
+            # 保存服务器更新的cookies
+            if self.cookie_store is not None:
+                self.cookie_store.flush(user.username)
+            set_log_user(None)
+        return None
+
+    def _finish_deferred(self, processor: TaskProcessor) -> None:
+        """等待用户的后台任务结束并发送通知"""
+        user = processor.user
+        set_log_user(user.username)
+        try:
+            processor.resolve_pending()
+            self._finish_user(user, processor.task_results)
+        except Exception as e:
+            logger.error(f"处理用户[{user.username}]时发生错误: {e}")
+        finally:
+            if self.cookie_store is not None:
+                self.cookie_store.flush(user.username)
+            set_log_user(None)
+
+    def _finish_user(self, user: UserConfig, results: Dict[str, TaskResult]) -> None:
+        """处理任务结果并发送通知"""
+        # 检测验证码并处理
+        for task_name, result in results.items():
+            if result.status == 'captcha':
+                self._handle_captcha(user, task_name, result)
+                break  # 遇到验证码后停止后续任务
+        
+        # 发送通知
+        self._send_notification(user, results)
 
-                retry_attempts = self.config_manager.config.get('retry_attempts', 3)
-                
-                # 处理任务
-                processor = TaskProcessor(client, user, retry_attempts)
-                results = processor.process_all_tasks()
-
-                # 检测验证码并处理
-                for task_name, result in results.items():
-                    if isinstance(result, dict) and result.get('status') == 'captcha':
-                        self.handle_captcha(user, result.get('captcha_data', {}))
-                        break  # 遇到验证码后停止后续任务
-                
-                # 发送通知
-                self._send_notification(user, results)
-                
-                # 保存cookies
-                # self.config_manager.save_cookies(user.username, client.session.cookies.get_dict())
-                
-            except Exception as e:
-                logger.error(f"处理用户[{user.username}]时发生错误: {e}")
+    def _handle_captcha(self, user: UserConfig, task_name: str, result: TaskResult) -> None:
+        """
+        报告客户端未能自动处理的验证码
+        支持的验证码已在客户端中提交到验证码线程池识别并重试请求，结果仍为验证码时只能由用户手动执行一次任务解除风控
+        """
+        captcha_data = result.captcha_data if isinstance(result.captcha_data, dict) else {}
+        logger.warning(f"用户[{user.username}]任务[{task_name}]遇到验证码"
+                       f"(CaptchaAId={captcha_data.get('CaptchaAId') or '未知'})，{result.reason or '未自动处理'}，"
+                       f"手动执行一次任务后可解除风控")
+
+    def _run_async(self, users: Iterable[UserConfig], max_concurrent_users: int) -> None:
+        """使用异步客户端在单个事件循环中处理所有用户"""
+        from async_client import run_users
+
+        logger.info(f"异步模式: 最多同时处理{max_concurrent_users}个用户")
+        config = self.config_manager.config
+        retry_attempts = config.get('retry_attempts', 3)
+        limit_per_host = SharedHTTPPool.options_from_config(config.get('http_pool'),
+                                                            max_concurrent_users)['pool_maxsize']
+        asyncio.run(run_users(users, retry_attempts, max_concurrent_users,
+                              pacing_policy=self.pacing_policy, profiler=self.profiler,
+                              limit_per_host=limit_per_host, retry_policy=self.retry_policy,
+                              state_store=self.state_store, cookie_store=self.cookie_store,
+                              verified_users=self.verified_users,
+                              task_concurrency=config.get('task_concurrency', DEFAULT_TASK_CONCURRENCY),
+                              captcha_pool=self.captcha_pool, risk_ledger=self.risk_ledger,
+                              heartbeat_scheduler=self.heartbeat_scheduler,
+                              on_result=self._finish_async_user))
+
+    def _finish_async_user(self, user: UserConfig, results: Dict[str, TaskResult]) -> None:
+        """异步模式下每个用户完成后立即发送通知，不等待其他用户"""
+        set_log_user(user.username)
+        try:
+            self._finish_user(user, results)
+        except Exception as e:
+            logger.error(f"处理用户[{user.username}]时发生错误: {e}")
+        finally:
+            set_log_user(None)
     
-    def _send_notification(self, user: UserConfig, results: Dict[str, Any]) -> None:
+    def _send_notification(self, user: UserConfig, results: Dict[str, TaskResult]) -> None:
         """发送通知"""
         if not user.push_services:
             logger.debug(f"用户[{user.username}]未配置推送服务")
@@ -1256,24 +2086,19 @@ class MainApp:
         captcha_reason = ""
 
         for task_name, result in results.items():
-            if isinstance(result, dict):
-                status = result.get('status')
-                if status == 'success':
-                    emoji = '✅'
-                elif status == 'captcha':
-                    emoji = '⚠️'
-                    has_captcha = True
-                elif status == 'captcha_failed':
-                    emoji = '❌'
-                    has_captcha = True
-                    captcha_reason = result.get('reason', '未知原因')
-                else:
-                    emoji = '❌'
-                msg += f"{task_name}: {emoji}\n"
-                if status == 'success':
-                    success_count += 1
+            if result.status == 'success':
+                emoji = '✅'
+                success_count += 1
+            elif result.status == 'captcha':
+                emoji = '⚠️'
+                has_captcha = True
+            elif result.status == 'captcha_failed':
+                emoji = '❌'
+                has_captcha = True
+                captcha_reason = result.reason or '未知原因'
             else:
-                msg += f"{task_name}: ❌\n"
+                emoji = '❌'
+            msg += f"{task_name}: {emoji}\n"
 
         if has_captcha:
             msg += "\n⚠️ 任务因遇到验证码被中断，后续任务未执行\n"
@@ -1282,20 +2107,32 @@ class MainApp:
             msg += "   手动执行一次任务后可解除风控"
 
         title = f"任务完成报告 - {success_count}/{total_count}"
-        
-        # 发送所有推送服务
+        self._push(user, title, msg)
+
+    def _notify_login_failed(self, user: UserConfig) -> None:
+        """推送登录失效提醒"""
+        if not user.push_services:
+            return
+        msg = f"用户[{user.username}]登录已失效，本次未执行任务\n请重新获取cookies后更新 {user.cookies_file or '用户cookies文件'}"
+        self._push(user, "登录失效提醒", msg)
+
+    def _push(self, user: UserConfig, title: str, msg: str) -> None:
+        """发送推送到用户配置的所有推送服务"""
+        # 汇总模式下运行结束时统一发送
+        if self.digest is not None:
+            self.digest.add(user.push_services, title, msg)
+            return
+
+        # 发送所有推送服务，有分发器时并发发送且不等待结果
+        if self.notifier is not None:
+            self.notifier.send_all(user.push_services, title, msg)
+            return
         for push_service in user.push_services:
-            service_name = push_service.__class__.__name__
-            try:
-                result = push_service.send(title, msg)
-                if result.get('success'):
-                    logger.info(f"[{service_name}] 推送成功")
-                else:
-                    logger.info(f"[{service_name}] 推送失败")
-                    logger.debug(f"[{service_name}] 原始返回: {result.get('raw')}")
-            except Exception as e:
-                logger.error(f"[{service_name}] 推送异常: {str(e)}")
+            deliver(push_service, title, msg)
 
 if __name__ == "__main__":
+    # 以 python QDjob.py 运行时，async_client 等模块导入的 QDjob 就是当前模块，不再重复执行模块初始化（如日志系统）
+    import sys
+    sys.modules.setdefault('QDjob', sys.modules[__name__])
     app = MainApp()
     app.run()
\ No newline at end of file
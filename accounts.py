@@ -0,0 +1,82 @@
+# coding: utf-8
+import json
+import logging
+import os
+from typing import Any, Container, Dict, Iterator, List, Optional, Union
+
+ACCOUNTS_DIR = 'accounts'
+
+logger = logging.getLogger('Qidian')
+
+
+class AccountRegistry:
+    """
+    账号注册表
+    账号来自 config.json 的 users 列表和 accounts_dir 目录（每个账号一个 JSON 文件，
+    内容与 users 中的一项相同，文件名即用户名）。
+    创建时只建立用户名索引，账号文件在用到时才读取，账号再多启动开销和内存占用也基本不变
+    """
+    def __init__(self, users: Optional[List[Dict[str, Any]]] = None, accounts_dir: Optional[str] = None):
+        # 用户名 -> config.json 中的配置，或账号文件路径
+        self._index: Dict[str, Union[Dict[str, Any], str]] = {}
+        for i, user_data in enumerate(users or []):
+            username = user_data.get('username') if isinstance(user_data, dict) else None
+            self._add(username or f"users[{i}]", user_data)
+        if accounts_dir:
+            self._scan(accounts_dir)
+
+    def _add(self, username: str, source: Union[Dict[str, Any], str]) -> None:
+        if username in self._index:
+            logger.warning(f"用户[{username}]重复配置，只使用第一个")
+            return
+        self._index[username] = source
+
+    def _scan(self, accounts_dir: str) -> None:
+        """索引账号目录，只列出文件名，不读取内容"""
+        try:
+            names = sorted(entry.name for entry in os.scandir(accounts_dir)
+                           if entry.is_file() and entry.name.endswith('.json'))
+        except OSError as e:
+            logger.error(f"读取账号目录失败: {e}")
+            return
+        for name in names:
+            self._add(name[:-len('.json')], os.path.join(accounts_dir, name))
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, username: str) -> bool:
+        return username in self._index
+
+    def usernames(self) -> List[str]:
+        return list(self._index)
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        """读取单个账号的配置，读取失败时返回None"""
+        source = self._index.get(username)
+        if not isinstance(source, str):
+            return source
+        try:
+            with open(source, 'r', encoding='utf-8') as f:
+                user_data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"读取账号文件 {source} 失败: {e}")
+            return None
+        if not isinstance(user_data, dict):
+            logger.error(f"账号文件 {source} 格式错误")
+            return None
+        user_data.setdefault('username', username)
+        return user_data
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """按顺序逐个读取账号配置"""
+        return self.select()
+
+    def select(self, usernames: Optional[Container[str]] = None) -> Iterator[Dict[str, Any]]:
+        """按顺序逐个读取账号配置，指定 usernames 时只读取其中的账号"""
+        for username in list(self._index):
+            if usernames is not None and username not in usernames:
+                continue
+            user_data = self.get(username)
+            if user_data is not None:
+                yield user_data
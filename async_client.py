@@ -0,0 +1,344 @@
+# coding: utf-8
+import asyncio
+import json
+import logging
+from concurrent.futures import Future
+from typing import Dict, Optional, Any, Callable, Iterable, Tuple
+from urllib.parse import urlsplit
+
+from QDjob import (Flow, QidianClient, QidianError, TaskProcessor, TaskResult, UserConfig,
+                   DEFAULT_TASK_CONCURRENCY)
+from captcha_pool import CaptchaPool
+from cookie_store import CookieStore
+from heartbeat import HeartbeatScheduler
+from logger import set_log_user
+from pacing import Pacer, PacingPolicy
+from profiler import RequestProfiler
+from retry import RetryPolicy
+from risk import AccountRisk, RiskLedger
+from state import DailyStateStore
+from task_graph import TaskRun, TaskSpec
+
+try:
+    import aiohttp
+except ImportError:  # 可选依赖，仅异步模式需要
+    aiohttp = None
+
+logger = logging.getLogger('Qidian')
+
+
+def create_shared_session(limit: int = 20, limit_per_host: int = 0) -> "aiohttp.ClientSession":
+    """
+    创建可在多个客户端间共享的aiohttp会话
+    cookies 由各客户端随请求显式携带，会话本身不保存cookies，避免用户之间串号
+    :param limit: 连接总数上限
+    :param limit_per_host: 单个域名的连接数上限，0 表示不限制
+    """
+    if aiohttp is None:
+        raise ImportError("异步模式需要安装 aiohttp: pip install aiohttp")
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host)
+    return aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+
+
+class AsyncQidianClient(QidianClient):
+    """
+    基于asyncio的起点客户端，任务方法与 QidianClient 同名，均返回协程
+    任务流程（请求构造、响应解析）与 QidianClient 共用，这里只实现在事件循环中执行步骤的传输层
+    """
+    def __init__(self, config: UserConfig, signer: Any = None, hosts: Optional[Dict[str, str]] = None,
+                 session: Optional["aiohttp.ClientSession"] = None, pacer: Optional[Pacer] = None,
+                 profiler: Optional[RequestProfiler] = None, retry_policy: Optional[RetryPolicy] = None,
+                 cookie_store: Optional[CookieStore] = None, captcha_pool: Optional[CaptchaPool] = None,
+                 risk: Optional[AccountRisk] = None, heartbeat_scheduler: Optional[HeartbeatScheduler] = None):
+        """
+        :param session: 共享的aiohttp会话，不传则在首次请求时自行创建
+        """
+        super().__init__(config, signer=signer, hosts=hosts, heartbeat_scheduler=heartbeat_scheduler,
+                         pacer=pacer, profiler=profiler, retry_policy=retry_policy,
+                         cookie_store=cookie_store, captcha_pool=captcha_pool, risk=risk)
+        self.session = session
+        self._owns_session = session is None
+
+    def _create_session(self) -> Any:
+        """会话在事件循环中延迟创建"""
+        return None
+
+    async def __aenter__(self) -> "AsyncQidianClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """关闭自行创建的会话"""
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _send(self, method: str, url: str, params: dict = None, data: dict = None,
+                    headers: dict = None, cookies: dict = None) -> Tuple[int, str, Dict[str, str]]:
+        """发送请求，返回(状态码, 响应文本, 响应cookies)，网络错误时按重试策略只重试本次请求"""
+        if self.session is None:
+            self.session = create_shared_session()
+            self._owns_session = True
+        rule = self.retry_policy.rule(method, url)
+        timeout = aiohttp.ClientTimeout(sock_connect=rule.timeout[0], sock_read=rule.timeout[1])
+        attempt = 1
+        while True:
+            try:
+                with self._profile(url, 'network'):
+                    async with self.session.request(method, url, params=params or None, data=data or None,
+                                                    headers=headers, cookies=cookies, timeout=timeout) as response:
+                        text = await response.text()
+                        response_cookies = {name: morsel.value for name, morsel in response.cookies.items()}
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                # 连接未建立时请求一定没有发出
+                sent = not isinstance(e, aiohttp.ClientConnectorError)
+                if not self.retry_policy.should_retry(rule, attempt, sent=sent):
+                    raise
+                reason = type(e).__name__
+            else:
+                if not self.retry_policy.should_retry(rule, attempt, status=response.status):
+                    return response.status, text, response_cookies
+                reason = f"HTTP {response.status}"
+
+            delay = self.retry_policy.backoff(attempt)
+            attempt += 1
+            logger.warning(f"请求{urlsplit(url).path}失败({reason})，{delay:.1f}秒后第{attempt}次请求")
+            with self._profile(url, 'sleep'):
+                await asyncio.sleep(delay)
+
+    async def _pace(self, url: str) -> None:
+        """按节奏策略等待，距上次请求足够久时不等待"""
+        with self._profile(url, 'sleep'):
+            await asyncio.sleep(self.pacer.reserve(url))
+
+    def _parse_json(self, text: str, error_msg: str) -> Dict[str, Any]:
+        """解析响应并检测验证码"""
+        try:
+            result = json.loads(text)
+        except json.JSONDecodeError:
+            logger.error(f"{error_msg}: {text}")
+            raise QidianError(f"{error_msg}: {text}")
+        return self._check_captcha(result)
+
+    async def _make_qd_request(self, url: str, params: dict = None, data: dict = None, method: str = 'POST',
+                               error_msg: str = "qd类型请求失败") -> Dict[str, Any]:
+        """创建qd类型请求"""
+        return await self._make_signed_request('qd', url, params, data, method, error_msg)
+
+    async def _make_sdk_request(self, url: str, params: dict = None, data: dict = None, method: str = 'POST',
+                                error_msg: str = "sdk类型请求失败") -> Dict[str, Any]:
+        """创建sdk类型请求"""
+        return await self._make_signed_request('sdk', url, params, data, method, error_msg)
+
+    async def _make_signed_request(self, kind: str, url: str, params: Optional[dict], data: Optional[dict],
+                                   method: str, error_msg: str) -> Dict[str, Any]:
+        """发送签名请求，解析响应并记录风控情况"""
+        await self._pace(url)
+
+        method = method.upper()
+        _, text, response_cookies = await self._send(method, url,
+                                                     **self._signed_request(kind, url, params, data, method))
+        self._merge_cookies(response_cookies)
+        return self._record_risk(url, self._parse_json(text, error_msg))
+
+    async def _request(self, method: str, url: str, **kwargs) -> Tuple[int, str, Dict[str, str]]:
+        """发送不需要签名的请求（游戏中心），返回(状态码, 响应文本, 响应cookies)"""
+        return await self._send(method, url, **kwargs)
+
+    async def _wait_future(self, future: Future) -> Any:
+        """等待线程池中的结果（如验证码识别），等待期间不阻塞事件循环"""
+        return await asyncio.wrap_future(future)
+
+    async def _run_heartbeats(self, game: Dict[str, Any]) -> bool:
+        """
+        发送游戏心跳直到游戏时长满足或心跳失败，等待期间让出事件循环
+        设置了心跳调度器时由调度器按时触发，心跳请求仍在事件循环中发送
+        """
+        if self.heartbeat_scheduler is not None:
+            loop = asyncio.get_running_loop()
+            beat = lambda: asyncio.run_coroutine_threadsafe(
+                self._drive(self._game_heartbeat_flow(game)), loop).result()
+            future = self.heartbeat_scheduler.submit(beat, game['full_time'], username=self.config.username)
+            logger.info("游戏心跳已交由调度器执行")
+            return await asyncio.wrap_future(future)
+
+        run_time = 0
+        while run_time < game['full_time']:
+            next_time = await self._drive(self._game_heartbeat_flow(game))
+            if next_time is None:
+                return False
+            run_time += next_time
+            await asyncio.sleep(next_time)
+        return True
+
+    async def _drive(self, flow: Flow) -> Any:
+        """在事件循环中执行任务流程，返回流程的返回值"""
+        value, error = None, None
+        while True:
+            try:
+                step = flow.throw(error) if error is not None else flow.send(value)
+            except StopIteration as stop:
+                return stop.value
+            value, error = None, None
+            try:
+                value = await getattr(self, step.action)(*step.args, **step.kwargs)
+            except Exception as e:
+                error = e
+
+
+class AsyncTaskProcessor(TaskProcessor):
+    """
+    异步任务处理器，结果记录与重试规则与 TaskProcessor 一致
+    依赖已结束且资源空闲的任务同时执行，最多 task_concurrency 个，例如激励任务进行期间执行签到和抽奖任务
+    """
+    def __init__(self, client: "AsyncQidianClient", user: UserConfig, retry_attempts: int = 3,
+                 state_store: Optional[DailyStateStore] = None,
+                 task_concurrency: int = DEFAULT_TASK_CONCURRENCY):
+        super().__init__(client, user, retry_attempts, state_store=state_store)
+        self.task_concurrency = max(1, task_concurrency)
+
+    async def run_task(self, task_name: str, task_func) -> None:
+        """运行单个任务"""
+        if not self.user.tasks.get(task_name, False):
+            logger.info(f"任务[{task_name}]已禁用，跳过执行")
+            return
+        if self._skip_completed(task_name):
+            return
+
+        logger.info(f"开始执行任务: {task_name}")
+        for attempt in range(1, self.retry_attempts + 1):
+            logger.info(f"开始第{attempt}次尝试")
+            try:
+                result = await task_func()
+                delay = self._handle_result(task_name, result, attempt)
+            except Exception as e:
+                delay = self._handle_exception(task_name, e, attempt)
+
+            if delay is None:
+                break
+            if delay:
+                await asyncio.sleep(delay)
+
+    async def _run_spec(self, spec: TaskSpec) -> str:
+        await self.run_task(spec.name, getattr(self.client, spec.method))
+        return spec.name
+
+    async def process_all_tasks(self) -> Dict[str, TaskResult]:
+        """处理所有任务"""
+        self.schedule = TaskRun(self.graph)
+        running = set()
+        while True:
+            while len(running) < self.task_concurrency:
+                spec = self.schedule.next_ready()
+                if spec is None:
+                    break
+                running.add(asyncio.ensure_future(self._run_spec(spec)))
+            if not running:
+                break
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                self.schedule.finish(task.result())
+        return self.task_results
+
+
+async def _run_user(user: UserConfig, session: "aiohttp.ClientSession", retry_attempts: int,
+                    signer: Any, hosts: Optional[Dict[str, str]],
+                    pacing_policy: Optional[PacingPolicy], profiler: Optional[RequestProfiler],
+                    retry_policy: Optional[RetryPolicy], state_store: Optional[DailyStateStore],
+                    cookie_store: Optional[CookieStore],
+                    verified_users: Optional[Dict[str, str]],
+                    task_concurrency: int,
+                    captcha_pool: Optional[CaptchaPool],
+                    risk_ledger: Optional[RiskLedger],
+                    heartbeat_scheduler: Optional[HeartbeatScheduler]) -> Optional[Dict[str, TaskResult]]:
+    """在事件循环中处理单个用户，返回任务结果，未执行时返回None"""
+    set_log_user(user.username)
+    logger.info(f"开始处理用户: {user.username}")
+    try:
+        risk = risk_ledger.account(user.username) if risk_ledger is not None else None
+        pacer = Pacer(pacing_policy, slowdown=risk.multiplier if risk is not None else None)
+        client = AsyncQidianClient(user, signer=signer, hosts=hosts, session=session,
+                                   pacer=pacer, profiler=profiler,
+                                   retry_policy=retry_policy, cookie_store=cookie_store,
+                                   captcha_pool=captcha_pool, risk=risk,
+                                   heartbeat_scheduler=heartbeat_scheduler)
+        if not client.init():
+            logger.error(f"用户: {user.username} 初始化失败")
+            return None
+
+        processor = AsyncTaskProcessor(client, user, retry_attempts, state_store=state_store,
+                                       task_concurrency=task_concurrency)
+        if processor.all_completed():
+            logger.info(f"用户[{user.username}]今日任务已全部完成，跳过")
+            return None
+
+        # 登录预检已通过的用户不再重复检查
+        nickname = (verified_users or {}).get(user.username)
+        if nickname is None:
+            logger.info(f"开始检查用户[{user.username}]登录状态")
+            nickname = await client.check_login()
+            if not nickname:
+                logger.warning(f"用户[{user.username}]未登录")
+                return None
+            logger.info(f"用户[{nickname}]登录成功")
+
+        return await processor.process_all_tasks()
+    except Exception as e:
+        logger.error(f"处理用户[{user.username}]时发生错误: {e}")
+        return None
+    finally:
+        if cookie_store is not None:
+            cookie_store.flush(user.username)
+        set_log_user(None)
+
+
+async def run_users(users: Iterable[UserConfig], retry_attempts: int = 3, max_concurrent_users: int = 1,
+                    signer: Any = None, hosts: Optional[Dict[str, str]] = None,
+                    pacing_policy: Optional[PacingPolicy] = None,
+                    profiler: Optional[RequestProfiler] = None,
+                    limit_per_host: int = 0,
+                    retry_policy: Optional[RetryPolicy] = None,
+                    state_store: Optional[DailyStateStore] = None,
+                    cookie_store: Optional[CookieStore] = None,
+                    verified_users: Optional[Dict[str, str]] = None,
+                    task_concurrency: int = DEFAULT_TASK_CONCURRENCY,
+                    captcha_pool: Optional[CaptchaPool] = None,
+                    risk_ledger: Optional[RiskLedger] = None,
+                    heartbeat_scheduler: Optional[HeartbeatScheduler] = None,
+                    on_result: Optional[Callable[[UserConfig, Dict[str, TaskResult]], None]] = None
+                    ) -> Dict[str, Dict[str, TaskResult]]:
+    """
+    在同一个事件循环中处理多个用户，所有用户共享一个连接池
+    :param users: 用户配置，可以是生成器，max_concurrent_users 个协程依次领取，同一时间只加载正在处理的用户
+    :param limit_per_host: 单个域名的连接数上限，0 表示不限制
+    :param state_store: 每日任务状态，设置后今天已完成的任务不再执行
+    :param cookie_store: cookies 持久化，每个用户处理完后写入有变化的 cookies
+    :param verified_users: 已确认登录的用户名 -> 昵称，这些用户不再检查登录状态
+    :param task_concurrency: 单个用户同时执行的任务数
+    :param captcha_pool: 验证码识别线程池，所有用户共用
+    :param risk_ledger: 风控记录，设置后按账号和接口记录风控情况并放慢被风控的接口
+    :param heartbeat_scheduler: 游戏心跳调度器，所有用户的心跳由它按时触发，不传则各自在事件循环中等待
+    :param on_result: 每个用户完成后立即以 (用户, 任务结果) 调用，设置后结果不再汇总返回
+    :return: 用户名 -> 任务结果，未登录或初始化失败的用户不在其中
+    """
+    users = iter(users)
+    all_results = {}
+
+    async def worker() -> None:
+        # next() 中没有 await，多个协程共用同一个迭代器是安全的
+        for user in users:
+            result = await _run_user(user, session, retry_attempts, signer, hosts, pacing_policy, profiler,
+                                     retry_policy, state_store, cookie_store, verified_users,
+                                     task_concurrency, captcha_pool, risk_ledger, heartbeat_scheduler)
+            if result is None:
+                continue
+            if on_result is not None:
+                on_result(user, result)
+            else:
+                all_results[user.username] = result
+
+    async with create_shared_session(limit_per_host=limit_per_host) as session:
+        await asyncio.gather(*(worker() for _ in range(max_concurrent_users)))
+    return all_results
@@ -0,0 +1,179 @@
+# coding: utf-8
+"""
+请求签名路径基准测试
+
+用法（在项目根目录执行）:
+    python bench/bench_sign.py                      # 使用 enctrypt_qidian
+    python bench/bench_sign.py --stub               # 使用 bench/stub_signer.py 代替签名模块
+    python bench/bench_sign.py --json result.json   # 保存结果
+    python bench/bench_sign.py --baseline result.json --tolerance 0.2
+                                                    # 与之前保存的结果对比，变慢超过20%时退出码为1
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+SAMPLE_TS = '1700000000000'
+SAMPLE_QID = '1234567890'
+SAMPLE_QDINFO = ('Xy3p8yYb0b9xA6vLqkOe8w2nZ1F0s5gQeT7uJx3mRkVdH9cWlP2aN4oBfYtU6iSzCjGhMq'
+                 'D1rE8vKwL5nXo7pTbS0yA3uF2gI9hJ4kZ6cV1mN8bQ5wR7eT0yU3iO2pA9sD4fG6hJ1kL')
+SAMPLE_IBEX = 'c2FtcGxlLWliZXgtdmFsdWUtZm9yLWJlbmNobWFyay0xMjM0NTY3ODkw'
+
+# 与各任务实际发送的 data_encrypt 一致的样本
+SAMPLE_DATA = {
+    'empty': {},
+    'checkin': {'sessionKey': '', 'banId': '0', 'captchaTicket': '', 'captchaRandStr': '', 'challenge': ''},
+    'finishWatch': {
+        'taskId': '1234567890123456', 'BanId': '0', 'BanMessage': '', 'CaptchaAId': '', 'CaptchaType': '0',
+        'CaptchaURL': '', 'Challenge': '', 'Gt': '', 'NewCaptcha': '0', 'Offline': '0',
+        'PhoneNumber': '', 'SessionKey': '',
+    },
+    'lottery': {
+        'sessionKey': '', 'banId': '0', 'captchaTicket': '', 'captchaRandStr': '', 'challenge': '',
+        'validate': '', 'seccode': '',
+    },
+}
+
+
+def load_signer(stub: bool) -> Any:
+    """加载签名模块，stub为True时用桩模块替换 enctrypt_qidian"""
+    if stub:
+        import stub_signer
+        sys.modules['enctrypt_qidian'] = stub_signer
+        return stub_signer
+    try:
+        import enctrypt_qidian
+    except ImportError:
+        sys.exit("未找到 enctrypt_qidian，可使用 --stub 以桩模块运行")
+    return enctrypt_qidian
+
+
+def build_cases(signer: Any) -> List[Tuple[str, Callable[[], Any]]]:
+    """生成基准用例：签名函数单独调用 + 客户端的完整签名请求头构建"""
+    from QDjob import QidianClient, UserConfig, DEFAULT_USER_AGENT, parse_user_agent
+
+    version, versioncode = parse_user_agent(DEFAULT_USER_AGENT)
+    cases = [
+        ('getuserid_from_QDInfo', lambda: signer.getuserid_from_QDInfo(SAMPLE_QDINFO)),
+        ('getQDInfo_byQDInfo', lambda: signer.getQDInfo_byQDInfo(SAMPLE_TS, SAMPLE_QDINFO)),
+        ('getibex_byibex', lambda: signer.getibex_byibex(SAMPLE_TS, SAMPLE_IBEX)),
+    ]
+    for name, data in SAMPLE_DATA.items():
+        cases += [
+            (f'getQDSign[{name}]', lambda data=data: signer.getQDSign(SAMPLE_TS, data, version, SAMPLE_QID, userid='1')),
+            (f'getSDKSign[{name}]', lambda data=data: signer.getSDKSign(SAMPLE_TS, data, version, SAMPLE_QID, userid='1')),
+            (f'getborgus[{name}]', lambda data=data: signer.getborgus(SAMPLE_TS, data, versioncode, SAMPLE_QID)),
+        ]
+
+    user = UserConfig(username='bench', cookies={'qid': SAMPLE_QID, 'QDInfo': SAMPLE_QDINFO}, tasks={},
+                      user_agent=DEFAULT_USER_AGENT, ibex=SAMPLE_IBEX, push_services=[])
+    client = QidianClient(user, signer=signer)
+    client.init()
+    # 每次调用使用新的时间戳，与真实请求一致
+    timestamps = (str(ts) for ts in itertools.count(int(SAMPLE_TS)))
+    for name, data in SAMPLE_DATA.items():
+        cases += [
+            (f'_build_qd_headers[{name}]', lambda data=data: client._build_qd_headers(next(timestamps), data.copy())),
+            (f'_build_sdk_headers[{name}]', lambda data=data: client._build_sdk_headers(next(timestamps), data.copy())),
+        ]
+    return cases
+
+
+def measure(func: Callable[[], Any], min_time: float, repeat: int) -> Dict[str, float]:
+    """测量每秒调用次数（取多轮中最快的一轮）和单次调用的内存峰值"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()  # 预热，排除首次调用的缓存分配
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'ops_per_sec': round(number / best, 1),
+        'us_per_op': round(best / number * 1e6, 2),
+        'peak_bytes': peak - current,
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline_path: str, tolerance: float) -> List[str]:
+    """与基线对比，返回变慢超过 tolerance 的用例"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base_ops = baseline[name]['ops_per_sec']
+        change = (result['ops_per_sec'] - base_ops) / base_ops
+        print(f"{name:<32}{base_ops:>14,.0f} -> {result['ops_per_sec']:>14,.0f}  {change:+.1%}")
+        if change < -tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='请求签名路径基准测试')
+    parser.add_argument('--stub', action='store_true', help='使用桩签名模块代替 enctrypt_qidian')
+    parser.add_argument('--min-time', type=float, default=0.2, help='每轮最短运行秒数')
+    parser.add_argument('--repeat', type=int, default=5, help='测量轮数')
+    parser.add_argument('--filter', default='', help='只运行名称包含该字符串的用例')
+    parser.add_argument('--json', help='结果保存路径')
+    parser.add_argument('--baseline', help='对比的基线结果文件')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的性能下降比例')
+    args = parser.parse_args()
+
+    signer = load_signer(args.stub)
+    results = {}
+    print(f"{'用例':<32}{'ops/sec':>14}{'us/op':>10}{'峰值内存(B)':>14}")
+    for name, func in build_cases(signer):
+        if args.filter not in name:
+            continue
+        result = measure(func, args.min_time, args.repeat)
+        results[name] = result
+        print(f"{name:<32}{result['ops_per_sec']:>14,.0f}{result['us_per_op']:>10}{result['peak_bytes']:>14}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'signer': signer.__name__, 'python': sys.version.split()[0], 'results': results},
+                      f, indent=2, ensure_ascii=False)
+        print(f"结果已保存: {args.json}")
+
+    if args.baseline:
+        print(f"\n与基线对比: {args.baseline}")
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"性能下降超过{args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
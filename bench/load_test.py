@@ -0,0 +1,141 @@
+# coding: utf-8
+"""
+多账号压测
+
+启动本地模拟服务（bench/mock_server.py），在临时目录中生成指定数量的虚拟账号，
+通过 MainApp 完整跑一遍所有任务，输出吞吐量和请求耗时分位数，用于评估单机能承载的账号数。
+
+用法（在项目根目录执行）:
+    python bench/load_test.py --stub --users 300 --concurrency 30 --latency 0.05 --jitter 0.1
+    python bench/load_test.py --stub --users 300 --concurrency 100 --async
+    python bench/load_test.py --stub --users 100 --captcha-rate 0.02 --error-rate 0.01 --json load.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from mock_server import add_server_arguments, server_from_args
+
+TASKS = ('签到任务', '激励碎片任务', '章节卡任务', '游戏中心任务', '每日抽奖任务')
+
+
+def build_workdir(workdir: str, args: argparse.Namespace) -> None:
+    """生成虚拟账号的 config.json、账号目录和 cookies 文件"""
+    os.makedirs(os.path.join(workdir, 'cookies'))
+    os.makedirs(os.path.join(workdir, 'accounts'))
+    for i in range(args.users):
+        username = f"load{i + 1:04d}"
+        cookies_file = f"cookies/{username}.json"
+        cookies = {'qid': str(100000000 + i), 'QDInfo': f"mock-qdinfo-{i}", 'ywguid': str(100000000 + i)}
+        with open(os.path.join(workdir, cookies_file), 'w', encoding='utf-8') as f:
+            json.dump(cookies, f)
+        account = {
+            'username': username,
+            'cookies_file': cookies_file,
+            'user_agent': '',
+            'ibex': 'mock-ibex',
+            'usertype': '',
+            'tasks': {task: True for task in TASKS},
+            'push_services': [],
+        }
+        with open(os.path.join(workdir, 'accounts', f"{username}.json"), 'w', encoding='utf-8') as f:
+            json.dump(account, f, ensure_ascii=False)
+
+    config = {
+        'log_level': args.log_level,
+        'retry_attempts': 3,
+        'max_concurrent_users': args.concurrency,
+        'async_mode': args.use_async,
+        'skip_completed_tasks': False,
+        'push_outbox': False,
+        'profile_report': 'json' if args.profile else None,
+        'users': [],
+        'accounts_dir': 'accounts',
+    }
+    if not args.pacing:
+        config['pacing'] = {'default': {'min_interval': 0, 'jitter': [0, 0]}, 'retry_delay': [0, 0]}
+    config = {key: value for key, value in config.items() if value is not None}
+    with open(os.path.join(workdir, 'config.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+
+def print_report(summary: Dict[str, Any]) -> None:
+    report = summary['server']
+    print(f"\n账号数: {summary['users']}  并发: {summary['concurrency']}  "
+          f"模式: {'异步' if summary['async'] else '线程'}")
+    print(f"总耗时: {summary['elapsed']:.2f} 秒  吞吐量: {summary['accounts_per_sec']:.2f} 账号/秒, "
+          f"{summary['requests_per_sec']:.1f} 请求/秒")
+    print(f"请求数: {report['requests']}  状态码: {report['statuses']}  注入: {report['injected']}")
+    print(f"\n{'接口':<20}{'次数':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    rows = list(report['endpoints'].items()) + [('(全部请求)', report['latency']), ('(单个账号)', report['accounts'])]
+    for name, stats in rows:
+        print(f"{name:<20}{stats['count']:>8}{stats['p50']:>10.4f}{stats['p95']:>10.4f}"
+              f"{stats['p99']:>10.4f}{stats['max']:>10.4f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='多账号压测')
+    parser.add_argument('--users', type=int, default=200, help='虚拟账号数')
+    parser.add_argument('--concurrency', type=int, default=20, help='同时执行任务的账号数')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='使用异步模式（需要aiohttp）')
+    parser.add_argument('--pacing', action='store_true', help='保留默认的请求节奏等待')
+    parser.add_argument('--profile', action='store_true', help='同时输出客户端耗时统计报告')
+    parser.add_argument('--log-level', default='WARNING', help='日志等级')
+    parser.add_argument('--stub', action='store_true', help='使用桩签名模块代替 enctrypt_qidian')
+    parser.add_argument('--json', help='结果保存路径')
+    parser.add_argument('--keep', action='store_true', help='保留临时目录（含日志）')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    if args.stub:
+        import stub_signer
+        sys.modules['enctrypt_qidian'] = stub_signer
+
+    server = server_from_args(args).start()
+    workdir = tempfile.mkdtemp(prefix='qdjob-load-')
+    build_workdir(workdir, args)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import QDjob
+        # 所有客户端默认使用 DEFAULT_HOSTS，替换为模拟服务地址
+        QDjob.DEFAULT_HOSTS.update(server.hosts)
+        start = time.perf_counter()
+        QDjob.MainApp().run()
+        elapsed = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        server.stop()
+        if args.keep:
+            print(f"临时目录: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = server.report()
+    summary = {
+        'users': args.users,
+        'concurrency': args.concurrency,
+        'async': args.use_async,
+        'elapsed': round(elapsed, 3),
+        'accounts_per_sec': round(args.users / elapsed, 3),
+        'requests_per_sec': round(report['requests'] / elapsed, 1),
+        'server': report,
+    }
+    print_report(summary)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,365 @@
+# coding: utf-8
+"""
+本地起点接口模拟服务
+
+实现 QidianClient 调用的全部接口，按 Cookie 中的 qid 为每个账号保存任务进度，
+可配置响应延迟、验证码注入（RiskConf.BanId）和错误率，用于压测和离线调试。
+只模拟客户端依赖的响应字段，不校验签名。
+
+单独启动（在项目根目录执行）:
+    python bench/mock_server.py --port 8000 --latency 0.05 --captcha-rate 0.01
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http.cookies import SimpleCookie
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+# 接口路径 -> 统计用的接口名
+ENDPOINTS = {
+    '/argus/api/v1/user/getprofile': 'getprofile',
+    '/argus/api/v2/checkin/checkin': 'checkin',
+    '/argus/api/v2/video/adv/mainPage': 'mainPage',
+    '/argus/api/v1/video/adv/finishWatch': 'finishWatch',
+    '/argus/api/v2/video/callback': 'video/callback',
+    '/argus/api/v2/checkin/lottery': 'checkin/lottery',
+    '/argus/api/v2/checkin/detail': 'checkin/detail',
+    '/home/statistic/track': 'statistic/track',
+    '/home/log/heartbeat': 'log/heartbeat',
+}
+# 会注入验证码的接口（与真实服务一致，只有写操作会触发风控）
+CAPTCHA_ENDPOINTS = ('checkin', 'finishWatch', 'checkin/lottery')
+# 客户端目前唯一支持自动处理的验证码类型
+CAPTCHA_AID = '198420051'
+
+ADV_TASK_COUNT = 3
+EXTRA_TASK_ID = '900001'
+GAME_TASK_ID = '900002'
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """最近秩法百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+class _Account:
+    """单个账号在模拟服务中的任务进度"""
+    def __init__(self, game_minutes: int):
+        self.checked_in = False
+        self.adv_finished = [0] * ADV_TASK_COUNT
+        self.extra_watched = 0
+        self.video_urge = 1
+        self.lottery_count = 1
+        self.game_minutes = game_minutes
+        self.game_received = 0
+        self.first_seen: Optional[float] = None
+        self.last_seen = 0.0
+        self.lock = threading.Lock()
+
+    def main_page(self) -> Dict[str, Any]:
+        game_total = 10
+        return {
+            'DailyBenefitModule': {'TaskList': [
+                {'TaskId': str(100001 + i), 'IsFinished': finished}
+                for i, finished in enumerate(self.adv_finished)
+            ]},
+            'VideoRewardTab': {'TaskList': [
+                {'Title': '完成3个广告任务得奖励', 'TaskId': EXTRA_TASK_ID,
+                 'IsReceived': int(self.extra_watched >= 3)},
+            ]},
+            'MoreRewardTab': {'TaskList': [
+                {'Title': '当日玩游戏10分钟', 'TaskId': GAME_TASK_ID,
+                 'ActionUrl': 'https://qdgame.qidian.com/home?partnerid=1000001',
+                 'IsFinished': int(self.game_minutes <= 0), 'IsReceived': self.game_received,
+                 'Total': game_total, 'Process': game_total - max(0, self.game_minutes)},
+            ]},
+        }
+
+    def finish_watch(self, task_id: str) -> None:
+        if task_id == EXTRA_TASK_ID:
+            self.extra_watched += 1
+        elif task_id == GAME_TASK_ID:
+            self.game_received = 1
+        elif task_id.isdigit() and 0 <= int(task_id) - 100001 < ADV_TASK_COUNT:
+            self.adv_finished[int(task_id) - 100001] = 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # 支持长连接，与真实服务一致
+    server: "_Server"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._dispatch({})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8', errors='replace')
+        self._dispatch({key: values[-1] for key, values in parse_qs(body).items()})
+
+    def _dispatch(self, form: Dict[str, str]) -> None:
+        start = time.perf_counter()
+        parts = urlsplit(self.path)
+        name = ENDPOINTS.get(parts.path)
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        qid = cookie['qid'].value if 'qid' in cookie else 'anonymous'
+        params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        status, payload, cookies = self.server.mock.handle(name, qid, {**params, **form})
+
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in cookies.items():
+            self.send_header('Set-Cookie', f'{key}={value}; Path=/')
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.mock.record(name or parts.path, qid, status, time.perf_counter() - start)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # 数百个账号同时建立连接
+    mock: "MockQidianServer"
+
+
+class MockQidianServer:
+    """起点接口模拟服务"""
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 endpoint_latency: Optional[Dict[str, float]] = None, captcha_rate: float = 0.0,
+                 ban_id: int = 2, error_rate: float = 0.0, error_status: int = 503,
+                 game_minutes: int = 0, heartbeat_interval: int = 30, seed: Optional[int] = None):
+        """
+        :param latency: 每个响应的基础延迟（秒）
+        :param jitter: 在基础延迟上附加 0~jitter 秒的随机延迟
+        :param endpoint_latency: 按接口名覆盖基础延迟，如 {"finishWatch": 0.3}
+        :param captcha_rate: 写操作返回验证码的概率
+        :param ban_id: 注入验证码的 BanId，2 为客户端可处理的类型，其他值视为设备风控
+        :param error_rate: 返回 error_status 的概率
+        :param game_minutes: 游戏中心任务剩余分钟数，0 表示游戏时长已满足、只需领取奖励
+        :param heartbeat_interval: 游戏心跳返回的下次心跳间隔（秒）
+        """
+        unknown = set(endpoint_latency or {}) - set(ENDPOINTS.values())
+        if unknown:
+            raise ValueError(f"未知的接口名: {', '.join(sorted(unknown))}")
+        if not 0 <= captcha_rate <= 1 or not 0 <= error_rate <= 1:
+            raise ValueError("captcha_rate 和 error_rate 必须在 0~1 之间")
+        self.latency = latency
+        self.jitter = jitter
+        self.endpoint_latency = endpoint_latency or {}
+        self.captcha_rate = captcha_rate
+        self.ban_id = ban_id
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.game_minutes = game_minutes
+        self.heartbeat_interval = heartbeat_interval
+        self._random = random.Random(seed)
+        self._accounts: Dict[str, _Account] = {}
+        self._records: List[Tuple[str, int, float]] = []
+        self._injected = {'captcha': 0, 'error': 0}
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.mock = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def hosts(self) -> Dict[str, str]:
+        """可直接传给 QidianClient(hosts=...) 的接口域名"""
+        return {'qd': self.base_url, 'sdk': self.base_url, 'game': self.base_url}
+
+    def start(self) -> "MockQidianServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-qidian', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _account(self, qid: str) -> _Account:
+        with self._lock:
+            if qid not in self._accounts:
+                self._accounts[qid] = _Account(self.game_minutes)
+            return self._accounts[qid]
+
+    def _roll(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self._random.random() < rate
+
+    def handle(self, name: Optional[str], qid: str, form: Dict[str, str]) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+        """处理一次请求，返回 (状态码, 响应体, 需要设置的Cookie)"""
+        delay = self.endpoint_latency.get(name, self.latency)
+        if self.jitter:
+            with self._lock:
+                delay += self._random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if name is None:
+            return 404, {}, {}
+        if self._roll(self.error_rate):
+            with self._lock:
+                self._injected['error'] += 1
+            return self.error_status, {}, {}
+
+        account = self._account(qid)
+        # 带验证码票据的重试视为验证通过
+        solved = bool(form.get('captchaTicket'))
+        if name in CAPTCHA_ENDPOINTS and not solved and self._roll(self.captcha_rate):
+            with self._lock:
+                self._injected['captcha'] += 1
+            risk = {'BanId': self.ban_id, 'BanMessage': '请完成验证', 'CaptchaAId': CAPTCHA_AID,
+                    'CaptchaType': 1, 'SessionKey': uuid.uuid4().hex}
+            return 200, {'Result': 0, 'Message': '', 'Data': {'RiskConf': risk}}, {}
+
+        with account.lock:
+            return self._respond(name, account, form)
+
+    def _respond(self, name: str, account: _Account, form: Dict[str, str]) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+        ok = {'Result': 0, 'Message': '成功', 'Data': {}}
+        if name == 'getprofile':
+            return 200, {'Result': 0, 'Data': {'Nickname': 'mock_user'}}, {}
+        if name == 'checkin':
+            if account.checked_in:
+                return 200, {'Result': -91002, 'Message': '今日已签到'}, {}
+            account.checked_in = True
+            return 200, {'Result': 0, 'Data': {'HasCheckIn': 1}}, {}
+        if name == 'mainPage':
+            return 200, {'Result': 0, 'Data': account.main_page()}, {}
+        if name == 'finishWatch':
+            account.finish_watch(form.get('taskId', ''))
+            return 200, ok, {}
+        if name == 'video/callback':
+            if account.video_urge:
+                account.video_urge -= 1
+                account.lottery_count += 1
+            return 200, ok, {}
+        if name == 'checkin/lottery':
+            if account.lottery_count <= 0:
+                return 200, {'Result': -1, 'Message': '抽奖次数不足'}, {}
+            account.lottery_count -= 1
+            return 200, ok, {}
+        if name == 'checkin/detail':
+            return 200, {'Result': 0, 'Data': {'LotteryInfo': {
+                'HasVideoUrge': account.video_urge, 'LotteryCount': account.lottery_count}}}, {}
+        if name == 'statistic/track':
+            return 200, {'code': 0, 'msg': 'ok'}, {'PHESSID': uuid.uuid4().hex}
+        # log/heartbeat
+        return 200, {'code': 0, 'data': self.heartbeat_interval}, {}
+
+    def record(self, name: str, qid: str, status: int, seconds: float) -> None:
+        """记录一次请求的处理耗时"""
+        now = time.time()
+        with self._lock:
+            self._records.append((name, status, seconds))
+            account = self._accounts.get(qid)
+        if account is not None:
+            with account.lock:
+                if account.first_seen is None:
+                    account.first_seen = now - seconds
+                account.last_seen = now
+
+    def report(self) -> Dict[str, Any]:
+        """请求数、状态码分布、各接口及每个账号的耗时分位数"""
+        with self._lock:
+            records = list(self._records)
+            accounts = list(self._accounts.values())
+            injected = dict(self._injected)
+
+        def summary(values: List[float]) -> Dict[str, float]:
+            return {
+                'count': len(values),
+                'p50': round(percentile(values, 50), 4),
+                'p95': round(percentile(values, 95), 4),
+                'p99': round(percentile(values, 99), 4),
+                'max': round(max(values, default=0.0), 4),
+            }
+
+        by_endpoint: Dict[str, List[float]] = {}
+        statuses: Dict[str, int] = {}
+        for name, status, seconds in records:
+            by_endpoint.setdefault(name, []).append(seconds)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        durations = [account.last_seen - account.first_seen for account in accounts if account.first_seen]
+        return {
+            'requests': len(records),
+            'statuses': statuses,
+            'injected': injected,
+            'latency': summary([seconds for _, _, seconds in records]),
+            'endpoints': {name: summary(values) for name, values in sorted(by_endpoint.items())},
+            'accounts': summary(durations),
+        }
+
+
+def parse_endpoint_latency(items: List[str]) -> Dict[str, float]:
+    """解析命令行的 接口名=秒数"""
+    result = {}
+    for item in items:
+        name, _, seconds = item.partition('=')
+        result[name] = float(seconds)
+    return result
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """模拟服务的命令行参数，load_test.py 共用"""
+    parser.add_argument('--latency', type=float, default=0.0, help='每个响应的基础延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='附加的随机延迟上限（秒）')
+    parser.add_argument('--endpoint-latency', action='append', default=[], metavar='NAME=SECONDS',
+                        help=f"按接口覆盖延迟，可重复，接口名: {', '.join(ENDPOINTS.values())}")
+    parser.add_argument('--captcha-rate', type=float, default=0.0, help='写操作返回验证码的概率')
+    parser.add_argument('--ban-id', type=int, default=2, help='注入验证码的BanId')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回错误状态码的概率')
+    parser.add_argument('--error-status', type=int, default=503, help='注入的错误状态码')
+    parser.add_argument('--game-minutes', type=int, default=0,
+                        help='游戏中心任务剩余分钟数，0表示只需领取奖励（大于0时心跳按真实间隔等待）')
+    parser.add_argument('--heartbeat-interval', type=int, default=30, help='游戏心跳间隔（秒）')
+    parser.add_argument('--seed', type=int, help='随机数种子')
+
+
+def server_from_args(args: argparse.Namespace, port: int = 0) -> MockQidianServer:
+    return MockQidianServer(
+        port=port, latency=args.latency, jitter=args.jitter,
+        endpoint_latency=parse_endpoint_latency(args.endpoint_latency),
+        captcha_rate=args.captcha_rate, ban_id=args.ban_id, error_rate=args.error_rate,
+        error_status=args.error_status, game_minutes=args.game_minutes,
+        heartbeat_interval=args.heartbeat_interval, seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='本地起点接口模拟服务')
+    parser.add_argument('--port', type=int, default=8000, help='监听端口')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = server_from_args(args, port=args.port).start()
+    print(f"模拟服务已启动: {server.base_url}，按 Ctrl+C 停止")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(json.dumps(server.report(), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# coding: utf-8
+"""
+离线回放全流程计时
+
+先在项目根目录用录制模式正常跑一次（config.json 中加入 "replay": {"mode": "record"}），
+再用本脚本在临时目录中以回放模式运行多个账号，不访问起点服务器，节奏等待全部关闭。
+
+用法（在项目根目录执行）:
+    python bench/replay_run.py --users 20                       # 复制config.json中第一个账号，回放20个账号
+    python bench/replay_run.py --users 20 --latency recorded    # 按录制时的响应耗时等待
+    python bench/replay_run.py --stub --users 50 --concurrency 10
+"""
+import argparse
+import copy
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+
+def build_workdir(workdir: str, template: dict, cookies: dict, args: argparse.Namespace) -> None:
+    """在临时目录中生成回放用的 config.json 和 cookies 文件"""
+    user_template = template['users'][0]
+    users = []
+    os.makedirs(os.path.join(workdir, 'cookies'))
+    for i in range(args.users):
+        user = copy.deepcopy(user_template)
+        user['username'] = f"replay{i + 1}"
+        user['cookies_file'] = f"cookies/{user['username']}.json"
+        user['push_services'] = []
+        if args.skip_game:
+            user['tasks']['游戏中心任务'] = False
+        with open(os.path.join(workdir, user['cookies_file']), 'w', encoding='utf-8') as f:
+            json.dump(cookies, f, ensure_ascii=False)
+        users.append(user)
+
+    config = {key: value for key, value in template.items() if key != 'users'}
+    config.update({
+        'users': users,
+        'max_concurrent_users': args.concurrency,
+        'async_mode': False,
+        'skip_completed_tasks': False,
+        'push_outbox': False,
+        'pacing': {'default': {'min_interval': 0, 'jitter': [0, 0]}, 'retry_delay': [0, 0]},
+        'replay': {'mode': 'replay', 'fixtures': os.path.abspath(args.fixtures), 'latency': args.latency},
+    })
+    if args.profile:
+        config['profile_report'] = 'json'
+    with open(os.path.join(workdir, 'config.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='离线回放全流程计时')
+    parser.add_argument('--fixtures', default=os.path.join('fixtures', 'recording.json'), help='录制文件路径')
+    parser.add_argument('--users', type=int, default=10, help='回放的账号数')
+    parser.add_argument('--concurrency', type=int, default=5, help='同时执行任务的账号数')
+    parser.add_argument('--latency', default='0', help='每次响应的等待秒数，recorded 表示使用录制时的耗时')
+    parser.add_argument('--skip-game', action='store_true', help='不执行游戏中心任务（心跳按真实间隔等待）')
+    parser.add_argument('--profile', action='store_true', help='输出请求耗时统计')
+    parser.add_argument('--stub', action='store_true', help='使用桩签名模块代替 enctrypt_qidian')
+    parser.add_argument('--keep', action='store_true', help='保留临时目录（含日志）')
+    args = parser.parse_args()
+    if args.latency != 'recorded':
+        args.latency = float(args.latency)
+
+    if not os.path.exists(args.fixtures):
+        sys.exit(f"录制文件 {args.fixtures} 不存在，请先用录制模式运行一次")
+    with open('config.json', 'r', encoding='utf-8') as f:
+        template = json.load(f)
+    if not template.get('users'):
+        sys.exit("config.json 中没有账号，无法生成回放账号")
+    cookies_file = template['users'][0].get('cookies_file', f"cookies/{template['users'][0]['username']}.json")
+    with open(cookies_file, 'r', encoding='utf-8') as f:
+        cookies = json.load(f)
+
+    if args.stub:
+        import stub_signer
+        sys.modules['enctrypt_qidian'] = stub_signer
+
+    workdir = tempfile.mkdtemp(prefix='qdjob-replay-')
+    build_workdir(workdir, template, cookies, args)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        from QDjob import MainApp
+        start = time.perf_counter()
+        MainApp().run()
+        elapsed = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        if args.keep:
+            print(f"临时目录: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"回放{args.users}个账号（并发{args.concurrency}），总耗时 {elapsed:.2f} 秒，"
+          f"平均每个账号 {elapsed / args.users:.2f} 秒")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+# coding: utf-8
+"""
+签名桩模块，函数接口与 enctrypt_qidian 相同
+只用于在没有真实签名模块时跑通基准测试和本地调试，计算量近似真实签名（排序拼接 + 摘要 + base64），
+生成的值不能用于真实请求
+"""
+import base64
+import hashlib
+import hmac
+
+
+def _digest(*parts) -> str:
+    message = '|'.join(str(part) for part in parts).encode('utf-8')
+    mac = hmac.new(b'qdjob-bench', message, hashlib.sha256).digest()
+    return base64.b64encode(mac + hashlib.md5(message).digest()).decode('ascii')
+
+
+def _canonical(data: dict) -> str:
+    return '&'.join(f"{key}={data[key]}" for key in sorted(data))
+
+
+def getQDSign(ts, data, version, qid, userid=None):
+    return _digest('QDSign', ts, _canonical(data), version, qid, userid)
+
+
+def getSDKSign(ts, data, version, qid, userid=None):
+    return _digest('SDKSign', ts, _canonical(data), version, qid, userid)
+
+
+def getborgus(ts, data, versioncode, qid):
+    return _digest('borgus', ts, _canonical(data), versioncode, qid)
+
+
+def getuserid_from_QDInfo(QDInfo):
+    return str(int(hashlib.md5(QDInfo.encode('utf-8')).hexdigest()[:8], 16))
+
+
+def getQDInfo_byQDInfo(ts, QDInfo):
+    return _digest('QDInfo', ts, QDInfo)
+
+
+def getibex_byibex(ts, ibex):
+    return _digest('ibex', ts, ibex)
@@ -0,0 +1,219 @@
+# coding: utf-8
+import importlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from logger import set_log_user
+
+# 默认验证码识别设置：最多同时识别4个验证码；exhausted_codes 为表示 tokenid 次数已用完的返回码
+DEFAULT_CAPTCHA = {
+    'workers': 4,
+    'exhausted_codes': [],
+}
+# 验证码识别模块，需提供 main(tokenid, captcha_a_id, user_agent) 函数
+CAPTCHA_MODULE = 'Captcha'
+# 登录模块，提供 check_user_status(tokenid, usertype) 查询 tokenid 的剩余次数
+LOGIN_MODULE = 'Login'
+
+logger = logging.getLogger('Qidian')
+
+
+class CaptchaQuotaExhausted(Exception):
+    """tokenid 剩余次数已用完"""
+
+
+class _Quota:
+    """单个 tokenid 的剩余次数，remaining 为None表示未知，-1表示不限次数"""
+    __slots__ = ('remaining', 'exhausted', 'checked')
+
+    def __init__(self):
+        self.remaining: Optional[int] = None
+        self.exhausted = False
+        self.checked = False  # 是否已查询过剩余次数
+
+
+class CaptchaPool:
+    """
+    验证码识别线程池
+    所有客户端的验证码都提交到同一个有上限的线程池中识别，识别期间账号的其他任务和其他账号照常执行；
+    识别模块只导入一次，同一个 SessionKey 正在识别时不重复提交；
+    各 tokenid 第一次识别前查询一次剩余次数，之后按识别结果更新，用完后不再提交识别
+    """
+    def __init__(self, workers: int = 4, exhausted_codes: Tuple[int, ...] = (),
+                 solver: Optional[Callable[..., Any]] = None,
+                 status_checker: Optional[Callable[[str, str], Any]] = None):
+        """
+        :param exhausted_codes: 表示 tokenid 次数已用完的返回码
+        :param solver: 识别函数，参数与 Captcha.main 相同，不传则在首次识别时导入 Captcha 模块
+        :param status_checker: 查询剩余次数的函数，参数与返回值与 Login.check_user_status 相同，
+                               不传则在首次查询时导入 Login 模块
+        """
+        if int(workers) < 1:
+            raise ValueError("workers 必须为正整数")
+        self.workers = int(workers)
+        self.exhausted_codes = frozenset(int(code) for code in exhausted_codes)
+        self._solver = solver
+        self._solver_error: Optional[Exception] = None
+        self._status_checker = status_checker
+        self._status_checker_error: Optional[Exception] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[Tuple[str, str], Future] = {}
+        self._quotas: Dict[str, _Quota] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None) -> "CaptchaPool":
+        """
+        从 config.json 的 captcha 配置创建线程池，未配置的部分使用 DEFAULT_CAPTCHA
+        :raises ValueError: 配置格式错误
+        """
+        config = config if isinstance(config, dict) else {}
+        unknown = set(config) - set(DEFAULT_CAPTCHA)
+        if unknown:
+            raise ValueError(f"未知的配置项: {', '.join(sorted(unknown))}")
+        options = {**DEFAULT_CAPTCHA, **config}
+        options['exhausted_codes'] = tuple(options['exhausted_codes'])
+        return cls(**options)
+
+    def _load_solver(self) -> Callable[..., Any]:
+        """导入识别模块，成功或失败都只尝试一次"""
+        with self._lock:
+            if self._solver is None and self._solver_error is None:
+                try:
+                    self._solver = importlib.import_module(CAPTCHA_MODULE).main
+                except (ImportError, AttributeError) as e:
+                    self._solver_error = e
+                    logger.error(f"加载验证码识别模块失败: {e}")
+            if self._solver is None:
+                raise ImportError(f"验证码识别模块不可用: {self._solver_error}")
+            return self._solver
+
+    def _load_status_checker(self) -> Optional[Callable[[str, str], Any]]:
+        """导入查询剩余次数的函数，成功或失败都只尝试一次，不可用时返回None"""
+        with self._lock:
+            if self._status_checker is None and self._status_checker_error is None:
+                try:
+                    self._status_checker = importlib.import_module(LOGIN_MODULE).check_user_status
+                except (ImportError, AttributeError) as e:
+                    self._status_checker_error = e
+                    logger.warning(f"加载登录模块失败，无法查询tokenid剩余次数: {e}")
+            return self._status_checker
+
+    def exhausted(self, tokenid: str) -> bool:
+        """tokenid 的剩余次数是否已用完"""
+        with self._lock:
+            quota = self._quotas.get(tokenid)
+            return quota is not None and quota.exhausted
+
+    def remaining(self, tokenid: str) -> Optional[int]:
+        """tokenid 的剩余次数，未知时返回None"""
+        with self._lock:
+            quota = self._quotas.get(tokenid)
+            return quota.remaining if quota is not None else None
+
+    def submit(self, tokenid: str, captcha_a_id: str, user_agent: str,
+               session_key: Optional[str] = None, username: Optional[str] = None,
+               usertype: Optional[str] = None) -> Future:
+        """
+        提交验证码识别
+        :param session_key: RiskConf 中的 SessionKey，相同时复用正在进行的识别
+        :param username: 用于日志标签
+        :param usertype: 查询 tokenid 剩余次数用，未设置时不查询
+        :return: Future，结果为识别模块的返回值；识别前查询到次数已用完时为 CaptchaQuotaExhausted 异常
+        :raises CaptchaQuotaExhausted: tokenid 剩余次数已用完
+        """
+        key = (tokenid, session_key) if session_key else None
+        with self._lock:
+            quota = self._quotas.setdefault(tokenid, _Quota())
+            if quota.exhausted:
+                raise CaptchaQuotaExhausted("tokenid 剩余次数已用完")
+            if key is not None and key in self._inflight:
+                logger.info("相同的验证码正在识别，等待识别结果")
+                return self._inflight[key]
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='QDjob-captcha')
+            future = self._executor.submit(self._solve, tokenid, captcha_a_id, user_agent, username, usertype)
+            if key is not None:
+                self._inflight[key] = future
+        if key is not None:
+            future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def _forget(self, key: Tuple[str, str]) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _solve(self, tokenid: str, captcha_a_id: str, user_agent: str, username: Optional[str],
+               usertype: Optional[str]) -> Any:
+        set_log_user(username)
+        try:
+            if usertype:
+                self._check_quota(tokenid, usertype)
+            solver = self._load_solver()
+            result = solver(tokenid=tokenid, captcha_a_id=captcha_a_id, user_agent=user_agent)
+            self._update_quota(tokenid, result)
+            return result
+        finally:
+            set_log_user(None)
+
+    def _check_quota(self, tokenid: str, usertype: str) -> None:
+        """
+        tokenid 第一次识别前查询剩余次数，查询失败时视为未知
+        :raises CaptchaQuotaExhausted: tokenid 剩余次数已用完
+        """
+        with self._lock:
+            quota = self._quotas.setdefault(tokenid, _Quota())
+            checked, quota.checked = quota.checked, True
+        if not checked:
+            checker = self._load_status_checker()
+            status = None
+            if checker is not None:
+                try:
+                    status = checker(tokenid, usertype)
+                except Exception as e:
+                    logger.warning(f"查询tokenid剩余次数失败: {e}")
+            remaining = status.get('remaining_calls') if isinstance(status, dict) else None
+            if isinstance(remaining, int) and not isinstance(remaining, bool):
+                logger.info(f"tokenid剩余次数: {'无限制' if remaining == -1 else remaining}")
+                self._update_quota(tokenid, {'remaining_calls': remaining})
+        if self.exhausted(tokenid):
+            raise CaptchaQuotaExhausted("tokenid 剩余次数已用完")
+
+    def _update_quota(self, tokenid: str, result: Any) -> None:
+        """按识别结果更新剩余次数：返回了 remaining_calls 时以其为准，否则成功一次减一"""
+        if not isinstance(result, dict):
+            return
+        with self._lock:
+            quota = self._quotas.setdefault(tokenid, _Quota())
+            code = result.get('code')
+            remaining = result.get('remaining_calls')
+            if isinstance(remaining, int):
+                quota.remaining = remaining
+            elif code == 0 and quota.remaining is not None and quota.remaining > 0:
+                quota.remaining -= 1
+            if code in self.exhausted_codes or quota.remaining == 0:
+                if not quota.exhausted:
+                    logger.warning("tokenid 剩余次数已用完，本次运行不再识别验证码")
+                quota.exhausted = True
+
+    def close(self) -> None:
+        """等待正在进行的识别结束"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+_default_pool: Optional[CaptchaPool] = None
+_default_lock = threading.Lock()
+
+
+def default_captcha_pool() -> CaptchaPool:
+    """未指定线程池的客户端共用的默认线程池"""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = CaptchaPool()
+        return _default_pool
@@ -0,0 +1,91 @@
+# coding: utf-8
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Mapping, Optional
+
+# 同一用户两次写入 cookies 文件的最短间隔（秒），期间的更新合并到下一次写入
+DEFAULT_COOKIE_DEBOUNCE = 30
+# 每次请求都会重新计算、或只属于单次游戏会话的 cookie，不写回文件
+EPHEMERAL_COOKIES = frozenset({'QDInfo', 'PHESSID', 'trackid'})
+
+logger = logging.getLogger('Qidian')
+
+
+def write_cookies_file(path: str, cookies: Mapping[str, str]) -> None:
+    """写入 cookies 文件（先写临时文件再替换，避免中断时文件损坏）"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(cookies), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class _Entry:
+    __slots__ = ('path', 'cookies', 'dirty', 'last_write')
+
+    def __init__(self, path: str, cookies: Dict[str, str]):
+        self.path = path
+        self.cookies = cookies
+        self.dirty = False
+        self.last_write: Optional[float] = None
+
+
+class CookieStore:
+    """
+    cookies 持久化
+    以各用户 cookies 文件的内容为基准，合并服务器通过 Set-Cookie 下发的更新，
+    只有内容变化时才写回文件；同一用户的写入间隔不小于 debounce 秒，期间的更新在 flush 时写入
+    """
+    def __init__(self, debounce: float = DEFAULT_COOKIE_DEBOUNCE):
+        self.debounce = debounce
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, username: str, path: str, cookies: Mapping[str, str]) -> None:
+        """
+        记录用户 cookies 文件的路径和从文件读取的内容（保存副本，不受请求中修改的影响）
+        每个用户只记录第一次，同一用户之后创建的客户端（如登录预检后执行任务的客户端）不会覆盖已合并的更新
+        """
+        with self._lock:
+            if username not in self._entries:
+                self._entries[username] = _Entry(path, dict(cookies))
+
+    def update(self, username: str, cookies: Mapping[str, str]) -> None:
+        """合并服务器下发的 cookies，写回的内容为文件中的原始值（含原始 QDInfo）加上服务器下发的非临时 cookie"""
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return
+            changed = {name: value for name, value in cookies.items()
+                       if name not in EPHEMERAL_COOKIES and value and entry.cookies.get(name) != value}
+            if not changed:
+                return
+            entry.cookies.update(changed)
+            entry.dirty = True
+            logger.debug(f"服务器更新了cookies: {', '.join(changed)}")
+            if entry.last_write is None or time.monotonic() - entry.last_write >= self.debounce:
+                self._write(entry)
+
+    def flush(self, username: Optional[str] = None) -> None:
+        """写入有变化但尚未保存的 cookies，不指定用户时写入所有用户"""
+        with self._lock:
+            if username is None:
+                entries = list(self._entries.values())
+            else:
+                entries = [self._entries[username]] if username in self._entries else []
+            for entry in entries:
+                if entry.dirty:
+                    self._write(entry)
+
+    def _write(self, entry: _Entry) -> None:
+        try:
+            write_cookies_file(entry.path, entry.cookies)
+        except OSError as e:
+            logger.error(f"保存cookies失败: {e}")
+            return
+        entry.dirty = False
+        entry.last_write = time.monotonic()
+        logger.debug(f"保存cookies成功: {entry.path}")
@@ -0,0 +1,35 @@
+# coding: utf-8
+from typing import Any, Dict
+
+
+class AccountCryptoContext:
+    """
+    单个账号的签名上下文
+    账号的固定参数（版本、qid、QDInfo、ibex）和由QDInfo解码的userid在创建时解析一次，
+    签名模块的其他函数都以时间戳为输入，签名字段每次请求重新计算
+    """
+    def __init__(self, signer: Any, version: str, versioncode: str, qid: str, QDInfo: str, ibex: str):
+        self.signer = signer
+        self.version = version
+        self.versioncode = versioncode
+        self.qid = qid
+        self.QDInfo = QDInfo
+        self.ibex = ibex
+        self.userid = signer.getuserid_from_QDInfo(QDInfo)
+
+    def qd_sign(self, ts: str, data_encrypt: dict) -> Dict[str, str]:
+        """qd类型请求的签名字段"""
+        return {
+            'QDSign': self.signer.getQDSign(ts, data_encrypt, self.version, self.qid, userid=self.userid),
+            'QDInfo': self.signer.getQDInfo_byQDInfo(ts, self.QDInfo),
+            'borgus': self.signer.getborgus(ts, data_encrypt, self.versioncode, self.qid),
+        }
+
+    def sdk_sign(self, ts: str, data_encrypt: dict) -> Dict[str, str]:
+        """sdk类型请求的签名字段"""
+        return {
+            'SDKSign': self.signer.getSDKSign(ts, data_encrypt, self.version, self.qid, userid=self.userid),
+            'QDInfo': self.signer.getQDInfo_byQDInfo(ts, self.QDInfo),
+            'borgus': self.signer.getborgus(ts, data_encrypt, self.versioncode, self.qid),
+            'ibex': self.signer.getibex_byibex(ts, self.ibex),
+        }
@@ -0,0 +1,129 @@
+# coding: utf-8
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+from logger import set_log_user
+
+logger = logging.getLogger('Qidian')
+
+
+class _HeartbeatJob:
+    """单个账号的游戏心跳任务"""
+    def __init__(self, beat: Callable[[], Optional[int]], full_time: int,
+                 username: Optional[str], future: Future):
+        self.beat = beat
+        self.full_time = full_time
+        self.username = username
+        self.future = future
+        self.run_time = 0
+
+
+class HeartbeatScheduler:
+    """
+    游戏心跳调度器
+    所有账号的待发心跳按到期时间放入最小堆，由一个后台线程依次发送，
+    等待心跳期间调用方可以继续执行其他任务
+    """
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def submit(self, beat: Callable[[], Optional[int]], full_time: int,
+               username: Optional[str] = None) -> Future:
+        """
+        提交心跳任务
+        :param beat: 发送一次心跳，返回下次心跳间隔（秒），返回None表示心跳失败
+        :param full_time: 需要累计的游戏时长（秒）
+        :param username: 用于日志标签
+        :return: Future，时长满足时结果为True，心跳失败为False
+        """
+        future = Future()
+        job = _HeartbeatJob(beat, full_time, username, future)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("心跳调度器已关闭")
+            self._push(time.monotonic(), job)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='QDjob-heartbeat', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    @property
+    def pending(self) -> int:
+        """尚未结束的心跳任务数"""
+        with self._cond:
+            return len(self._heap)
+
+    def shutdown(self) -> None:
+        """停止调度，未完成的心跳任务以失败结束"""
+        with self._cond:
+            self._closed = True
+            jobs = [job for _, _, job in self._heap]
+            self._heap.clear()
+            self._cond.notify_all()
+        for job in jobs:
+            if not job.future.done():
+                job.future.set_result(False)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _push(self, due: float, job: _HeartbeatJob) -> None:
+        heapq.heappush(self._heap, (due, next(self._counter), job))
+
+    def _next_due_job(self) -> Optional[_HeartbeatJob]:
+        """阻塞直到有心跳到期，调度器关闭时返回None"""
+        with self._cond:
+            while not self._closed:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - time.monotonic()
+                if delay <= 0:
+                    return heapq.heappop(self._heap)[2]
+                self._cond.wait(delay)
+            return None
+
+    def _run(self) -> None:
+        while True:
+            job = self._next_due_job()
+            if job is None:
+                return
+            self._step(job)
+
+    def _step(self, job: _HeartbeatJob) -> None:
+        """处理一个到期的心跳任务"""
+        # 上一次心跳的间隔已经等待完毕，时长满足则结束
+        if job.run_time >= job.full_time:
+            job.future.set_result(True)
+            return
+
+        set_log_user(job.username)
+        try:
+            interval = job.beat()
+        except Exception as e:
+            logger.error(f"心跳异常: {e}")
+            interval = None
+        finally:
+            set_log_user(None)
+
+        if not interval:
+            job.future.set_result(False)
+            return
+
+        job.run_time += interval
+        with self._cond:
+            if self._closed:
+                job.future.set_result(False)
+                return
+            self._push(time.monotonic() + interval, job)
+            self._cond.notify()
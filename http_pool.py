@@ -0,0 +1,83 @@
+# coding: utf-8
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 默认连接池：每个域名最多保留10条空闲长连接，连接池满时不阻塞（超出的连接用完即关闭）
+# 起点只用到 druidv6/h5/lygame 三个域名，pool_connections 留一点余量
+DEFAULT_HTTP_POOL = {
+    'pool_connections': 4,
+    'pool_maxsize': 10,
+    'pool_block': False,
+}
+
+
+class _PooledSession(requests.Session):
+    """挂载共享连接池的会话，关闭会话时不关闭共享连接池"""
+    def __init__(self, pool: "SharedHTTPPool"):
+        super().__init__()
+        self._pool = pool
+        self.mount('https://', pool.adapter)
+        self.mount('http://', pool.adapter)
+
+    def close(self) -> None:
+        for adapter in self.adapters.values():
+            if adapter is not self._pool.adapter:
+                adapter.close()
+
+
+class SharedHTTPPool:
+    """
+    多个账号共享的HTTP连接池
+    所有 QidianClient 的会话挂载同一个 HTTPAdapter，复用已建立的 TLS 长连接；
+    Cookie 仍保存在各自的 Session 中，账号之间互不影响
+    """
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 10, pool_block: bool = False):
+        if int(pool_connections) < 1:
+            raise ValueError("pool_connections 必须为正整数")
+        if int(pool_maxsize) < 1:
+            raise ValueError("pool_maxsize 必须为正整数")
+        self.pool_connections = int(pool_connections)
+        self.pool_maxsize = int(pool_maxsize)
+        self.pool_block = bool(pool_block)
+        self.adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                                   pool_maxsize=self.pool_maxsize,
+                                   pool_block=self.pool_block)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None,
+                    min_maxsize: int = 1) -> "SharedHTTPPool":
+        """
+        从 config.json 的 http_pool 配置创建连接池，未配置的部分使用 DEFAULT_HTTP_POOL
+        :param min_maxsize: pool_maxsize 的下限，一般为并发用户数，保证并发请求都能复用连接
+        :raises ValueError: 配置格式错误
+        """
+        return cls(**cls.options_from_config(config, min_maxsize))
+
+    @staticmethod
+    def options_from_config(config: Optional[Dict[str, Any]] = None, min_maxsize: int = 1) -> Dict[str, Any]:
+        """
+        校验 http_pool 配置并补全默认值
+        :raises ValueError: 配置格式错误
+        """
+        config = config or {}
+        if not isinstance(config, dict):
+            raise ValueError("http_pool 配置必须为字典类型")
+        unknown = set(config) - set(DEFAULT_HTTP_POOL)
+        if unknown:
+            raise ValueError(f"未知的配置项: {', '.join(sorted(unknown))}")
+        options = {**DEFAULT_HTTP_POOL, **config}
+        options['pool_maxsize'] = max(int(options['pool_maxsize']), min_maxsize)
+        return options
+
+    def session(self, account: Optional[str] = None) -> requests.Session:
+        """
+        创建挂载共享连接池的新会话
+        :param account: 会话所属的账号，录制/回放连接池按账号区分，这里不使用
+        """
+        return _PooledSession(self)
+
+    def close(self) -> None:
+        """关闭所有空闲连接"""
+        self.adapter.close()
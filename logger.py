@@ -1,9 +1,32 @@
 import logging
 import os
+import contextvars
 import logging.handlers
+from typing import Optional
 
 LOG_DIR = 'logs'
 DEFAULT_LOG_RETENTION = 7
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(user_tag)s%(message)s'
+
+_log_user = contextvars.ContextVar('log_user', default=None)
+
+
+def set_log_user(username: Optional[str]) -> None:
+    """设置当前线程/协程日志的用户标签，传入None清除"""
+    _log_user.set(username)
+
+
+def get_log_user() -> Optional[str]:
+    """当前线程/协程日志的用户标签"""
+    return _log_user.get()
+
+
+class UserTagFilter(logging.Filter):
+    """为日志记录附加当前线程/协程的用户标签，便于区分并发输出"""
+    def filter(self, record: logging.LogRecord) -> bool:
+        username = _log_user.get()
+        record.user_tag = f"[{username}] " if username else ""
+        return True
 
 class LoggerManager:
     _instance = None
@@ -25,12 +48,15 @@ class LoggerManager:
             backupCount=DEFAULT_LOG_RETENTION,
             encoding='utf-8'
         )
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        formatter = logging.Formatter(LOG_FORMAT)
         file_handler.setFormatter(formatter)
+        file_handler.addFilter(UserTagFilter())
         return file_handler
     
     def setup_basic_logger(self):
-        """初始化基础日志系统（用于 pre_check）"""
+        """初始化基础日志系统（用于 pre_check），已初始化时直接返回，不覆盖 reconfigure_logger 的配置"""
+        if self._logger is not None:
+            return self._logger
         self._logger = logging.getLogger('Qidian')
         self._logger.setLevel('INFO')
 
@@ -40,7 +66,8 @@ class LoggerManager:
 
         # 添加控制台 handler
         console_handler = logging.StreamHandler()
-        console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(user_tag)s%(message)s'))
+        console_handler.addFilter(UserTagFilter())
         self._logger.addHandler(console_handler)
 
         # 添加文件 handler
@@ -58,11 +85,12 @@ class LoggerManager:
             self._logger.removeHandler(handler)
 
         # 创建日志格式
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        formatter = logging.Formatter(LOG_FORMAT)
 
         # 控制台输出
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(formatter)
+        console_handler.addFilter(UserTagFilter())
         self._logger.addHandler(console_handler)
 
         # 文件输出（带自动清理）
@@ -76,6 +104,7 @@ class LoggerManager:
             encoding='utf-8'
         )
         file_handler.setFormatter(formatter)
+        file_handler.addFilter(UserTagFilter())
         self._logger.addHandler(file_handler)
 
         return self._logger
@@ -0,0 +1,87 @@
+# coding: utf-8
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from push import PushService
+
+logger = logging.getLogger('Qidian')
+
+
+def deliver(push_service: PushService, title: str, content: str) -> Dict[str, Any]:
+    """发送一条推送并记录结果"""
+    service_name = push_service.__class__.__name__
+    try:
+        result = push_service.send(title, content)
+    except Exception as e:
+        logger.error(f"[{service_name}] 推送异常: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+    if result.get('success'):
+        logger.info(f"[{service_name}] 推送成功")
+    else:
+        logger.info(f"[{service_name}] 推送失败")
+        logger.debug(f"[{service_name}] 原始返回: {result.get('raw')}")
+    return result
+
+
+class NotificationDispatcher:
+    """
+    推送分发器
+    推送在后台线程池中并发发送，调用方提交后立即返回，
+    一个推送服务响应慢不会拖住其他服务和后续用户
+    """
+    def __init__(self, max_workers: int = 8):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='QDjob-push')
+        self._futures: List[Future] = []
+
+    def submit(self, push_service: PushService, title: str, content: str) -> Future:
+        """提交一条推送，日志沿用提交时的用户标签"""
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, deliver, push_service, title, content)
+        self._futures.append(future)
+        return future
+
+    def send_all(self, push_services: List[PushService], title: str, content: str) -> List[Future]:
+        """同一条消息并发发送到多个推送服务"""
+        return [self.submit(push_service, title, content) for push_service in push_services]
+
+    def close(self) -> None:
+        """等待所有已提交的推送发送完毕"""
+        self._executor.shutdown(wait=True)
+        failed = sum(1 for future in self._futures if not future.result().get('success'))
+        if failed:
+            logger.warning(f"共{len(self._futures)}条推送，{failed}条发送失败")
+
+
+class DigestCollector:
+    """
+    汇总推送
+    按推送目标收集所有用户的报告，运行结束时每个目标只发送一条包含各用户小节的消息，
+    多个账号共用同一个机器人时不会重复请求、触发限流
+    """
+    def __init__(self):
+        self._groups: Dict[str, Tuple[PushService, List[Tuple[str, str]]]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, push_services: List[PushService], title: str, content: str) -> None:
+        """收集一个用户的报告"""
+        with self._lock:
+            for push_service in push_services:
+                key = push_service.destination_key()
+                if key not in self._groups:
+                    self._groups[key] = (push_service, [])
+                self._groups[key][1].append((title, content))
+
+    def flush(self, dispatcher: NotificationDispatcher) -> None:
+        """每个推送目标发送一条汇总消息"""
+        with self._lock:
+            groups = list(self._groups.values())
+            self._groups.clear()
+        for push_service, sections in groups:
+            title = f"任务完成汇总 - {len(sections)}个用户"
+            content = "\n\n".join(f"【{section_title}】\n{section_content}"
+                                   for section_title, section_content in sections)
+            dispatcher.submit(push_service, title, content)
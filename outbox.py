@@ -0,0 +1,309 @@
+# coding: utf-8
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from logger import get_log_user, set_log_user
+from notify import NotificationDispatcher
+from push import PushService, PUSH_TYPES
+from state import STATE_DIR
+
+OUTBOX_FILE = os.path.join(STATE_DIR, 'push_outbox.json')
+
+# 默认发件箱设置：失败后按 30秒、1分钟、2分钟...(上限1小时) 退避重试，
+# 最多尝试8次，超过3天仍未发出的消息丢弃；程序退出前最多等待30秒
+DEFAULT_PUSH_OUTBOX = {
+    'max_attempts': 8,
+    'backoff': [30, 3600],
+    'max_age': 3 * 86400,
+    'flush_timeout': 30,
+    'rate_limits': {},
+}
+
+logger = logging.getLogger('Qidian')
+
+
+class PushOutbox:
+    """
+    持久化推送发件箱
+    推送先写入 state/push_outbox.json，再由后台线程按各推送平台的频率限制交给 NotificationDispatcher 的线程池发送，
+    失败的推送退避重试，本次运行没发出去的推送下次启动时继续发送
+    文件中只保存推送目标的标识和消息内容，webhook、密钥等配置在发送时从当前配置中查找
+    接口与 NotificationDispatcher 相同，可直接替换
+    """
+    def __init__(self, path: str = OUTBOX_FILE, max_attempts: int = 8, backoff: Tuple[float, float] = (30, 3600),
+                 max_age: float = 3 * 86400, flush_timeout: float = 30,
+                 rate_limits: Optional[Dict[str, List[List[int]]]] = None,
+                 resolver: Optional[Callable[[Optional[str]], Iterable[PushService]]] = None):
+        """
+        :param rate_limits: 按推送类型覆盖频率限制，如 {"serverchan": [[5, 86400]]}
+        :param resolver: 按用户名读取当前配置中的推送服务（用户名为None时读取所有用户的），
+                         用于找回上次运行遗留推送的推送目标；不传则只能发送本次运行提交的推送
+        """
+        if int(max_attempts) < 1:
+            raise ValueError("max_attempts 必须为正整数")
+        if len(backoff) != 2 or backoff[0] < 0 or backoff[1] < backoff[0]:
+            raise ValueError("backoff 必须为 [初始间隔, 最大间隔]")
+        self.path = path
+        self.max_attempts = int(max_attempts)
+        self.backoff_base, self.backoff_max = float(backoff[0]), float(backoff[1])
+        self.max_age = float(max_age)
+        self.flush_timeout = float(flush_timeout)
+        self.rate_limits = {push_type: self._parse_limits(push_type, limits)
+                            for push_type, limits in (rate_limits or {}).items()}
+
+        self.resolver = resolver
+
+        self._entries: List[Dict[str, Any]] = []
+        self._sent: Dict[str, List[float]] = {}  # 推送目标 -> 最近的发送时间
+        self._services: Dict[str, PushService] = {}  # 推送目标 -> 推送服务
+        self._sending: Set[str] = set()  # 正在发送的推送id
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._dispatcher: Optional[NotificationDispatcher] = None
+        self._deadline: Optional[float] = None  # 退出前发送的截止时间
+        self._stopped = False
+        self._loaded = False
+
+    @staticmethod
+    def _parse_limits(push_type: str, limits: Any) -> Tuple[Tuple[int, float], ...]:
+        if push_type not in PUSH_TYPES:
+            raise ValueError(f"未知的推送类型: {push_type}")
+        parsed = []
+        for limit in limits:
+            count, seconds = limit
+            if int(count) < 1 or float(seconds) <= 0:
+                raise ValueError(f"{push_type} 的频率限制必须为 [次数, 秒数] 且均大于0")
+            parsed.append((int(count), float(seconds)))
+        return tuple(parsed)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None, path: str = OUTBOX_FILE,
+                    resolver: Optional[Callable[[Optional[str]], Iterable[PushService]]] = None) -> "PushOutbox":
+        """
+        从 config.json 的 push_outbox 配置创建发件箱，未配置的部分使用 DEFAULT_PUSH_OUTBOX
+        :raises ValueError: 配置格式错误
+        """
+        config = config if isinstance(config, dict) else {}
+        unknown = set(config) - set(DEFAULT_PUSH_OUTBOX)
+        if unknown:
+            raise ValueError(f"未知的配置项: {', '.join(sorted(unknown))}")
+        options = {**DEFAULT_PUSH_OUTBOX, **config}
+        options['backoff'] = tuple(options['backoff'])
+        return cls(path=path, resolver=resolver, **options)
+
+    def _load(self) -> None:
+        """读取上次运行遗留的推送"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._entries = data.get('entries', [])
+            self._sent = data.get('sent', {})
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"读取推送发件箱失败: {e}")
+            return
+        if self._entries:
+            logger.info(f"推送发件箱中有{len(self._entries)}条上次未发出的推送")
+
+    def _save(self) -> None:
+        """写入发件箱文件（先写临时文件再替换，避免中断时文件损坏）"""
+        data = {'entries': self._entries, 'sent': self._sent}
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"写入推送发件箱失败: {e}")
+
+    def start(self) -> None:
+        """读取遗留的推送并启动后台发送线程"""
+        with self._cond:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+            if self._thread is None:
+                self._dispatcher = NotificationDispatcher()
+                self._deadline = None
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name='QDjob-outbox', daemon=True)
+                self._thread.start()
+
+    def submit(self, push_service: PushService, title: str, content: str) -> None:
+        """推送写入发件箱后立即返回"""
+        now = time.time()
+        destination = self._destination(push_service)
+        entry = {
+            'id': uuid.uuid4().hex,
+            'destination': destination,
+            'type': push_service.push_type,
+            'title': title,
+            'content': content,
+            'user': get_log_user(),
+            'attempts': 0,
+            'created': now,
+            'next_try': now,
+        }
+        self.start()
+        with self._cond:
+            self._services[destination] = push_service
+            self._entries.append(entry)
+            self._save()
+            self._cond.notify()
+
+    def send_all(self, push_services: List[PushService], title: str, content: str) -> None:
+        """同一条消息发送到多个推送服务"""
+        for push_service in push_services:
+            self.submit(push_service, title, content)
+
+    def close(self) -> None:
+        """等待当前可以发送的推送发送完毕（最多 flush_timeout 秒），其余留到下次运行"""
+        self.start()
+        with self._cond:
+            self._deadline = time.time() + self.flush_timeout
+            self._cond.notify()
+        self._thread.join(self.flush_timeout)
+        with self._cond:
+            # 超时后不再取新的推送
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+        # 等待已经交给线程池的推送发送完毕（受推送请求的超时限制）
+        self._dispatcher.close()
+        with self._cond:
+            remaining = len(self._entries)
+            self._save()
+        self._thread = None
+        self._dispatcher = None
+
+        if remaining:
+            logger.info(f"推送发件箱中还有{remaining}条推送，下次运行时继续发送")
+
+    @staticmethod
+    def _destination(push_service: PushService) -> str:
+        """推送目标标识，配置完全相同的推送服务共用频率限制；只保存配置的哈希，不把密钥写入文件"""
+        return hashlib.sha256(push_service.destination_key().encode('utf-8')).hexdigest()
+
+    def _limits(self, push_type: str) -> Tuple[Tuple[int, float], ...]:
+        if push_type in self.rate_limits:
+            return self.rate_limits[push_type]
+        cls = PUSH_TYPES.get(push_type)
+        return cls.rate_limits if cls else ()
+
+    def _available_at(self, destination: str, limits: Tuple[Tuple[int, float], ...], now: float) -> float:
+        """按频率限制，该推送目标最早可以发送的时间"""
+        sent = self._sent.get(destination, [])
+        available = now
+        for count, seconds in limits:
+            recent = [t for t in sent if t > now - seconds]
+            if len(recent) >= count:
+                available = max(available, recent[-count] + seconds)
+        return available
+
+    def _record_sent(self, destination: str, limits: Tuple[Tuple[int, float], ...], now: float) -> None:
+        window = max((seconds for _, seconds in limits), default=0)
+        sent = [t for t in self._sent.get(destination, []) if t > now - window]
+        if window:
+            sent.append(now)
+        if sent:
+            self._sent[destination] = sent
+        else:
+            self._sent.pop(destination, None)
+
+    def _next_entry(self) -> Optional[Dict[str, Any]]:
+        """阻塞直到有可以发送的推送，标记为发送中并计入频率限制；退出时返回None"""
+        with self._cond:
+            while not self._stopped:
+                now = time.time()
+                self._drop_expired(now)
+                due, entry = None, None
+                for candidate in self._entries:
+                    if candidate['id'] in self._sending:
+                        continue
+                    at = max(candidate['next_try'],
+                             self._available_at(candidate['destination'], self._limits(candidate['type']), now))
+                    if due is None or at < due:
+                        due, entry = at, candidate
+                if entry is not None and due <= now:
+                    self._sending.add(entry['id'])
+                    self._record_sent(entry['destination'], self._limits(entry['type']), now)
+                    return entry
+                # 退出时只等待截止时间前能发送的推送，其余留到下次运行
+                if self._deadline is not None and (due is None or due > self._deadline):
+                    return None
+                self._cond.wait(None if due is None else due - now)
+            return None
+
+    def _drop_expired(self, now: float) -> None:
+        for entry in list(self._entries):
+            if entry['id'] not in self._sending and now - entry['created'] > self.max_age:
+                logger.warning(f"推送[{entry['title']}]超过{int(self.max_age // 3600)}小时仍未发出，已丢弃")
+                self._entries.remove(entry)
+
+    def _run(self) -> None:
+        while True:
+            entry = self._next_entry()
+            if entry is None:
+                return
+            self._dispatch(entry)
+
+    def _resolve(self, entry: Dict[str, Any]) -> Optional[PushService]:
+        """查找推送目标对应的推送服务，本次运行没有提交过时从当前配置中读取"""
+        push_service = self._services.get(entry['destination'])
+        if push_service is not None or self.resolver is None:
+            return push_service
+        for candidate in self.resolver(entry.get('user')):
+            destination = self._destination(candidate)
+            with self._cond:
+                self._services.setdefault(destination, candidate)
+            if destination == entry['destination']:
+                return candidate
+        return None
+
+    def _dispatch(self, entry: Dict[str, Any]) -> None:
+        """把一条推送交给线程池发送，发送结果在回调中更新发件箱"""
+        set_log_user(entry.get('user'))
+        try:
+            push_service = self._resolve(entry)
+            if push_service is None:
+                logger.warning(f"推送[{entry['title']}]的推送目标已不在配置中，已丢弃")
+                with self._cond:
+                    self._sending.discard(entry['id'])
+                    self._entries.remove(entry)
+                    self._save()
+                return
+            future = self._dispatcher.submit(push_service, entry['title'], entry['content'])
+        finally:
+            set_log_user(None)
+        future.add_done_callback(lambda done: self._finish(entry, bool(done.result().get('success'))))
+
+    def _finish(self, entry: Dict[str, Any], success: bool) -> None:
+        """按发送结果更新发件箱"""
+        set_log_user(entry.get('user'))
+        try:
+            now = time.time()
+            with self._cond:
+                self._sending.discard(entry['id'])
+                entry['attempts'] += 1
+                if success:
+                    self._entries.remove(entry)
+                elif entry['attempts'] >= self.max_attempts:
+                    logger.error(f"推送[{entry['title']}]已失败{entry['attempts']}次，不再重试")
+                    self._entries.remove(entry)
+                else:
+                    delay = min(self.backoff_max, self.backoff_base * 2 ** (entry['attempts'] - 1))
+                    entry['next_try'] = now + random.uniform(delay / 2, delay)
+                    logger.info(f"推送将在{int(entry['next_try'] - now)}秒后重试")
+                self._save()
+                self._cond.notify()
+        finally:
+            set_log_user(None)
@@ -0,0 +1,136 @@
+# coding: utf-8
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+# 默认节奏：同一域名两次请求至少间隔2秒，需要等待时再附加0~1秒随机抖动；
+# 纯查询接口不等待
+DEFAULT_PACING = {
+    'default': {'min_interval': 2.0, 'jitter': [0, 1], 'burst': 1},
+    'hosts': {},
+    'endpoints': {
+        '/argus/api/v1/user/getprofile': {'min_interval': 0},
+        '/argus/api/v2/checkin/detail': {'min_interval': 0},
+    },
+    'retry_delay': [1, 2],
+}
+
+
+class PacingRule:
+    """单条节奏规则"""
+    def __init__(self, min_interval: float = 0, jitter: Tuple[float, float] = (0, 0), burst: int = 1):
+        if min_interval < 0:
+            raise ValueError("min_interval 不能为负数")
+        if len(jitter) != 2 or jitter[0] < 0 or jitter[1] < jitter[0]:
+            raise ValueError("jitter 必须为 [下限, 上限] 且 0 <= 下限 <= 上限")
+        if burst < 1:
+            raise ValueError("burst 必须为正整数")
+        self.min_interval = float(min_interval)
+        self.jitter = (float(jitter[0]), float(jitter[1]))
+        self.burst = int(burst)
+
+    @classmethod
+    def from_config(cls, data: Dict[str, Any], base: Optional["PacingRule"] = None) -> "PacingRule":
+        """从配置字典创建规则，未配置的字段沿用 base"""
+        base = base or cls()
+        return cls(
+            min_interval=data.get('min_interval', base.min_interval),
+            jitter=tuple(data.get('jitter', base.jitter)),
+            burst=data.get('burst', base.burst),
+        )
+
+
+class PacingPolicy:
+    """
+    请求节奏策略（只读，可在多个账号间共享）
+    规则优先级：接口路径 > 域名 > 默认
+    """
+    def __init__(self, default: PacingRule, hosts: Dict[str, PacingRule] = None,
+                 endpoints: Dict[str, PacingRule] = None, retry_delay: Tuple[float, float] = (1, 2)):
+        self.default = default
+        self.hosts = hosts or {}
+        self.endpoints = endpoints or {}
+        self.retry_delay = retry_delay
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None) -> "PacingPolicy":
+        """
+        从 config.json 的 pacing 配置创建策略，未配置的部分使用 DEFAULT_PACING
+        :raises ValueError: 配置格式错误
+        """
+        config = config or {}
+        if not isinstance(config, dict):
+            raise ValueError("pacing 配置必须为字典类型")
+
+        default = PacingRule.from_config({**DEFAULT_PACING['default'], **config.get('default', {})})
+        hosts = {
+            host: PacingRule.from_config(rule, default)
+            for host, rule in {**DEFAULT_PACING['hosts'], **config.get('hosts', {})}.items()
+        }
+        endpoints = {
+            path: PacingRule.from_config(rule, default)
+            for path, rule in {**DEFAULT_PACING['endpoints'], **config.get('endpoints', {})}.items()
+        }
+        retry_delay = tuple(config.get('retry_delay', DEFAULT_PACING['retry_delay']))
+        if len(retry_delay) != 2 or retry_delay[0] < 0 or retry_delay[1] < retry_delay[0]:
+            raise ValueError("retry_delay 必须为 [下限, 上限]")
+        return cls(default, hosts, endpoints, retry_delay)
+
+    def host_rule(self, host: str) -> PacingRule:
+        """域名规则，决定该域名的请求间隔"""
+        return self.hosts.get(host, self.default)
+
+    def endpoint_rule(self, host: str, path: str) -> PacingRule:
+        """接口规则，决定本次请求是否需要等待"""
+        return self.endpoints.get(path) or self.host_rule(host)
+
+
+class Pacer:
+    """
+    单个账号的请求节奏控制器
+    每个域名按令牌桶（GCRA）计算：距离上一次请求足够久时不等待，否则只等待不足的部分
+    """
+    def __init__(self, policy: Optional[PacingPolicy] = None,
+                 slowdown: Optional[Callable[[str], float]] = None):
+        """
+        :param slowdown: 接口路径 -> 节奏倍数，倍数大于1时该接口前的间隔和抖动按倍数放大（如 AccountRisk.multiplier）
+        """
+        self.policy = policy or PacingPolicy.from_config()
+        self.slowdown = slowdown
+        self._tat: Dict[str, float] = {}  # 域名 -> 理论到达时间
+        self._lock = threading.Lock()
+
+    def reserve(self, url: str) -> float:
+        """为一次请求预约发送时间，返回需要等待的秒数（调用方负责等待）"""
+        parts = urlsplit(url)
+        host_rule = self.policy.host_rule(parts.hostname or '')
+        rule = self.policy.endpoint_rule(parts.hostname or '', parts.path)
+        interval = host_rule.min_interval
+        tolerance = interval * (host_rule.burst - 1)
+        factor = self.slowdown(parts.path) if self.slowdown is not None else 1.0
+
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tat.get(parts.hostname, now), now)
+            due = tat - tolerance
+            if factor > 1 and parts.hostname in self._tat:
+                # 放慢的接口与上一次请求至少间隔 min_interval * 倍数，不使用 burst
+                due = max(due, self._tat[parts.hostname] + interval * (factor - 1))
+            delay = 0.0
+            if rule.min_interval > 0 and due > now:
+                delay = due - now + random.uniform(*rule.jitter) * factor
+            self._tat[parts.hostname] = max(tat, now + delay) + interval
+            return delay
+
+    def wait(self, url: str) -> float:
+        """阻塞等待直到可以发送请求，返回实际等待的秒数"""
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def retry_delay(self) -> float:
+        """任务重试前的等待秒数"""
+        return random.uniform(*self.policy.retry_delay)
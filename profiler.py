@@ -0,0 +1,98 @@
+# coding: utf-8
+import csv
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+PROFILE_DIR = 'profiles'
+PHASES = ('sleep', 'sign', 'network')
+
+
+def endpoint_of(url: str) -> str:
+    """统计用的接口名：域名+路径，不含查询参数"""
+    parts = urlsplit(url)
+    return f"{parts.hostname}{parts.path}"
+
+
+class RequestProfiler:
+    """
+    请求耗时统计
+    按 (用户, 接口) 累计三个阶段的耗时：sleep(节奏等待)、sign(签名)、network(网络请求)
+    """
+    def __init__(self):
+        self._stats: Dict[tuple, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._started = time.time()
+
+    @contextmanager
+    def measure(self, username: str, url: str, phase: str) -> Iterator[None]:
+        """统计代码块耗时，network 阶段同时计一次请求"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(username, url, phase, time.perf_counter() - start)
+
+    def add(self, username: str, url: str, phase: str, seconds: float) -> None:
+        """累计一次耗时"""
+        if phase not in PHASES:
+            raise ValueError(f"未知的统计阶段: {phase}")
+        key = (username, endpoint_of(url))
+        with self._lock:
+            stats = self._stats.setdefault(key, {'count': 0, 'sleep': 0.0, 'sign': 0.0,
+                                                 'network': 0.0, 'network_max': 0.0})
+            stats[phase] += seconds
+            if phase == 'network':
+                stats['count'] += 1
+                stats['network_max'] = max(stats['network_max'], seconds)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """按用户、接口展开的统计行"""
+        with self._lock:
+            items = sorted(self._stats.items())
+        rows = []
+        for (username, endpoint), stats in items:
+            rows.append({
+                'username': username,
+                'endpoint': endpoint,
+                'count': stats['count'],
+                'sleep': round(stats['sleep'], 3),
+                'sign': round(stats['sign'], 3),
+                'network': round(stats['network'], 3),
+                'network_avg': round(stats['network'] / stats['count'], 3) if stats['count'] else 0,
+                'network_max': round(stats['network_max'], 3),
+            })
+        return rows
+
+    def totals(self) -> Dict[str, float]:
+        """各阶段总耗时"""
+        with self._lock:
+            totals = {phase: sum(stats[phase] for stats in self._stats.values()) for phase in PHASES}
+            totals['requests'] = sum(stats['count'] for stats in self._stats.values())
+        totals['wall_time'] = time.time() - self._started
+        return {key: round(value, 3) for key, value in totals.items()}
+
+    def write_report(self, fmt: str = 'json', directory: str = PROFILE_DIR) -> Optional[str]:
+        """
+        写入统计报告
+        :param fmt: json 或 csv
+        :return: 报告文件路径，没有数据时返回None
+        """
+        rows = self.rows()
+        if not rows:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile_{time.strftime('%Y%m%d_%H%M%S')}.{fmt}")
+        if fmt == 'csv':
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'totals': self.totals(), 'endpoints': rows}, f, indent=2, ensure_ascii=False)
+        return path
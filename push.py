@@ -6,15 +6,58 @@ from datetime import datetime
 import requests
 import json
 import logging
+import threading
 from abc import ABC, abstractmethod
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_PUSH_TIMEOUT = 10  # 推送请求默认超时秒数
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_push_session() -> requests.Session:
+    """所有推送服务共享的HTTP会话，复用到各推送平台的长连接"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
 class PushService(ABC):
     """推送服务基类"""
-    def __init__(self):
+    push_type = ''  # 配置中的 type 字段
+    # 推送平台的频率限制: ((次数, 秒数), ...)，表示每若干秒最多发送若干次
+    rate_limits = ()
+    # 标识推送目标的配置字段（webhook地址、token、接收人等），超时、签名等发送设置不在其中
+    destination_fields = ()
+
+    def __init__(self, timeout: float = DEFAULT_PUSH_TIMEOUT):
         self.name = self.__class__.__name__.lower()
+        self.timeout = timeout
         self._validate_config()
+
+    def _post(self, url: str, **kwargs) -> requests.Response:
+        """通过共享会话发送POST请求，使用本服务的超时设置"""
+        return get_push_session().post(url, timeout=self.timeout, **kwargs)
+
+    def destination_key(self) -> str:
+        """
+        推送目标标识，destination_fields 相同的推送服务视为同一目标（只是超时等设置不同也会合并）
+        未声明 destination_fields 的推送服务按除名称和超时外的全部配置区分
+        """
+        if self.destination_fields:
+            target = {field: getattr(self, field) for field in self.destination_fields}
+        else:
+            target = {k: v for k, v in vars(self).items() if k not in ('name', 'timeout')}
+        return json.dumps([self.__class__.__name__, target], sort_keys=True, default=str)
+
     
     @abstractmethod
     def send(self, title: str, content: str) -> dict:
@@ -28,11 +71,16 @@ class PushService(ABC):
 
 class FeiShu(PushService):
     """飞书机器人推送"""
-    def __init__(self, webhook_url: str, havesign: bool, secret: str = ""):
+    push_type = 'feishu'
+    rate_limits = ((5, 1), (100, 60))  # 自定义机器人: 5次/秒, 100次/分钟
+    destination_fields = ('webhook_url',)
+
+    def __init__(self, webhook_url: str, havesign: bool, secret: str = "",
+                 timeout: float = DEFAULT_PUSH_TIMEOUT):
         self.havesign = havesign
         self.secret = secret
         self.webhook_url = webhook_url
-        super().__init__()
+        super().__init__(timeout)
 
     def _validate_config(self):
         """验证飞书配置"""
@@ -91,7 +139,7 @@ class FeiShu(PushService):
                 payload["sign"] = self.gen_sign(timestamp)
                 payload["timestamp"] = timestamp
             
-            response = requests.post(url=self.webhook_url, json=payload, timeout=10)
+            response = self._post(self.webhook_url, json=payload)
             response.raise_for_status()
             result = response.json()
             
@@ -115,9 +163,13 @@ class FeiShu(PushService):
 
 class ServerChan(PushService):
     """Server酱推送"""
-    def __init__(self, sckey: str):
+    push_type = 'serverchan'
+    rate_limits = ((5, 86400),)  # 免费版每天5条
+    destination_fields = ('sckey',)
+
+    def __init__(self, sckey: str, timeout: float = DEFAULT_PUSH_TIMEOUT):
         self.sckey = sckey
-        super().__init__()
+        super().__init__(timeout)
 
     def _validate_config(self):
         """验证Server酱配置"""
@@ -133,7 +185,7 @@ class ServerChan(PushService):
                 "desp": content
             }
             
-            response = requests.post(url, data=data, timeout=10)
+            response = self._post(url, data=data)
             response.raise_for_status()
             result = response.json()
             
@@ -157,12 +209,16 @@ class ServerChan(PushService):
         
 class QiweiPush(PushService):
     """Qiwei推送"""
+    push_type = 'qiwei'
+    rate_limits = ((20, 60),)  # 群机器人: 20条/分钟
+    destination_fields = ('webhook_url', 'userids', 'phoneids')  # 同一个群中@的成员不同也视为不同目标
 
-    def __init__(self, webhook_url: str, userids:list, phoneids:list):
+    def __init__(self, webhook_url: str, userids:list, phoneids:list,
+                 timeout: float = DEFAULT_PUSH_TIMEOUT):
         self.webhook_url = webhook_url
         self.userids = userids
         self.phoneids = phoneids
-        super().__init__()
+        super().__init__(timeout)
 
     def _validate_config(self):
         """验证Qiwei配置"""
@@ -184,7 +240,7 @@ class QiweiPush(PushService):
             if self.phoneids != []: 
                 data["markdown"]["mentioned_mobile_list"] = self.phoneids
 
-            response = requests.post(url, json=data, timeout=10)
+            response = self._post(url, json=data)
             response.raise_for_status()
             result = response.json()
 
@@ -201,11 +257,14 @@ class QiweiPush(PushService):
         
 class PushPlus(PushService):
     """PushPlus推送"""
+    push_type = 'pushplus'
+    rate_limits = ((200, 86400),)  # 普通用户每天200条
+    destination_fields = ('token', 'topic')
 
-    def __init__(self, token: str, topic: str):
+    def __init__(self, token: str, topic: str, timeout: float = DEFAULT_PUSH_TIMEOUT):
         self.token = token
         self.topic = topic
-        super().__init__()
+        super().__init__(timeout)
 
     def _validate_config(self):
         """验证PushPlus配置"""
@@ -227,7 +286,7 @@ class PushPlus(PushService):
             if self.topic:
                 data["topic"] = self.topic
             data=json.dumps(data).encode(encoding='utf-8')
-            response = requests.post(url, data=data, headers=headers, timeout=10)
+            response = self._post(url, data=data, headers=headers)
             response.raise_for_status()
             result = response.json()
             success = result.get("code") == 200
@@ -242,8 +301,24 @@ class PushPlus(PushService):
         
 
 
+PUSH_TYPES = {cls.push_type: cls for cls in (FeiShu, ServerChan, QiweiPush, PushPlus)}
+
+
+def build_push_service(push_config: dict) -> PushService:
+    """
+    根据推送配置创建推送服务
+    :raises ValueError: 未知的推送类型
+    """
+    push_type = push_config.get('type')
+    if push_type not in PUSH_TYPES:
+        raise ValueError(f"未知的推送类型: {push_type}")
+    return PUSH_TYPES[push_type](**{k: v for k, v in push_config.items() if k != 'type'})
+
+
 # 新增推送服务只需继承PushService基类
 class Telegram(PushService):
+    destination_fields = ('token', 'chat_id')
+
     def __init__(self, token: str, chat_id: str):
         self.token = token
         self.chat_id = chat_id
@@ -0,0 +1,200 @@
+# coding: utf-8
+import io
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.cookies import cookiejar_from_dict
+from urllib3 import HTTPResponse
+
+from http_pool import SharedHTTPPool
+
+FIXTURES_DIR = 'fixtures'
+REPLAY_MODES = ('record', 'replay')
+# 录制时服务器下发的 cookie 只保留名称，值替换为该占位符
+REDACTED_COOKIE = 'redacted'
+
+logger = logging.getLogger('Qidian')
+
+
+def parse_replay_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    校验 config.json 的 replay 配置，返回补全默认值后的配置
+    :raises ValueError: 配置格式错误
+    """
+    if not isinstance(config, dict):
+        raise ValueError("replay 配置必须为字典类型")
+    mode = config.get('mode')
+    if mode not in REPLAY_MODES:
+        raise ValueError(f"mode 必须为 {'/'.join(REPLAY_MODES)}")
+    fixtures = config.get('fixtures', os.path.join(FIXTURES_DIR, 'recording.json'))
+    if not isinstance(fixtures, str) or not fixtures:
+        raise ValueError("fixtures 必须为文件路径")
+    latency = config.get('latency', 'recorded')
+    if latency != 'recorded' and (isinstance(latency, bool) or not isinstance(latency, (int, float)) or latency < 0):
+        raise ValueError("latency 必须为 recorded 或非负秒数")
+    return {'mode': mode, 'fixtures': fixtures, 'latency': latency}
+
+
+class _RecordingAdapter(BaseAdapter):
+    """转发到真实连接池，同时记录每次请求的响应"""
+    def __init__(self, inner: HTTPAdapter, exchanges: List[Dict[str, Any]]):
+        super().__init__()
+        self.inner = inner
+        self.exchanges = exchanges
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        response = self.inner.send(request, **kwargs)
+        # 只记录响应，请求头、cookies和签名参数不落盘；服务器下发的 cookie 只记录名称
+        self.exchanges.append({
+            'method': request.method,
+            'path': urlsplit(request.url).path,
+            'status': response.status_code,
+            'content_type': response.headers.get('Content-Type', ''),
+            'cookies': dict.fromkeys(response.cookies.keys(), REDACTED_COOKIE),
+            'body': response.text,
+            'elapsed': round(response.elapsed.total_seconds(), 3),
+        })
+        return response
+
+    def close(self) -> None:
+        # 真实连接池由 RecordingPool 统一关闭
+        pass
+
+
+class RecordingPool(SharedHTTPPool):
+    """
+    录制连接池
+    请求照常发送到起点服务器，每个账号的响应按顺序记录（登录预检和执行任务的会话记录在一起），关闭时写入录制文件
+    """
+    def __init__(self, fixtures: str, **pool_options):
+        super().__init__(**pool_options)
+        self.fixtures = fixtures
+        self._recordings: Dict[str, List[Dict[str, Any]]] = {}  # 账号 -> 响应
+        self._lock = threading.Lock()
+
+    def session(self, account: Optional[str] = None) -> requests.Session:
+        with self._lock:
+            if account is None:
+                account = f"session{len(self._recordings) + 1}"
+            exchanges = self._recordings.setdefault(account, [])
+        session = requests.Session()
+        adapter = _RecordingAdapter(self.adapter, exchanges)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def close(self) -> None:
+        super().close()
+        sessions = [{'account': account, 'exchanges': exchanges}
+                    for account, exchanges in self._recordings.items() if exchanges]
+        if not sessions:
+            return
+        os.makedirs(os.path.dirname(self.fixtures) or '.', exist_ok=True)
+        with open(self.fixtures, 'w', encoding='utf-8') as f:
+            json.dump({'recorded_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'sessions': sessions},
+                      f, ensure_ascii=False, indent=2)
+        logger.info(f"已录制{len(sessions)}个账号、{sum(len(s['exchanges']) for s in sessions)}次请求: {self.fixtures}")
+
+
+class _ReplayAdapter(HTTPAdapter):
+    """按接口路径依次返回录制的响应，不访问网络；同一账号的所有会话共用一个，按接口的进度不会错位"""
+    def __init__(self, exchanges: List[Dict[str, Any]], latency: Union[str, float]):
+        super().__init__()
+        self.latency = latency
+        self._queues: Dict[tuple, List[Dict[str, Any]]] = {}
+        for exchange in exchanges:
+            self._queues.setdefault((exchange['method'], exchange['path']), []).append(exchange)
+        self._cursors: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def _next_exchange(self, method: str, path: str) -> Optional[Dict[str, Any]]:
+        """同一接口按录制顺序返回，录制的响应用完后重复最后一个"""
+        queue = self._queues.get((method, path))
+        if not queue:
+            return None
+        with self._lock:
+            cursor = self._cursors.get((method, path), 0)
+            self._cursors[(method, path)] = cursor + 1
+        return queue[min(cursor, len(queue) - 1)]
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        path = urlsplit(request.url).path
+        exchange = self._next_exchange(request.method, path)
+        if exchange is None:
+            logger.warning(f"录制文件中没有 {request.method} {path} 的响应")
+            exchange = {'status': 404, 'content_type': 'application/json', 'cookies': {}, 'body': '{}', 'elapsed': 0}
+
+        delay = exchange['elapsed'] if self.latency == 'recorded' else self.latency
+        if delay:
+            time.sleep(delay)
+
+        raw = HTTPResponse(body=io.BytesIO(exchange['body'].encode('utf-8')), status=exchange['status'],
+                           headers={'Content-Type': exchange['content_type'] or 'application/json; charset=utf-8'},
+                           preload_content=False, decode_content=False)
+        response = self.build_response(request, raw)
+        response.cookies = cookiejar_from_dict(exchange['cookies'])
+        return response
+
+    def close(self) -> None:
+        # 账号的其他会话可能还在使用
+        pass
+
+
+class ReplayPool:
+    """
+    回放连接池
+    账号使用录制文件中同名账号的响应，没有同名账号时按首次出现的顺序依次分配（账号数多于录制的账号数时循环使用）；
+    同一账号的所有会话（如登录预检和执行任务）共用回放进度，是否预检、账号顺序与录制时不同都不会错位。
+    可在不访问起点服务器的情况下完整跑一遍多账号任务流程
+    """
+    def __init__(self, fixtures: str, latency: Union[str, float] = 'recorded'):
+        with open(fixtures, 'r', encoding='utf-8') as f:
+            self.sessions = json.load(f)['sessions']
+        if not self.sessions:
+            raise ValueError(f"录制文件 {fixtures} 中没有会话")
+        self.latency = latency
+        self._recorded = {recording['account']: recording for recording in self.sessions}
+        self._adapters: Dict[str, _ReplayAdapter] = {}  # 账号 -> 回放适配器
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _adapter(self, account: Optional[str]) -> _ReplayAdapter:
+        with self._lock:
+            if account is not None and account in self._adapters:
+                return self._adapters[account]
+            recording = self._recorded.get(account)
+            if recording is None:
+                recording = self.sessions[self._count % len(self.sessions)]
+                self._count += 1
+            adapter = _ReplayAdapter(recording['exchanges'], self.latency)
+            if account is not None:
+                self._adapters[account] = adapter
+            return adapter
+
+    def session(self, account: Optional[str] = None) -> requests.Session:
+        session = requests.Session()
+        adapter = self._adapter(account)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def close(self) -> None:
+        pass
+
+
+def create_replay_pool(config: Dict[str, Any], pool_config: Optional[Dict[str, Any]] = None,
+                       min_maxsize: int = 1) -> Union[RecordingPool, ReplayPool]:
+    """根据 replay 配置创建录制或回放连接池"""
+    config = parse_replay_config(config)
+    if config['mode'] == 'replay':
+        logger.info(f"回放模式: 使用录制文件 {config['fixtures']}，不访问起点服务器")
+        return ReplayPool(config['fixtures'], config['latency'])
+    logger.info(f"录制模式: 响应将保存到 {config['fixtures']}")
+    return RecordingPool(config['fixtures'], **SharedHTTPPool.options_from_config(pool_config, min_maxsize))
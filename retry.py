@@ -0,0 +1,115 @@
+# coding: utf-8
+import random
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+# 默认请求重试策略：连接超时5秒、读取超时15秒，单个请求最多发送3次，
+# 重试间隔按 0.5、1、2...秒指数增长（上限8秒）并取 0~该值 的随机数
+# GET 请求默认幂等；POST 只有重复提交不会产生副作用的接口才标记为幂等。
+# finishWatch 同一任务每次调用都计入进度，不是幂等的，只在确认请求未发出时重试
+DEFAULT_REQUEST_RETRY = {
+    'timeout': [5, 15],
+    'attempts': 3,
+    'backoff': [0.5, 8],
+    'endpoints': {
+        '/argus/api/v2/checkin/checkin': {'idempotent': True},
+        '/home/log/heartbeat': {'timeout': [5, 10]},
+    },
+}
+
+# 幂等请求遇到以下状态码时重试
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# 可以重试的网络异常（同步客户端）
+RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError)
+
+
+def request_sent(error: Exception) -> bool:
+    """
+    判断出错时请求是否可能已经到达服务器
+    连接超时、连接被拒绝时请求未发出，非幂等请求也可以安全重试
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return False
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return not isinstance(reason, NewConnectionError)
+    return True
+
+
+class RetryRule:
+    """单个接口的超时与幂等设置"""
+    def __init__(self, timeout: Tuple[float, float] = (5, 15), idempotent: bool = False):
+        if len(timeout) != 2 or timeout[0] <= 0 or timeout[1] <= 0:
+            raise ValueError("timeout 必须为 [连接超时, 读取超时] 且均大于0")
+        self.timeout = (float(timeout[0]), float(timeout[1]))
+        self.idempotent = bool(idempotent)
+
+
+class RetryPolicy:
+    """
+    请求级重试策略（只读，可在多个账号间共享）
+    只重试失败的那一次HTTP请求，不重跑整个任务；非幂等请求仅在确认未发出时重试
+    """
+    def __init__(self, timeout: Tuple[float, float] = (5, 15), attempts: int = 3,
+                 backoff: Tuple[float, float] = (0.5, 8), endpoints: Dict[str, Dict[str, Any]] = None):
+        if int(attempts) < 1:
+            raise ValueError("attempts 必须为正整数")
+        if len(backoff) != 2 or backoff[0] < 0 or backoff[1] < backoff[0]:
+            raise ValueError("backoff 必须为 [初始间隔, 最大间隔] 且 0 <= 初始间隔 <= 最大间隔")
+        self.default_timeout = RetryRule(timeout).timeout
+        self.attempts = int(attempts)
+        self.backoff_base, self.backoff_max = float(backoff[0]), float(backoff[1])
+        self.endpoints = {}
+        for path, rule in (endpoints or {}).items():
+            if not isinstance(rule, dict):
+                raise ValueError(f"接口 {path} 的配置必须为字典类型")
+            self.endpoints[path] = rule
+            self._rule(rule, 'GET')  # 提前校验
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None) -> "RetryPolicy":
+        """
+        从 config.json 的 request_retry 配置创建策略，未配置的部分使用 DEFAULT_REQUEST_RETRY
+        :raises ValueError: 配置格式错误
+        """
+        config = config or {}
+        if not isinstance(config, dict):
+            raise ValueError("request_retry 配置必须为字典类型")
+        return cls(
+            timeout=tuple(config.get('timeout', DEFAULT_REQUEST_RETRY['timeout'])),
+            attempts=config.get('attempts', DEFAULT_REQUEST_RETRY['attempts']),
+            backoff=tuple(config.get('backoff', DEFAULT_REQUEST_RETRY['backoff'])),
+            endpoints={**DEFAULT_REQUEST_RETRY['endpoints'], **config.get('endpoints', {})},
+        )
+
+    def _rule(self, data: Dict[str, Any], method: str) -> RetryRule:
+        return RetryRule(
+            timeout=tuple(data.get('timeout', self.default_timeout)),
+            idempotent=data.get('idempotent', method.upper() in ('GET', 'HEAD')),
+        )
+
+    def rule(self, method: str, url: str) -> RetryRule:
+        """本次请求适用的规则"""
+        return self._rule(self.endpoints.get(urlsplit(url).path, {}), method)
+
+    def should_retry(self, rule: RetryRule, attempt: int, status: Optional[int] = None,
+                     sent: bool = True) -> bool:
+        """
+        第 attempt 次请求失败后是否重试
+        :param status: 响应状态码，网络异常时为None
+        :param sent: 网络异常时请求是否可能已经发出
+        """
+        if attempt >= self.attempts:
+            return False
+        if status is not None:
+            return rule.idempotent and status in RETRY_STATUS
+        return rule.idempotent or not sent
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次请求失败后的等待秒数（指数退避 + 随机抖动）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
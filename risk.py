@@ -0,0 +1,194 @@
+# coding: utf-8
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from state import STATE_DIR
+
+RISK_FILE = os.path.join(STATE_DIR, 'risk.json')
+
+# 默认自适应节奏：接口每触发一次风控，该账号对该接口的请求间隔翻倍，最多放大到8倍；
+# 之后倍数按距上次触发的时间衰减，每过24小时减半，直到恢复正常节奏（跨运行生效）
+DEFAULT_RISK = {
+    'increase': 2.0,
+    'half_life': 24.0,
+    'max_multiplier': 8.0,
+}
+# 每个接口保留的最近几次风控前的请求间隔
+RISK_SPACING_SAMPLES = 20
+# 验证码处理结果：识别成功且服务器通过、识别成功但仍被拦截、识别失败、不支持的验证码类型、
+# 未识别（未设置tokenid或次数已用完）
+SOLVE_OUTCOMES = ('success', 'rejected', 'failed', 'unsupported', 'skipped')
+
+logger = logging.getLogger('Qidian')
+
+
+def _new_endpoint() -> Dict[str, Any]:
+    return {
+        'requests': 0,
+        'hits': 0,
+        'ban_ids': {},
+        'hours': {},
+        'spacing': [],
+        'solves': {},
+        'multiplier': 1.0,  # 上次触发风控后的倍数，之后按时间衰减
+        'last_hit': None,
+        'hit_at': None,  # 上次触发风控的时间戳
+    }
+
+
+class RiskLedger:
+    """
+    风控记录
+    按账号和接口记录触发风控（RiskConf.BanId 非0）的次数、BanId、时段、触发前的请求间隔和验证码处理结果，
+    保存在 state/risk.json 中跨运行累计；并据此计算节奏倍数，只放慢被风控的账号的对应接口
+    """
+    def __init__(self, path: str = RISK_FILE, increase: float = 2.0, half_life: float = 24.0,
+                 max_multiplier: float = 8.0):
+        """
+        :param half_life: 节奏倍数减半所需的小时数，按距上次触发风控的时间计算
+        """
+        if float(increase) < 1:
+            raise ValueError("increase 不能小于1")
+        if float(half_life) <= 0:
+            raise ValueError("half_life 必须大于0")
+        if float(max_multiplier) < 1:
+            raise ValueError("max_multiplier 不能小于1")
+        self.path = path
+        self.increase = float(increase)
+        self.half_life = float(half_life)
+        self.max_multiplier = float(max_multiplier)
+        self._accounts: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._run_hits = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None, path: str = RISK_FILE) -> "RiskLedger":
+        """
+        从 config.json 的 risk 配置创建，未配置的部分使用 DEFAULT_RISK
+        :raises ValueError: 配置格式错误
+        """
+        config = config if isinstance(config, dict) else {}
+        unknown = set(config) - set(DEFAULT_RISK)
+        if unknown:
+            raise ValueError(f"未知的配置项: {', '.join(sorted(unknown))}")
+        return cls(path=path, **{**DEFAULT_RISK, **config})
+
+    def _load(self) -> None:
+        """读取之前运行的记录（首次使用时）"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._accounts = json.load(f).get('accounts', {})
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"读取风控记录失败: {e}")
+            self._accounts = {}
+
+    def _endpoint(self, username: str, path: str) -> Dict[str, Any]:
+        self._load()
+        endpoints = self._accounts.setdefault(username, {})
+        entry = endpoints.get(path)
+        if entry is None:
+            entry = endpoints[path] = _new_endpoint()
+        return entry
+
+    def account(self, username: str) -> "AccountRisk":
+        return AccountRisk(self, username)
+
+    def _current(self, entry: Dict[str, Any], now: float) -> float:
+        """按距上次触发风控的时间衰减后的节奏倍数"""
+        if entry['multiplier'] <= 1 or not entry.get('hit_at'):
+            return 1.0
+        hours = max(0.0, now - entry['hit_at']) / 3600
+        return max(1.0, round(entry['multiplier'] * 0.5 ** (hours / self.half_life), 3))
+
+    def multiplier(self, username: str, path: str) -> float:
+        """账号请求该接口时的节奏倍数，没有风控记录或已恢复时为1"""
+        with self._lock:
+            self._load()
+            entry = self._accounts.get(username, {}).get(path)
+            return self._current(entry, time.time()) if entry else 1.0
+
+    def record(self, username: str, path: str, ban_id: int, spacing: Optional[float] = None) -> None:
+        """
+        记录一次请求结果
+        :param ban_id: 响应中的 RiskConf.BanId，0 表示未触发风控
+        :param spacing: 距该账号上一次请求同一域名的秒数
+        """
+        with self._lock:
+            entry = self._endpoint(username, path)
+            entry['requests'] += 1
+            if not ban_id:
+                return
+            self._run_hits += 1
+            entry['hits'] += 1
+            entry['ban_ids'][str(ban_id)] = entry['ban_ids'].get(str(ban_id), 0) + 1
+            hour = time.strftime('%H')
+            entry['hours'][hour] = entry['hours'].get(hour, 0) + 1
+            if spacing is not None:
+                entry['spacing'] = (entry['spacing'] + [round(spacing, 2)])[-RISK_SPACING_SAMPLES:]
+            now = time.time()
+            multiplier = min(self.max_multiplier, round(self._current(entry, now) * self.increase, 3))
+            entry['multiplier'] = multiplier
+            entry['hit_at'] = now
+            entry['last_hit'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
+        logger.warning(f"接口{path}触发风控(BanId={ban_id})，该接口请求间隔调整为{multiplier}倍")
+
+    def record_solve(self, username: str, path: str, outcome: str) -> None:
+        """记录一次验证码处理结果，outcome 见 SOLVE_OUTCOMES"""
+        with self._lock:
+            solves = self._endpoint(username, path)['solves']
+            solves[outcome] = solves.get(outcome, 0) + 1
+
+    def save(self) -> None:
+        """写入记录文件（先写临时文件再替换，避免中断时文件损坏）"""
+        with self._lock:
+            if not self._loaded:
+                return
+            data = {'accounts': self._accounts}
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"写入风控记录失败: {e}")
+                return
+            if self._run_hits:
+                now = time.time()
+                slowed = sum(1 for endpoints in self._accounts.values()
+                             for entry in endpoints.values() if self._current(entry, now) > 1)
+                logger.info(f"本次运行触发风控{self._run_hits}次，{slowed}个账号接口已放慢请求节奏")
+
+
+class AccountRisk:
+    """单个账号的风控记录，供客户端记录请求结果、Pacer 查询节奏倍数"""
+    def __init__(self, ledger: RiskLedger, username: str):
+        self.ledger = ledger
+        self.username = username
+        self._last_request: Dict[str, float] = {}  # 域名 -> 上一次请求完成的时间
+        self._lock = threading.Lock()
+
+    def multiplier(self, path: str) -> float:
+        return self.ledger.multiplier(self.username, path)
+
+    def record(self, url: str, ban_id: int) -> None:
+        parts = urlsplit(url)
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_request.get(parts.hostname)
+            self._last_request[parts.hostname] = now
+        self.ledger.record(self.username, parts.path, ban_id, None if last is None else now - last)
+
+    def record_solve(self, url: str, outcome: str) -> None:
+        self.ledger.record_solve(self.username, urlsplit(url).path, outcome)
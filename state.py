@@ -0,0 +1,81 @@
+# coding: utf-8
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional, Set, Tuple
+
+STATE_DIR = 'state'
+DEFAULT_STATE_RETENTION = 7  # 状态文件保留天数
+
+logger = logging.getLogger('Qidian')
+
+
+class DailyStateStore:
+    """
+    每日任务完成状态
+    每天一个 JSON lines 文件（state/YYYY-MM-DD.jsonl），每行记录一个已成功的 (用户, 任务)，
+    同一天重复运行时已完成的任务直接跳过，不再请求服务器
+    """
+    def __init__(self, directory: str = STATE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._date: Optional[str] = None
+        self._done: Set[Tuple[str, str]] = set()
+
+    def _path(self, date: str) -> str:
+        return os.path.join(self.directory, f"{date}.jsonl")
+
+    def _load(self) -> None:
+        """切换到当天的状态文件（跨过零点后自动切换）"""
+        today = time.strftime('%Y-%m-%d')
+        if today == self._date:
+            return
+        self._date = today
+        self._done = set()
+        path = self._path(today)
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    self._done.add((record['user'], record['task']))
+                except (ValueError, KeyError, TypeError):
+                    # 写入中断留下的半行，忽略即可
+                    continue
+
+    def is_done(self, username: str, task_name: str) -> bool:
+        """今天该任务是否已经成功完成"""
+        with self._lock:
+            self._load()
+            return (username, task_name) in self._done
+
+    def mark_done(self, username: str, task_name: str) -> None:
+        """记录任务已成功完成"""
+        with self._lock:
+            self._load()
+            if (username, task_name) in self._done:
+                return
+            record = {'user': username, 'task': task_name, 'time': time.strftime('%H:%M:%S')}
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self._path(self._date), 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            except OSError as e:
+                logger.warning(f"写入任务状态失败: {e}")
+            self._done.add((username, task_name))
+
+    def cleanup(self, retention_days: int = DEFAULT_STATE_RETENTION) -> None:
+        """删除超过保留天数的状态文件"""
+        if not os.path.isdir(self.directory):
+            return
+        cutoff = time.strftime('%Y-%m-%d', time.localtime(time.time() - retention_days * 86400))
+        for name in os.listdir(self.directory):
+            date, ext = os.path.splitext(name)
+            if ext == '.jsonl' and len(date) == 10 and date < cutoff:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError as e:
+                    logger.warning(f"删除过期状态文件失败: {e}")
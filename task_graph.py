@@ -0,0 +1,86 @@
+# coding: utf-8
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class TaskSpec:
+    """
+    任务声明
+    :param name: 任务名，与用户配置 tasks 中的键相同
+    :param method: 执行任务的客户端方法名，同步和异步客户端使用同名方法
+    :param after: 需要先结束的任务，无论成败都视为结束（被禁用或今日已完成的任务同样视为结束）
+    :param resources: 执行期间独占的资源，声明了相同资源的任务不会同时执行
+    """
+    __slots__ = ('name', 'method', 'after', 'resources')
+
+    def __init__(self, name: str, method: str, after: Iterable[str] = (), resources: Iterable[str] = ()):
+        self.name = name
+        self.method = method
+        self.after: Tuple[str, ...] = tuple(after)
+        self.resources: Tuple[str, ...] = tuple(resources)
+
+    def __repr__(self) -> str:
+        return f"TaskSpec({self.name!r}, {self.method!r}, after={self.after}, resources={self.resources})"
+
+
+class TaskGraph:
+    """
+    任务依赖图
+    依赖的任务必须先添加，因此添加顺序就是一种可行的执行顺序，不会出现循环依赖
+    """
+    def __init__(self, specs: Iterable[TaskSpec] = ()):
+        self._specs: Dict[str, TaskSpec] = {}
+        for spec in specs:
+            self.add(spec)
+
+    def add(self, spec: TaskSpec) -> TaskSpec:
+        """添加任务，任务名重复或依赖的任务不存在时抛出ValueError"""
+        if spec.name in self._specs:
+            raise ValueError(f"任务[{spec.name}]重复声明")
+        missing = [name for name in spec.after if name not in self._specs]
+        if missing:
+            raise ValueError(f"任务[{spec.name}]依赖的任务未声明: {', '.join(missing)}")
+        self._specs[spec.name] = spec
+        return spec
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def __iter__(self) -> Iterator[TaskSpec]:
+        return iter(list(self._specs.values()))
+
+
+class TaskRun:
+    """单个用户一次执行中的任务状态：等待、执行中（含后台等待）和已结束"""
+    def __init__(self, graph: TaskGraph):
+        self.waiting: List[TaskSpec] = list(graph)
+        self.running: Dict[str, TaskSpec] = {}
+        self.finished: Set[str] = set()
+        self._held: Dict[str, str] = {}  # 资源 -> 持有的任务名
+
+    def next_ready(self) -> Optional[TaskSpec]:
+        """取出下一个依赖都已结束、资源空闲的任务并标记为执行中，没有时返回None"""
+        for i, spec in enumerate(self.waiting):
+            if all(name in self.finished for name in spec.after) and \
+                    not any(resource in self._held for resource in spec.resources):
+                del self.waiting[i]
+                self.running[spec.name] = spec
+                for resource in spec.resources:
+                    self._held[resource] = spec.name
+                return spec
+        return None
+
+    def finish(self, name: str) -> None:
+        """标记任务结束并释放其资源"""
+        spec = self.running.pop(name, None)
+        if spec is None:
+            return
+        for resource in spec.resources:
+            self._held.pop(resource, None)
+        self.finished.add(name)
+
+    @property
+    def done(self) -> bool:
+        return not self.waiting and not self.running
@@ -0,0 +1,60 @@
+# coding: utf-8
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+
+try:
+    import enctrypt_qidian  # noqa: F401
+except ImportError:
+    # 没有签名模块时使用桩模块，与 bench/load_test.py --stub 相同
+    import stub_signer
+    sys.modules['enctrypt_qidian'] = stub_signer
+
+# 测试中不等待请求节奏
+NO_PACING = {'default': {'min_interval': 0, 'jitter': [0, 0]}, 'retry_delay': [0, 0]}
+
+
+def write_workdir(path, usernames, **config):
+    """在 path 中生成 config.json 和各用户的 cookies 文件，返回 用户名 -> cookies"""
+    os.makedirs(os.path.join(path, 'cookies'), exist_ok=True)
+    all_cookies = {}
+    users = []
+    for i, username in enumerate(usernames):
+        cookies = {'qid': str(100000000 + i), 'QDInfo': f"base-qdinfo-{i}", 'ywguid': str(100000000 + i)}
+        with open(os.path.join(path, 'cookies', f"{username}.json"), 'w', encoding='utf-8') as f:
+            json.dump(cookies, f)
+        all_cookies[username] = cookies
+        users.append({
+            'username': username,
+            'cookies_file': f"cookies/{username}.json",
+            'user_agent': '',
+            'ibex': 'test-ibex',
+            'usertype': '',
+            'tasks': {},
+            'push_services': [],
+        })
+    config = {'log_level': 'WARNING', 'push_outbox': False, 'pacing': NO_PACING, 'users': users, **config}
+    with open(os.path.join(path, 'config.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False)
+    return all_cookies
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """切换到临时目录运行，日志、状态和 cookies 文件都写在其中"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def mock_server():
+    from mock_server import MockQidianServer
+    server = MockQidianServer().start()
+    yield server
+    server.stop()
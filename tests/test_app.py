@@ -0,0 +1,42 @@
+# coding: utf-8
+import logging
+
+import pytest
+
+from conftest import write_workdir
+
+
+@pytest.fixture
+def app(workdir, mock_server, monkeypatch):
+    import QDjob
+    from pacing import PacingPolicy
+
+    write_workdir(workdir, ['u1'])
+    monkeypatch.setattr(QDjob, 'DEFAULT_HOSTS', {**QDjob.DEFAULT_HOSTS, **mock_server.hosts})
+    app = QDjob.MainApp()
+    assert app.pre_check()
+    app.pacing_policy = PacingPolicy.from_config(app.config_manager.config['pacing'])
+    return app
+
+
+def test_captcha_result_is_reported(app, mock_server, monkeypatch, caplog):
+    from heartbeat import HeartbeatScheduler
+
+    # 签到遇到验证码（签到接口的验证码客户端不自动处理）
+    mock_server.captcha_rate = 1
+    pushed = []
+    monkeypatch.setattr(app, '_push', lambda user, title, msg: pushed.append(msg))
+    app.heartbeat_scheduler = HeartbeatScheduler()
+    user = next(app.config_manager.iter_users())
+    user.tasks = {'签到任务': True}
+    user.push_services = [object()]
+    try:
+        with caplog.at_level(logging.WARNING, logger='Qidian'):
+            assert app._process_user(user) is None
+    finally:
+        app.heartbeat_scheduler.shutdown()
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert not any('发生错误' in message for message in messages)
+    assert any('任务[签到任务]遇到验证码(CaptchaAId=198420051)' in message for message in messages)
+    assert len(pushed) == 1 and '任务因遇到验证码被中断' in pushed[0]
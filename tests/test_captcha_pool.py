@@ -0,0 +1,63 @@
+# coding: utf-8
+import pytest
+
+from captcha_pool import CaptchaPool, CaptchaQuotaExhausted
+
+SOLVED = {'code': 0, 'randstr': 'rand', 'ticket': 'ticket-0123456789'}
+
+
+def make_pool(status, solved=SOLVED):
+    """status 为 check_user_status 的返回值，返回 (线程池, 识别次数列表)"""
+    solves = []
+
+    def solver(tokenid, captcha_a_id, user_agent):
+        solves.append(tokenid)
+        return solved
+
+    return CaptchaPool(workers=1, solver=solver, status_checker=lambda tokenid, usertype: status), solves
+
+
+def solve(pool, usertype='1'):
+    return pool.submit('token', '198420051', 'ua', usertype=usertype).result(5)
+
+
+def test_quota_seeded_from_user_status():
+    pool, solves = make_pool({'expire_time': '2026-12-31 00:00:00', 'remaining_calls': 2})
+    assert solve(pool) == SOLVED
+    assert pool.remaining('token') == 1
+    assert solve(pool) == SOLVED
+    assert pool.exhausted('token')
+    with pytest.raises(CaptchaQuotaExhausted):
+        pool.submit('token', '198420051', 'ua', usertype='1')
+    assert solves == ['token', 'token']
+
+
+def test_exhausted_quota_skips_solving():
+    pool, solves = make_pool({'expire_time': '2026-12-31 00:00:00', 'remaining_calls': 0})
+    with pytest.raises(CaptchaQuotaExhausted):
+        solve(pool)
+    assert pool.exhausted('token')
+    assert solves == []
+
+
+@pytest.mark.parametrize('status', [
+    {'expire_time': '2099-01-01 00:00:00', 'remaining_calls': -1},  # 不限次数
+    None,  # 查询失败
+    {},
+])
+def test_unlimited_or_unknown_quota_keeps_solving(status):
+    pool, solves = make_pool(status)
+    for _ in range(3):
+        assert solve(pool) == SOLVED
+    assert not pool.exhausted('token')
+    assert pool.remaining('token') == (-1 if status else None)
+    assert len(solves) == 3
+
+
+def test_quota_not_checked_without_usertype():
+    checks = []
+    pool = CaptchaPool(solver=lambda **kwargs: SOLVED,
+                       status_checker=lambda tokenid, usertype: checks.append(tokenid))
+    assert solve(pool, usertype=None) == SOLVED
+    assert checks == []
+    assert pool.remaining('token') is None
@@ -0,0 +1,31 @@
+# coding: utf-8
+import json
+
+from cookie_store import CookieStore
+
+
+def read(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_second_register_keeps_file_cookies(tmp_path):
+    path = str(tmp_path / 'u1.json')
+    base = {'qid': '1', 'QDInfo': 'base', 'ywkey': 'old'}
+    store = CookieStore(debounce=0)
+    store.register('u1', path, base)
+    # 之后创建的客户端传入的 cookies 中已经有派生的 QDInfo
+    store.register('u1', path, {**base, 'QDInfo': 'derived'})
+    store.update('u1', {'ywkey': 'new', 'QDInfo': 'derived', 'PHESSID': 'x'})
+    assert read(path) == {'qid': '1', 'QDInfo': 'base', 'ywkey': 'new'}
+
+
+def test_updates_survive_reregister(tmp_path):
+    path = str(tmp_path / 'u1.json')
+    store = CookieStore(debounce=3600)
+    store.register('u1', path, {'qid': '1', 'QDInfo': 'base'})
+    store.update('u1', {'ywkey': 'first'})
+    store.update('u1', {'ywkey': 'second'})
+    store.register('u1', path, {'qid': '1', 'QDInfo': 'base'})
+    store.flush('u1')
+    assert read(path) == {'qid': '1', 'QDInfo': 'base', 'ywkey': 'second'}
@@ -0,0 +1,146 @@
+# coding: utf-8
+import asyncio
+
+import pytest
+
+from conftest import NO_PACING
+
+TASK_METHODS = ('qdsign', 'advjob', 'exadvjob', 'do_game', 'lottery')
+
+
+def make_user(username='u1', qid='100000001', tokenid=None, usertype=None):
+    from QDjob import DEFAULT_USER_AGENT, UserConfig
+    return UserConfig(username=username, cookies={'qid': qid, 'QDInfo': f"base-{qid}"}, tasks={},
+                      user_agent=DEFAULT_USER_AGENT, ibex='test-ibex', push_services=[], tokenid=tokenid,
+                      usertype=usertype)
+
+
+def make_client(cls, server, user, **kwargs):
+    from pacing import Pacer, PacingPolicy
+    client = cls(user, hosts=server.hosts, pacer=Pacer(PacingPolicy.from_config(NO_PACING)), **kwargs)
+    assert client.init()
+    return client
+
+
+def short_game(client, seconds=2):
+    """把游戏时长缩短为 seconds 秒"""
+    prepare = client._prepare_game_flow
+
+    def flow():
+        prepared = yield from prepare()
+        if prepared.get('status') == 'ready':
+            prepared['game']['full_time'] = seconds
+        return prepared
+
+    client._prepare_game_flow = flow
+
+
+@pytest.fixture
+def server():
+    from mock_server import MockQidianServer
+    server = MockQidianServer(game_minutes=1, heartbeat_interval=1).start()
+    yield server
+    server.stop()
+
+
+def heartbeats(server):
+    return server.report()['endpoints'].get('log/heartbeat', {}).get('count', 0)
+
+
+def test_sync_tasks(workdir, server):
+    from QDjob import QidianClient
+    client = make_client(QidianClient, server, make_user())
+    short_game(client)
+    results = {name: getattr(client, name)() for name in TASK_METHODS}
+    assert {name: result['status'] for name, result in results.items()} == dict.fromkeys(TASK_METHODS, 'success')
+    assert heartbeats(server) >= 2
+
+
+def test_async_tasks(workdir, server):
+    pytest.importorskip('aiohttp')
+    from async_client import AsyncQidianClient
+
+    async def run():
+        async with make_client(AsyncQidianClient, server, make_user()) as client:
+            short_game(client)
+            assert await client.check_login() == 'mock_user'
+            return {name: await getattr(client, name)() for name in TASK_METHODS}
+
+    results = asyncio.run(run())
+    assert {name: result['status'] for name, result in results.items()} == dict.fromkeys(TASK_METHODS, 'success')
+    assert heartbeats(server) >= 2
+
+
+def test_sync_game_heartbeats_in_scheduler(workdir, server):
+    from QDjob import QidianClient
+    from heartbeat import HeartbeatScheduler
+
+    scheduler = HeartbeatScheduler()
+    try:
+        client = make_client(QidianClient, server, make_user(), heartbeat_scheduler=scheduler)
+        short_game(client)
+        result = client.do_game()
+        assert result['status'] == 'pending'
+        assert result['wait']() == {'status': 'success'}
+    finally:
+        scheduler.shutdown()
+    assert heartbeats(server) >= 2
+
+
+def test_async_game_heartbeats_in_scheduler(workdir, server):
+    pytest.importorskip('aiohttp')
+    from async_client import AsyncQidianClient
+    from heartbeat import HeartbeatScheduler
+
+    async def run(scheduler):
+        async with make_client(AsyncQidianClient, server, make_user(),
+                               heartbeat_scheduler=scheduler) as client:
+            short_game(client)
+            return await client.do_game()
+
+    scheduler = HeartbeatScheduler()
+    try:
+        assert asyncio.run(run(scheduler)) == {'status': 'success'}
+    finally:
+        scheduler.shutdown()
+    assert heartbeats(server) >= 2
+
+
+def test_exadvjob_stops_on_captcha(workdir):
+    from QDjob import QidianClient
+    from mock_server import MockQidianServer
+
+    server = MockQidianServer(captcha_rate=1).start()
+    try:
+        client = make_client(QidianClient, server, make_user())
+        result = client.exadvjob()
+    finally:
+        server.stop()
+    assert result['status'] == 'captcha_failed'
+    assert result['reason'] == '跳过验证码处理'
+    assert server.report()['endpoints']['finishWatch']['count'] == 1
+
+
+def test_exadvjob_skips_captcha_when_quota_exhausted(workdir):
+    from QDjob import QidianClient
+    from captcha_pool import CaptchaPool
+    from mock_server import MockQidianServer
+
+    checks, solves = [], []
+
+    def check_user_status(tokenid, usertype):
+        checks.append((tokenid, usertype))
+        return {'expire_time': '2026-12-31 00:00:00', 'remaining_calls': 0}
+
+    pool = CaptchaPool(solver=lambda **kwargs: solves.append(kwargs), status_checker=check_user_status)
+    server = MockQidianServer(captcha_rate=1).start()
+    try:
+        client = make_client(QidianClient, server, make_user(tokenid='token', usertype='1'), captcha_pool=pool)
+        result = client.exadvjob()
+    finally:
+        server.stop()
+        pool.close()
+    assert result['status'] == 'captcha_failed'
+    assert result['reason'] == 'tokenid剩余次数已用完'
+    assert checks == [('token', '1')]
+    assert solves == []
@@ -0,0 +1,101 @@
+# coding: utf-8
+import json
+import threading
+
+from outbox import PushOutbox
+from push import PushService
+
+
+class RecordingPush(PushService):
+    """记录收到的推送，前 fail_times 次返回失败"""
+    push_type = 'recording'
+
+    def __init__(self, webhook_url: str, fail_times: int = 0):
+        self.webhook_url = webhook_url
+        self.fail_times = fail_times
+        super().__init__()
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def destination_key(self) -> str:
+        return json.dumps(['RecordingPush', self.webhook_url])
+
+    def send(self, title: str, content: str) -> dict:
+        with self._lock:
+            self.sent.append(title)
+            return {'success': len(self.sent) > self.fail_times}
+
+    def _validate_config(self):
+        pass
+
+
+def make_outbox(path, **options):
+    options = {'backoff': (60, 60), 'flush_timeout': 5, **options}
+    return PushOutbox(path=str(path), **options)
+
+
+def leave_push(path, push, title):
+    """模拟上次运行发送失败、遗留在发件箱中的推送"""
+    outbox = make_outbox(path, flush_timeout=0.5)
+    outbox.submit(push, title, '内容')
+    outbox.close()
+    data = json.loads(path.read_text(encoding='utf-8'))
+    for entry in data['entries']:
+        entry['next_try'] = 0
+    path.write_text(json.dumps(data), encoding='utf-8')
+
+
+def test_outbox_does_not_store_secrets(tmp_path):
+    path = tmp_path / 'push_outbox.json'
+    leave_push(path, RecordingPush('https://example.com/hook/secret-token', fail_times=1), '任务完成报告')
+
+    text = path.read_text(encoding='utf-8')
+    assert 'secret-token' not in text
+    entries = json.loads(text)['entries']
+    assert len(entries) == 1 and entries[0]['title'] == '任务完成报告'
+
+
+def test_outbox_resolves_leftover_push_from_config(tmp_path):
+    path = tmp_path / 'push_outbox.json'
+    leave_push(path, RecordingPush('https://example.com/hook/a', fail_times=1), '遗留推送')
+
+    # 下次运行：按用户名从当前配置中找回推送服务，已删除的推送目标直接丢弃
+    current = RecordingPush('https://example.com/hook/a')
+    requested = []
+
+    def resolver(username):
+        requested.append(username)
+        return [RecordingPush('https://example.com/hook/other'), current]
+
+    outbox = make_outbox(path, resolver=resolver)
+    outbox.start()
+    outbox.close()
+    assert current.sent == ['遗留推送']
+    assert requested == [None]
+    assert json.loads(path.read_text(encoding='utf-8'))['entries'] == []
+
+    leave_push(path, RecordingPush('https://example.com/hook/removed', fail_times=1), '已删除')
+    outbox = make_outbox(path, resolver=lambda username: [])
+    outbox.start()
+    outbox.close()
+    assert json.loads(path.read_text(encoding='utf-8'))['entries'] == []
+
+
+def test_outbox_sends_destinations_concurrently(tmp_path):
+    release = threading.Event()
+    started = threading.Barrier(3, timeout=5)
+
+    class BlockingPush(RecordingPush):
+        def send(self, title, content):
+            started.wait()
+            release.wait(5)
+            return super().send(title, content)
+
+    outbox = make_outbox(tmp_path / 'push_outbox.json')
+    pushes = [BlockingPush(f"https://example.com/hook/{i}") for i in range(2)]
+    outbox.send_all(pushes, '任务完成报告', '内容')
+    # 两个推送目标同时在线程池中发送，否则 Barrier 超时
+    started.wait()
+    release.set()
+    outbox.close()
+    assert [push.sent for push in pushes] == [['任务完成报告'], ['任务完成报告']]
@@ -0,0 +1,92 @@
+# coding: utf-8
+import json
+
+import pytest
+
+from conftest import write_workdir
+
+
+@pytest.fixture
+def app(workdir, mock_server, monkeypatch):
+    import QDjob
+    from cookie_store import CookieStore
+    from pacing import PacingPolicy
+
+    monkeypatch.setattr(QDjob, 'DEFAULT_HOSTS', {**QDjob.DEFAULT_HOSTS, **mock_server.hosts})
+    app = QDjob.MainApp()
+    assert app.pre_check()
+    app.pacing_policy = PacingPolicy.from_config(app.config_manager.config['pacing'])
+    app.cookie_store = CookieStore(debounce=0)
+    return app
+
+
+@pytest.fixture
+def cookies(workdir):
+    return write_workdir(workdir, ['u1', 'u2', 'u3'])
+
+
+def preflight(app):
+    from http_pool import SharedHTTPPool
+
+    pool = SharedHTTPPool()
+    try:
+        return list(app._preflight_login(app.config_manager.iter_users(), 2, pool))
+    finally:
+        pool.close()
+
+
+def test_preflight_keeps_base_qdinfo(cookies, app, mock_server, monkeypatch):
+    import QDjob
+
+    respond = mock_server._respond
+
+    def refresh_ywkey(name, account, form):
+        status, payload, set_cookies = respond(name, account, form)
+        if name == 'getprofile':
+            set_cookies = {**set_cookies, 'ywkey': 'new'}
+        return status, payload, set_cookies
+
+    monkeypatch.setattr(mock_server, '_respond', refresh_ywkey)
+    users = preflight(app)
+    assert [user.username for user in users] == ['u1', 'u2', 'u3']
+    assert set(app.verified_users) == {'u1', 'u2', 'u3'}
+
+    for user in users:
+        expected = {**cookies[user.username], 'ywkey': 'new'}
+        with open(user.cookies_file, encoding='utf-8') as f:
+            assert json.load(f) == expected
+        assert user.cookies == expected
+        client = QDjob.QidianClient(user, cookie_store=app.cookie_store)
+        assert client.init()
+        base = cookies[user.username]['QDInfo']
+        assert client.QDInfo == base
+        assert client.userid == client.signer.getuserid_from_QDInfo(base)
+
+
+def test_preflight_skips_invalid_users(cookies, app, mock_server, monkeypatch):
+    respond = mock_server._respond
+    invalid_qid = cookies['u2']['qid']
+
+    def expire_u2(name, account, form):
+        if name == 'getprofile' and account is mock_server._account(invalid_qid):
+            return 200, {'Result': -1, 'Data': {}}, {}
+        return respond(name, account, form)
+
+    monkeypatch.setattr(mock_server, '_respond', expire_u2)
+    assert [user.username for user in preflight(app)] == ['u1', 'u3']
+    assert set(app.verified_users) == {'u1', 'u3'}
+
+
+def test_requests_do_not_modify_user_cookies(cookies, app, mock_server):
+    import QDjob
+
+    user = next(app.config_manager.iter_users())
+    client = QDjob.QidianClient(user, hosts=mock_server.hosts, cookie_store=app.cookie_store)
+    assert client.init()
+    assert client.check_login() == 'mock_user'
+    assert client.cookies['QDInfo'] != cookies['u1']['QDInfo']
+    assert user.cookies == cookies['u1']
+
+    app.cookie_store.flush()
+    with open('cookies/u1.json', encoding='utf-8') as f:
+        assert json.load(f) == cookies['u1']
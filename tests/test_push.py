@@ -0,0 +1,44 @@
+# coding: utf-8
+from notify import DigestCollector
+from push import build_push_service
+
+
+def test_destination_ignores_transport_settings():
+    fast = build_push_service({'type': 'serverchan', 'sckey': 'SCT123', 'timeout': 5})
+    slow = build_push_service({'type': 'serverchan', 'sckey': 'SCT123', 'timeout': 30})
+    other = build_push_service({'type': 'serverchan', 'sckey': 'SCT456'})
+    assert fast.destination_key() == slow.destination_key()
+    assert fast.destination_key() != other.destination_key()
+
+    signed = build_push_service({'type': 'feishu', 'webhook_url': 'https://open.feishu.cn/hook/a',
+                                 'havesign': True, 'secret': 's', 'timeout': 5})
+    unsigned = build_push_service({'type': 'feishu', 'webhook_url': 'https://open.feishu.cn/hook/a',
+                                   'havesign': False})
+    assert signed.destination_key() == unsigned.destination_key()
+
+
+def test_destination_keeps_recipients():
+    base = {'type': 'qiwei', 'webhook_url': 'https://qyapi.weixin.qq.com/hook', 'phoneids': []}
+    one = build_push_service({**base, 'userids': ['a']})
+    two = build_push_service({**base, 'userids': ['b'], 'timeout': 3})
+    assert one.destination_key() != two.destination_key()
+    assert one.destination_key() == build_push_service({**base, 'userids': ['a'], 'timeout': 3}).destination_key()
+
+    topic = {'type': 'pushplus', 'token': 't'}
+    assert build_push_service({**topic, 'topic': 'x'}).destination_key() != \
+        build_push_service({**topic, 'topic': 'y'}).destination_key()
+
+
+def test_digest_merges_same_destination():
+    sent = []
+
+    class Dispatcher:
+        def submit(self, push_service, title, content):
+            sent.append((push_service, title, content))
+
+    digest = DigestCollector()
+    digest.add([build_push_service({'type': 'serverchan', 'sckey': 'SCT123', 'timeout': 5})], '报告1', 'u1')
+    digest.add([build_push_service({'type': 'serverchan', 'sckey': 'SCT123', 'timeout': 30})], '报告2', 'u2')
+    digest.flush(Dispatcher())
+    assert len(sent) == 1
+    assert '【报告1】' in sent[0][2] and '【报告2】' in sent[0][2]
@@ -0,0 +1,69 @@
+# coding: utf-8
+import json
+
+from conftest import NO_PACING
+
+
+def make_client(user, hosts, pool):
+    from QDjob import DEFAULT_USER_AGENT, QidianClient, UserConfig
+    from pacing import Pacer, PacingPolicy
+    config = UserConfig(username=user, cookies={'qid': '100000001', 'QDInfo': 'base-qdinfo'}, tasks={},
+                        user_agent=DEFAULT_USER_AGENT, ibex='test-ibex', push_services=[])
+    client = QidianClient(config, hosts=hosts, http_pool=pool, pacer=Pacer(PacingPolicy.from_config(NO_PACING)))
+    assert client.init()
+    return client
+
+
+def record(path, mock_server, monkeypatch):
+    """u1 先登录预检再执行签到，u2 直接执行签到；服务器在登录检测时下发新的 ywkey"""
+    from replay import RecordingPool
+
+    respond = mock_server._respond
+
+    def issue_cookie(name, account, form):
+        status, payload, set_cookies = respond(name, account, form)
+        if name == 'getprofile':
+            set_cookies = {**set_cookies, 'ywkey': 'secret-ywkey'}
+        return status, payload, set_cookies
+
+    monkeypatch.setattr(mock_server, '_respond', issue_cookie)
+    pool = RecordingPool(str(path))
+    assert make_client('u1', mock_server.hosts, pool).check_login()
+    for user in ('u1', 'u2'):
+        client = make_client(user, mock_server.hosts, pool)
+        assert client.check_login()
+        assert client.qdsign()['status'] == 'success'
+    pool.close()
+
+
+def test_recording_redacts_server_cookies(workdir, mock_server, monkeypatch):
+    from replay import REDACTED_COOKIE
+
+    path = workdir / 'recording.json'
+    record(path, mock_server, monkeypatch)
+    text = path.read_text(encoding='utf-8')
+    assert 'secret-ywkey' not in text
+    sessions = json.loads(text)['sessions']
+    assert [session['account'] for session in sessions] == ['u1', 'u2']
+    cookies = [exchange['cookies'] for exchange in sessions[0]['exchanges'] if exchange['cookies']]
+    assert cookies and all(value == REDACTED_COOKIE for item in cookies for value in item.values())
+
+
+def test_replay_follows_accounts_without_preflight(workdir, mock_server, monkeypatch):
+    from replay import ReplayPool
+
+    path = workdir / 'recording.json'
+    record(path, mock_server, monkeypatch)
+    hosts = mock_server.hosts
+    mock_server.stop()
+
+    pool = ReplayPool(str(path), latency=0)
+    # 顺序与录制时相反、不做登录预检，每个账号仍使用自己录制的响应
+    for user in ('u2', 'u1'):
+        client = make_client(user, hosts, pool)
+        assert client.check_login()
+        assert client.qdsign()['status'] == 'success'
+    recorded = {session['account']: session['exchanges'] for session in pool.sessions}
+    for user in ('u1', 'u2'):
+        replayed = [exchange for queue in pool._adapter(user)._queues.values() for exchange in queue]
+        assert sorted(map(id, replayed)) == sorted(map(id, recorded[user]))
@@ -0,0 +1,99 @@
+# coding: utf-8
+import pytest
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from pacing import Pacer, PacingPolicy
+from retry import RetryPolicy, request_sent
+
+CHECKIN = 'https://h5.if.qidian.com/argus/api/v2/checkin/checkin'
+FINISH_WATCH = 'https://h5.if.qidian.com/argus/api/v1/video/adv/finishWatch'
+DETAIL = 'https://h5.if.qidian.com/argus/api/v2/checkin/detail'
+HEARTBEAT = 'https://qdgame.qidian.com/home/log/heartbeat'
+
+
+@pytest.fixture
+def policy():
+    return RetryPolicy.from_config()
+
+
+def test_default_rules(policy):
+    assert policy.rule('POST', CHECKIN).idempotent
+    assert not policy.rule('POST', FINISH_WATCH).idempotent
+    assert policy.rule('GET', DETAIL).idempotent
+    assert policy.rule('GET', DETAIL).timeout == (5.0, 15.0)
+    assert policy.rule('GET', HEARTBEAT).timeout == (5.0, 10.0)
+
+
+@pytest.mark.parametrize('method, url, sent, expected', [
+    ('POST', CHECKIN, True, True),  # 幂等：可能已发出也重试
+    ('POST', CHECKIN, False, True),
+    ('POST', FINISH_WATCH, True, False),  # 非幂等：可能已发出时不重试
+    ('POST', FINISH_WATCH, False, True),  # 非幂等：确认未发出时重试
+    ('GET', DETAIL, True, True),
+])
+def test_should_retry_network_error(policy, method, url, sent, expected):
+    assert policy.should_retry(policy.rule(method, url), 1, sent=sent) is expected
+
+
+@pytest.mark.parametrize('method, url, status, expected', [
+    ('POST', CHECKIN, 503, True),
+    ('POST', CHECKIN, 429, True),
+    ('POST', CHECKIN, 400, False),
+    ('POST', FINISH_WATCH, 503, False),  # 服务器可能已经计入进度
+    ('GET', DETAIL, 502, True),
+])
+def test_should_retry_status(policy, method, url, status, expected):
+    assert policy.should_retry(policy.rule(method, url), 1, status=status) is expected
+
+
+def test_should_retry_stops_after_attempts(policy):
+    rule = policy.rule('GET', DETAIL)
+    assert policy.should_retry(rule, policy.attempts - 1, sent=True)
+    assert not policy.should_retry(rule, policy.attempts, sent=True)
+    assert not policy.should_retry(policy.rule('POST', FINISH_WATCH), policy.attempts, sent=False)
+
+
+def test_endpoint_config_overrides_defaults():
+    policy = RetryPolicy.from_config({'endpoints': {'/argus/api/v1/video/adv/finishWatch': {'timeout': [5, 20]}}})
+    rule = policy.rule('POST', FINISH_WATCH)
+    assert rule.timeout == (5.0, 20.0)
+    assert not rule.idempotent
+    with pytest.raises(ValueError):
+        RetryPolicy.from_config({'attempts': 0})
+    with pytest.raises(ValueError):
+        RetryPolicy.from_config({'endpoints': {'/x': {'timeout': [0, 5]}}})
+
+
+def test_request_sent():
+    assert not request_sent(requests.exceptions.ConnectTimeout())
+    refused = requests.exceptions.ConnectionError(type('Error', (), {'reason': NewConnectionError(None, 'refused')})())
+    assert not request_sent(refused)
+    assert request_sent(requests.exceptions.ConnectionError('connection reset'))
+    assert request_sent(requests.exceptions.ReadTimeout())
+
+
+def test_backoff_bounds(policy):
+    for attempt in range(1, 10):
+        assert 0 <= policy.backoff(attempt) <= min(policy.backoff_max, policy.backoff_base * 2 ** (attempt - 1))
+
+
+def test_pacer_waits_only_for_missing_interval(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('pacing.time.monotonic', lambda: now[0])
+    pacer = Pacer(PacingPolicy.from_config({'default': {'min_interval': 2, 'jitter': [0, 0]}}))
+    assert pacer.reserve(CHECKIN) == 0
+    now[0] += 0.5
+    assert pacer.reserve(CHECKIN) == pytest.approx(1.5)
+    # 纯查询接口不等待，其他域名单独计算
+    assert pacer.reserve(DETAIL) == 0
+    assert pacer.reserve(HEARTBEAT) == 0
+
+
+def test_pacer_slowdown_multiplies_interval(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('pacing.time.monotonic', lambda: now[0])
+    pacer = Pacer(PacingPolicy.from_config({'default': {'min_interval': 2, 'jitter': [0, 0]}}),
+                  slowdown=lambda path: 3.0)
+    assert pacer.reserve(FINISH_WATCH) == 0
+    assert pacer.reserve(FINISH_WATCH) == pytest.approx(6)
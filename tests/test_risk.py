@@ -0,0 +1,53 @@
+# coding: utf-8
+import pytest
+
+import risk
+from risk import RiskLedger
+
+PATH = '/argus/api/v1/video/adv/finishWatch'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可调整的当前时间"""
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(risk.time, 'time', lambda: now[0])
+    return now
+
+
+def test_multiplier_decays_by_elapsed_time(tmp_path, clock):
+    ledger = RiskLedger(path=str(tmp_path / 'risk.json'), half_life=24)
+    ledger.record('u1', PATH, ban_id=1)
+    ledger.record('u1', PATH, ban_id=1)
+    assert ledger.multiplier('u1', PATH) == 4.0
+    # 未触发风控的请求不会加快恢复
+    for _ in range(50):
+        ledger.record('u1', PATH, ban_id=0)
+    assert ledger.multiplier('u1', PATH) == 4.0
+
+    clock[0] += 24 * 3600
+    assert ledger.multiplier('u1', PATH) == 2.0
+    clock[0] += 48 * 3600
+    assert ledger.multiplier('u1', PATH) == 1.0
+    assert ledger.multiplier('u2', PATH) == 1.0
+
+
+def test_slowdown_carries_into_next_run(tmp_path, clock):
+    path = str(tmp_path / 'risk.json')
+    ledger = RiskLedger(path=path, half_life=24)
+    ledger.record('u1', PATH, ban_id=1)
+    ledger.save()
+
+    clock[0] += 12 * 3600
+    ledger = RiskLedger(path=path, half_life=24)
+    assert ledger.multiplier('u1', PATH) == pytest.approx(1.414, abs=0.001)
+    # 再次触发时在衰减后的倍数上放大
+    ledger.record('u1', PATH, ban_id=1)
+    assert ledger.multiplier('u1', PATH) == pytest.approx(2.828, abs=0.001)
+
+
+def test_invalid_half_life():
+    with pytest.raises(ValueError):
+        RiskLedger.from_config({'half_life': 0})
+    with pytest.raises(ValueError):
+        RiskLedger.from_config({'decay': 0.9})
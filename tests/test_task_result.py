@@ -0,0 +1,24 @@
+# coding: utf-8
+
+
+def test_to_dict_keeps_zero_values():
+    from QDjob import TaskResult
+    result = TaskResult.from_task({'status': 'failed', 'reason': 0, 'raw_response': 0})
+    data = result.to_dict()
+    assert data['reason'] == '0'
+    assert data['raw_response'] == 0
+    assert data['skipped'] is False
+    assert 'captcha_data' not in data
+
+
+def test_to_dict_drops_none_and_empty_string():
+    from QDjob import TaskResult
+    data = TaskResult('success', reason='', captcha_data=None, raw_response={'Result': 0}).to_dict()
+    assert set(data) == {'status', 'raw_response', 'skipped', 'timestamp'}
+    assert data['raw_response'] == {'Result': 0}
+
+
+def test_reason_falls_back_to_error():
+    from QDjob import TaskResult
+    assert TaskResult.from_task({'status': 'error', 'reason': '', 'error': 'timeout'}).reason == 'timeout'
+    assert TaskResult.from_task({'status': 'error'}).reason == ''